@@ -0,0 +1,35 @@
+"""
+Registro con niveles para toda la aplicación (sustituye a los `print`).
+
+Todos los módulos escriben bajo el logger `modulador`; su nivel sale de LOG_LEVEL (variable de
+entorno del mismo nombre). Con `OFF` no se escribe nada, p. ej. en producción.
+"""
+import logging
+import sys
+
+from config import LOG_LEVEL
+
+_ROOT = "modulador"
+_FORMAT = "%(asctime)s %(levelname)-7s %(name)s: %(message)s"
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger del módulo `name` (hijo de `modulador`)."""
+    return logging.getLogger(f"{_ROOT}.{name}")
+
+
+def configure_logging(level: str = LOG_LEVEL):
+    """Fija el nivel del logger raíz de la aplicación y su salida (stderr). Es idempotente."""
+    root = logging.getLogger(_ROOT)
+    if level.upper() == "OFF":
+        root.setLevel(logging.CRITICAL + 1)
+    else:
+        root.setLevel(level.upper())
+    if not root.handlers:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter(_FORMAT))
+        root.addHandler(handler)
+    root.propagate = False
+
+
+configure_logging()
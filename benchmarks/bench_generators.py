@@ -0,0 +1,40 @@
+"""
+Microbenchmarks de generación: cada código registrado, de 5 a 10^7 bits.
+
+`generate/<código>/<bits>` mide `modulate` (la señal completa en memoria) y, desde
+`STREAM_MIN_BITS`, `stream/<código>/<bits>` consume `iter_modulated_chunks` (memoria acotada).
+"""
+from typing import Dict
+
+from benchmarks.common import best_time, random_bits, result
+from line_codes import line_codes
+from signal_generation import iter_modulated_chunks, modulate
+
+STREAM_MIN_BITS = 10_000
+
+
+def bit_sizes(max_bits: int):
+    """5, 10, 100, ... hasta `max_bits`."""
+    sizes = [5, 10]
+    while sizes[-1] * 10 <= max_bits:
+        sizes.append(sizes[-1] * 10)
+    return [size for size in sizes if size <= max_bits]
+
+
+def _consume(chunks) -> int:
+    return sum(chunk.num_samples for chunk in chunks)
+
+
+def run(max_bits: int = 10_000_000, samples_per_bit: int = 8, repeat: int = 3) -> Dict[str, dict]:
+    results = {}
+    sizes = bit_sizes(max_bits)
+    for code in line_codes():
+        for num_bits in sizes:
+            bits = random_bits(num_bits, seed=num_bits)
+            elapsed = best_time(lambda: modulate(bits, code, samples_per_bit), repeat)
+            results[f"generate/{code.name}/{num_bits}"] = result(elapsed * 1e3, "ms")
+            if num_bits >= STREAM_MIN_BITS:
+                elapsed = best_time(lambda: _consume(iter_modulated_chunks(bits, code, samples_per_bit=samples_per_bit)),
+                                    repeat)
+                results[f"stream/{code.name}/{num_bits}"] = result(elapsed * 1e3, "ms")
+    return results
@@ -0,0 +1,111 @@
+"""
+Precisión temporal del envío GPIO con un RPi.GPIO simulado.
+
+`TimedFakeGPIO` registra el instante de cada escritura (como `fake_gpio.FakeGPIO`) y puede
+simular el coste de la llamada real con una espera activa. El error de cada flanco se mide con
+las marcas del propio mock, relativas a la primera escritura, frente al calendario ideal
+(`compile_gpio_edges` en modo `edges`, una muestra cada `bit_duration / samples_per_bit` en modo
+`samples`); no se usa el informe que calcula `gpio_handler`. También se mide cuánto tarda en
+cortarse un envío con flancos más juntos que GPIO_SPIN_THRESHOLD_S (el bucle no llega a dormir).
+"""
+import threading
+import time
+from typing import Dict
+
+import numpy as np
+
+from benchmarks.common import percentiles_us, random_bits, result
+from fake_gpio import FakeGPIO
+from gpio_backends import TransmissionCancelled
+import gpio_handler
+from models import GpioPlaybackMode
+from signal_generation import iter_modulated_chunks, modulate
+
+PIN = 17
+MAX_CANCEL_LATENCY_S = 0.1  # Más es un fallo (no una regresión de rendimiento): el envío no mira el evento
+# (modo, duración de bit en s, muestras por bit)
+CASES = [
+    (GpioPlaybackMode.EDGES, 1e-3, 100),
+    (GpioPlaybackMode.EDGES, 2e-4, 20),
+    (GpioPlaybackMode.SAMPLES, 1e-3, 10),
+]
+
+
+class TimedFakeGPIO(FakeGPIO):
+    """FakeGPIO cuyas escrituras tardan `write_latency_s` (espera activa), como la librería real."""
+
+    def __init__(self, write_latency_s: float = 0.0):
+        super().__init__()
+        self.write_latency_s = write_latency_s
+
+    def output(self, channel, state):
+        if self.write_latency_s:
+            end = time.perf_counter() + self.write_latency_s
+            while time.perf_counter() < end:
+                pass
+        super().output(channel, state)
+
+    def write_times(self, pin: int) -> np.ndarray:
+        """Instante de cada escritura del pin (incluida la de `setup`)."""
+        return np.array([timestamp for timestamp, event_pin, _ in self.snapshot() if event_pin == pin])
+
+
+def measure(mode: GpioPlaybackMode, bit_duration: float, samples_per_bit: int, num_bits: int,
+            write_latency_s: float) -> dict:
+    """Envía un mensaje aleatorio Manchester y devuelve los percentiles del error de sus flancos (µs)."""
+    gpio = TimedFakeGPIO(write_latency_s)
+    gpio_handler.set_gpio_module(gpio)
+    signal = modulate(random_bits(num_bits), "Manchester (Bi-phase L)", samples_per_bit, bit_duration)
+    gpio_handler.send_to_gpio_pins([PIN], signal, mode=mode)
+    if mode == GpioPlaybackMode.EDGES:
+        scheduled, _ = gpio_handler.compile_gpio_edges(signal)
+    else:
+        scheduled = np.arange(signal.num_samples) * signal.sample_duration
+    # Escrituras del envío: tras la de `setup` y antes del LOW final
+    actual = gpio.write_times(PIN)[1:1 + len(scheduled)]
+    errors = (actual - actual[0]) - (scheduled - scheduled[0])
+    return percentiles_us(errors)
+
+
+def measure_cancel(mode: GpioPlaybackMode, cancel_after_s: float = 0.05) -> float:
+    """Segundos entre la cancelación y el fin de un envío largo con chips de 100 us."""
+    gpio_handler.set_gpio_module(FakeGPIO())
+    cancel_event = threading.Event()
+    set_at = []
+
+    def cancel():
+        set_at.append(time.perf_counter())
+        cancel_event.set()
+
+    chunks = iter_modulated_chunks(random_bits(100_000), "Manchester (Bi-phase L)", samples_per_bit=2,
+                                   bit_duration=2e-4)
+    timer = threading.Timer(cancel_after_s, cancel)
+    timer.start()
+    try:
+        gpio_handler.send_to_gpio_pins([PIN], chunks, mode=mode, cancel_event=cancel_event)
+    except TransmissionCancelled:
+        return time.perf_counter() - set_at[0]
+    finally:
+        timer.cancel()
+    raise RuntimeError(f"El envío en modo '{mode.value}' no se canceló.")
+
+
+def run(num_bits: int = 200, write_latency_us: float = 5.0) -> Dict[str, dict]:
+    results = {}
+    try:
+        for mode, bit_duration, samples_per_bit in CASES:
+            stats = measure(mode, bit_duration, samples_per_bit, num_bits, write_latency_us * 1e-6)
+            case = f"gpio/{mode.value}/{bit_duration * 1e6:g}us-{samples_per_bit}spb"
+            # Informativos: el error de temporización depende sobre todo de la carga de la máquina
+            for name, value in stats.items():
+                results[f"{case}/{name}_error"] = result(value, "us", None)
+        timing = gpio_handler.achievable_timing()
+        results["gpio/min_write_interval"] = result(timing["min_interval_s"] * 1e6, "us", None)
+        for mode in GpioPlaybackMode:
+            latency = measure_cancel(mode)
+            if latency > MAX_CANCEL_LATENCY_S:
+                raise RuntimeError(f"El envío en modo '{mode.value}' tardó {latency:.3f} s en cancelarse.")
+            results[f"gpio/{mode.value}/cancel_latency"] = result(latency * 1e3, "ms", None)
+    finally:
+        gpio_handler.set_gpio_module(None)
+    return results
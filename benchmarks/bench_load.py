@@ -0,0 +1,106 @@
+"""
+Prueba de carga en proceso: la aplicación ASGI se atiende con `httpx.ASGITransport`, sin red.
+
+`plot_clients` clientes piden gráficas (mensajes aleatorios, así que casi todas pasan por el
+ejecutor de renderizado) mientras `gpio_clients` clientes encolan envíos GPIO a pines distintos
+sobre el backend simulado (`gpio_backends.SimulatedGpioBackend`). Se miden las latencias de cada endpoint, el throughput total, los
+rechazos (503/429) y, al terminar los trabajos GPIO, el error de temporización que informan.
+"""
+import asyncio
+import time
+from typing import Dict, List
+
+import httpx
+import numpy as np
+
+from benchmarks.common import random_bits, result
+from config import GPIO_PIN_MIN
+from gpio_backends import SimulatedGpioBackend
+import gpio_handler
+
+
+def _bit_string(bits: np.ndarray) -> str:
+    return (bits + ord("0")).tobytes().decode("ascii")
+
+
+async def _plot_client(client: httpx.AsyncClient, index: int, requests: int, plot_bits: int,
+                       latencies: List[float], statuses: Dict[int, int]):
+    for i in range(requests):
+        body = {"binary_data": _bit_string(random_bits(plot_bits, seed=index * 100_003 + i)),
+                "modulation_type": "Manchester (Bi-phase L)", "renderer": "fast"}
+        start = time.perf_counter()
+        response = await client.post("/modulate/plot", json=body)
+        elapsed = time.perf_counter() - start
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        if response.status_code == 200:
+            latencies.append(elapsed)
+        elif response.status_code == 503:
+            await asyncio.sleep(0.01)
+
+
+async def _gpio_client(client: httpx.AsyncClient, index: int, requests: int, gpio_bits: int, bit_duration: float,
+                       latencies: List[float], statuses: Dict[int, int], job_ids: List[str]):
+    for i in range(requests):
+        body = {"binary_data": _bit_string(random_bits(gpio_bits, seed=index * 7919 + i)),
+                "modulation_type": "Manchester (Bi-phase L)", "output_pins": [GPIO_PIN_MIN + index],
+                "bit_duration": bit_duration}
+        start = time.perf_counter()
+        response = await client.post("/modulate/send_gpio", json=body)
+        elapsed = time.perf_counter() - start
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        if response.status_code == 202:
+            latencies.append(elapsed)
+            job_ids.append(response.json()["job_id"])
+
+
+def _latency_results(prefix: str, latencies: List[float]) -> Dict[str, dict]:
+    if not latencies:
+        return {}
+    ms = np.asarray(latencies) * 1e3
+    return {f"{prefix}/p50": result(np.percentile(ms, 50), "ms"),
+            f"{prefix}/p95": result(np.percentile(ms, 95), "ms"),
+            f"{prefix}/p99": result(np.percentile(ms, 99), "ms")}
+
+
+async def _run(plot_clients: int, gpio_clients: int, requests: int, plot_bits: int, gpio_bits: int,
+               bit_duration: float) -> Dict[str, dict]:
+    import main  # la aplicación completa (arranca el ejecutor de renderizado en su lifespan)
+    plot_latencies, gpio_latencies, job_ids = [], [], []
+    plot_statuses, gpio_statuses = {}, {}
+    async with main.lifespan(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            # Calentamiento: los procesos del ejecutor importan matplotlib con su primer trabajo
+            await asyncio.gather(*[_plot_client(client, plot_clients + i, 1, plot_bits, [], {})
+                                   for i in range(plot_clients)])
+            start = time.perf_counter()
+            await asyncio.gather(
+                *[_plot_client(client, i, requests, plot_bits, plot_latencies, plot_statuses)
+                  for i in range(plot_clients)],
+                *[_gpio_client(client, i, requests, gpio_bits, bit_duration, gpio_latencies, gpio_statuses, job_ids)
+                  for i in range(gpio_clients)])
+            elapsed = time.perf_counter() - start
+            jobs = [(await client.get(f"/gpio/jobs/{job_id}/wait", params={"timeout_s": 60})).json()
+                    for job_id in job_ids]
+    total = sum(plot_statuses.values()) + sum(gpio_statuses.values())
+    results = {"load/throughput": result(total / elapsed, "req/s", "higher"),
+               "load/plot_rejected": result(plot_statuses.get(503, 0), "count", None),
+               "load/gpio_rejected": result(gpio_statuses.get(429, 0), "count", None)}
+    results.update(_latency_results("load/plot_latency", plot_latencies))
+    results.update(_latency_results("load/send_gpio_latency", gpio_latencies))
+    completed = [job for job in jobs if job["status"] == "completed"]
+    reports = [report for job in completed for report in job["timing"]]
+    results["load/gpio_jobs_failed"] = result(len(jobs) - len(completed), "count", None)
+    if reports:
+        # Informativa: bajo carga depende sobre todo del reparto del GIL entre hilos
+        results["load/gpio_p99_error"] = result(max(report["p99_abs_error_us"] for report in reports), "us", None)
+    return results
+
+
+def run(plot_clients: int = 8, gpio_clients: int = 4, requests: int = 20, plot_bits: int = 64,
+        gpio_bits: int = 32, bit_duration: float = 1e-3) -> Dict[str, dict]:
+    gpio_handler.set_gpio_backend(SimulatedGpioBackend())
+    try:
+        return asyncio.run(_run(plot_clients, gpio_clients, requests, plot_bits, gpio_bits, bit_duration))
+    finally:
+        gpio_handler.set_gpio_backend(None)
@@ -0,0 +1,31 @@
+"""
+Tiempo de renderizado por motor y formato, en el propio proceso (sin el ejecutor).
+
+`render/<motor>-<formato>/<bits>` dibuja una señal Manchester; `render_grid/<motor>-<formato>`
+una imagen multipanel de 4 mensajes × 4 modulaciones de 64 bits.
+"""
+from typing import Dict
+
+from benchmarks.common import best_time, random_bits, result
+from models import BatchOutput, PlotFormat, PlotRenderer
+from rendering import render_batch, render_signal
+from signal_generation import modulate, modulate_batch
+
+PLOT_BITS = (16, 64, 256)
+GRID_MODULATIONS = ["NRZ-M", "Manchester (Bi-phase L)", "Unipolar RZ", "Bipolar AMI"]
+
+
+def run(repeat: int = 5) -> Dict[str, dict]:
+    results = {}
+    grid = modulate_batch([random_bits(64, seed) for seed in range(4)], GRID_MODULATIONS)
+    for renderer in PlotRenderer:
+        for image_format in PlotFormat:
+            backend = f"{renderer.value}-{image_format.value}"
+            for num_bits in PLOT_BITS:
+                signal = modulate(random_bits(num_bits), "Manchester (Bi-phase L)")
+                render_signal(signal, renderer, image_format)  # primera llamada: fuentes y cachés
+                elapsed = best_time(lambda: render_signal(signal, renderer, image_format), repeat)
+                results[f"render/{backend}/{num_bits}"] = result(elapsed * 1e3, "ms")
+            elapsed = best_time(lambda: render_batch(grid, renderer, image_format, BatchOutput.IMAGE), repeat)
+            results[f"render_grid/{backend}"] = result(elapsed * 1e3, "ms")
+    return results
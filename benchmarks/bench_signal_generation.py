@@ -0,0 +1,148 @@
+"""
+Benchmark del motor vectorizado de códigos de línea frente a los bucles por bit originales.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.bench_signal_generation [--max-bits 100000] [--repeat 3]
+
+Antes de medir comprueba que ambas implementaciones producen exactamente la misma señal.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config import SAMPLES_PER_BIT, VOLTAGE_HIGH, VOLTAGE_LOW_BIPOLAR, VOLTAGE_LOW_UNIPOLAR, BIT_DURATION  # noqa: E402
+from models import ModulationType  # noqa: E402
+from signal_generation import get_modulation_function  # noqa: E402
+
+
+# --- Implementación de referencia (bucles por bit, versión anterior) ---
+
+def _legacy_time_base(binary_data):
+    samples_per_bit_eff = max(1, SAMPLES_PER_BIT)
+    total_samples = len(binary_data) * samples_per_bit_eff
+    return np.linspace(0, len(binary_data) * BIT_DURATION, total_samples, endpoint=False)
+
+def legacy_nrzm(binary_data):
+    t = _legacy_time_base(binary_data)
+    modulated_signal = np.zeros_like(t)
+    current_level = VOLTAGE_LOW_BIPOLAR
+    samples_per_bit_eff = max(1, SAMPLES_PER_BIT)
+    for i, bit in enumerate(binary_data):
+        start_index = i * samples_per_bit_eff
+        end_index = min((i + 1) * samples_per_bit_eff, len(modulated_signal))
+        if bit == '1':
+            current_level *= -1
+        modulated_signal[start_index:end_index] = current_level
+    return t, modulated_signal
+
+def legacy_manchester(binary_data):
+    t = _legacy_time_base(binary_data)
+    modulated_signal = np.zeros_like(t)
+    samples_per_bit_eff = max(1, SAMPLES_PER_BIT)
+    for i, bit in enumerate(binary_data):
+        start_index = i * samples_per_bit_eff
+        mid_index = min(start_index + samples_per_bit_eff // 2, len(modulated_signal))
+        end_index = min((i + 1) * samples_per_bit_eff, len(modulated_signal))
+        if bit == '0':
+            modulated_signal[start_index:mid_index] = VOLTAGE_HIGH
+            modulated_signal[mid_index:end_index] = VOLTAGE_LOW_BIPOLAR
+        else:
+            modulated_signal[start_index:mid_index] = VOLTAGE_LOW_BIPOLAR
+            modulated_signal[mid_index:end_index] = VOLTAGE_HIGH
+    return t, modulated_signal
+
+def legacy_unipolar_rz(binary_data):
+    t = _legacy_time_base(binary_data)
+    modulated_signal = np.zeros_like(t)
+    samples_per_bit_eff = max(1, SAMPLES_PER_BIT)
+    for i, bit in enumerate(binary_data):
+        start_index = i * samples_per_bit_eff
+        mid_index = min(start_index + samples_per_bit_eff // 2, len(modulated_signal))
+        end_index = min((i + 1) * samples_per_bit_eff, len(modulated_signal))
+        if bit == '1':
+            modulated_signal[start_index:mid_index] = VOLTAGE_HIGH
+            modulated_signal[mid_index:end_index] = VOLTAGE_LOW_UNIPOLAR
+        else:
+            modulated_signal[start_index:end_index] = VOLTAGE_LOW_UNIPOLAR
+    return t, modulated_signal
+
+def legacy_bipolar_ami(binary_data):
+    t = _legacy_time_base(binary_data)
+    modulated_signal = np.zeros_like(t)
+    last_pulse_polarity = VOLTAGE_LOW_BIPOLAR
+    samples_per_bit_eff = max(1, SAMPLES_PER_BIT)
+    for i, bit in enumerate(binary_data):
+        start_index = i * samples_per_bit_eff
+        end_index = min((i + 1) * samples_per_bit_eff, len(modulated_signal))
+        if bit == '1':
+            current_pulse_polarity = -last_pulse_polarity
+            modulated_signal[start_index:end_index] = current_pulse_polarity
+            last_pulse_polarity = current_pulse_polarity
+        else:
+            modulated_signal[start_index:end_index] = VOLTAGE_LOW_UNIPOLAR
+    return t, modulated_signal
+
+LEGACY_FUNCTIONS = {
+    ModulationType.NRZ_M: legacy_nrzm,
+    ModulationType.MANCHESTER: legacy_manchester,
+    ModulationType.UNIPOLAR_RZ: legacy_unipolar_rz,
+    ModulationType.BIPOLAR_AMI: legacy_bipolar_ami,
+}
+
+
+def random_bits(num_bits, seed=0):
+    rng = np.random.default_rng(seed)
+    return "".join(rng.choice(["0", "1"], size=num_bits))
+
+def best_time(func, binary_data, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(binary_data)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def check_identical(num_bits=257):
+    """Verifica que la implementación vectorizada coincide con la de referencia."""
+    samples = [random_bits(num_bits, seed) for seed in range(4)] + ["", "0", "1", "00000", "11111"]
+    for mod_type, legacy in LEGACY_FUNCTIONS.items():
+        fast = get_modulation_function(mod_type)
+        for binary_data in samples:
+            t_ref, sig_ref = legacy(binary_data)
+            t_new, sig_new = fast(binary_data)
+            if not (np.array_equal(t_ref, t_new) and np.array_equal(sig_ref, sig_new)
+                    and sig_ref.dtype == sig_new.dtype):
+                raise AssertionError(f"Diferencia en {mod_type.value} para {binary_data[:32]!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-bits", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    check_identical()
+    print("OK: salidas idénticas a la implementación por bucles.\n")
+
+    sizes = [5]
+    while sizes[-1] * 10 <= args.max_bits:
+        sizes.append(sizes[-1] * 10)
+
+    print(f"{'modulación':<26}{'bits':>10}{'bucle (ms)':>14}{'vector (ms)':>14}{'x':>8}")
+    for mod_type, legacy in LEGACY_FUNCTIONS.items():
+        fast = get_modulation_function(mod_type)
+        for num_bits in sizes:
+            binary_data = random_bits(num_bits)
+            t_legacy = best_time(legacy, binary_data, args.repeat)
+            t_fast = best_time(fast, binary_data, args.repeat)
+            print(f"{mod_type.value:<26}{num_bits:>10}{t_legacy * 1e3:>14.3f}{t_fast * 1e3:>14.3f}"
+                  f"{t_legacy / t_fast:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
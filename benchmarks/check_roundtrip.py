@@ -0,0 +1,47 @@
+"""
+Verificación masiva de ida y vuelta (modular → decodificar) para todos los códigos registrados.
+
+Uso (desde la raíz del proyecto, p. ej. en CI):
+    python -m benchmarks.check_roundtrip [--bits 100000] [--trials 5] [--seed 0]
+                                         [--noise 0.2] [--drift-ppm 300]
+
+Sale con código 1 si alguna modulación no recupera exactamente los bits enviados, o si
+detecta violaciones de código en una señal limpia (sin ruido ni deriva).
+"""
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config import ROUNDTRIP_SAMPLES_PER_BIT  # noqa: E402
+from line_codes import line_codes  # noqa: E402
+from line_decoding import run_roundtrip  # noqa: E402
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bits", type=int, default=100_000)
+    parser.add_argument("--trials", type=int, default=5)
+    parser.add_argument("--samples-per-bit", type=int, default=ROUNDTRIP_SAMPLES_PER_BIT)
+    parser.add_argument("--noise", type=float, default=0.0)
+    parser.add_argument("--drift-ppm", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    report = run_roundtrip([code.name for code in line_codes()], args.bits, args.trials, args.samples_per_bit,
+                           args.noise, args.drift_ppm, seed=args.seed)
+    clean = not (args.noise or args.drift_ppm)
+    failed = False
+    print(f"semilla {report['seed']}\n")
+    print(f"{'modulación':<26}{'bits':>10}{'errores':>10}{'violaciones':>13}{'decod. (ms)':>13}  estado")
+    for result in report["results"]:
+        ok = result["ok"] and not (clean and result["violations"])
+        failed |= not ok
+        print(f"{result['modulation']:<26}{result['bits']:>10}{result['bit_errors']:>10}{result['violations']:>13}"
+              f"{result['decode_ms']:>13.1f}  {'OK' if ok else 'FALLO'}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,45 @@
+"""Utilidades compartidas por los benchmarks de la suite (`benchmarks.suite`)."""
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def result(value: float, unit: str, better: Optional[str] = "lower") -> dict:
+    """Entrada de resultados: `better` es "lower", "higher" o None (solo informativa, no se compara)."""
+    return {"value": float(value), "unit": unit, "better": better}
+
+
+def best_time(func: Callable[[], object], repeat: int = 3, budget_s: float = 1.0) -> float:
+    """
+    Mejor tiempo (s) de `func()` en `repeat` ejecuciones, o menos si la primera ya agota
+    `budget_s` (los tamaños grandes se miden una sola vez).
+    """
+    best = float("inf")
+    spent = 0.0
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = min(best, elapsed)
+        spent += elapsed
+        if spent >= budget_s:
+            break
+    return best
+
+
+def random_bits(num_bits: int, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).integers(0, 2, num_bits, dtype=np.uint8)
+
+
+def percentiles_us(errors_s: np.ndarray) -> dict:
+    """p50, p99 y máximo (µs) del valor absoluto de unos errores en segundos."""
+    abs_us = np.abs(np.asarray(errors_s, dtype=np.float64)) * 1e6
+    if len(abs_us) == 0:
+        return {"p50": 0.0, "p99": 0.0, "max": 0.0}
+    return {"p50": float(np.percentile(abs_us, 50)), "p99": float(np.percentile(abs_us, 99)),
+            "max": float(abs_us.max())}
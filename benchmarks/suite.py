@@ -0,0 +1,122 @@
+"""
+Suite de benchmarks con comparación contra una línea base.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.suite [--quick] [--only generators,render,gpio,load]
+                               [--output resultados.json] [--baseline benchmarks/baseline.json]
+                               [--save-baseline] [--tolerance 1.5]
+
+Cada benchmark devuelve `{clave: {"value", "unit", "better"}}`. Con una línea base se comparan las
+claves presentes en ambas ejecuciones: una métrica "lower" empeora si supera `valor_base * tolerance`
+(y además la diferencia absoluta supera el mínimo de su unidad, para no saltar con ruido de
+microsegundos); una "higher", si queda por debajo de `valor_base / tolerance`. Termina con código 1
+si hay regresiones. Solo se compara con una línea base medida con el mismo `--quick`; los errores de
+temporización GPIO son informativos (dependen de la carga de la máquina) y no se comparan.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks import common  # noqa: F401  (añade la raíz del proyecto a sys.path)
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+BENCHMARKS = ("generators", "render", "gpio", "load")
+# Diferencia absoluta mínima por unidad para contar como regresión
+ABSOLUTE_FLOOR = {"ms": 0.05, "us": 5.0, "req/s": 1.0}
+
+
+def _run_benchmark(name: str, quick: bool) -> dict:
+    # Importación perezosa: `--only gpio` no carga matplotlib ni la aplicación
+    if name == "generators":
+        from benchmarks import bench_generators
+        return bench_generators.run(max_bits=100_000 if quick else 10_000_000, repeat=1 if quick else 3)
+    if name == "render":
+        from benchmarks import bench_render
+        return bench_render.run(repeat=1 if quick else 5)
+    if name == "gpio":
+        from benchmarks import bench_gpio_timing
+        return bench_gpio_timing.run(num_bits=50 if quick else 200)
+    if name == "load":
+        from benchmarks import bench_load
+        return bench_load.run(requests=5 if quick else 20)
+    raise ValueError(f"Benchmark desconocido: '{name}'. Opciones: {', '.join(BENCHMARKS)}")
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list:
+    """Regresiones de `current` frente a `baseline`: lista de (clave, base, actual, unidad)."""
+    regressions = []
+    for key, entry in current.items():
+        base = baseline.get(key)
+        if base is None or entry["better"] is None:
+            continue
+        value, base_value = entry["value"], base["value"]
+        floor = ABSOLUTE_FLOOR.get(entry["unit"], 0.0)
+        if entry["better"] == "lower":
+            worse = value > base_value * tolerance and value - base_value > floor
+        else:
+            worse = value < base_value / tolerance and base_value - value > floor
+        if worse:
+            regressions.append((key, base_value, value, entry["unit"]))
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="Tamaños y repeticiones reducidos")
+    parser.add_argument("--only", default=",".join(BENCHMARKS), help="Benchmarks separados por comas")
+    parser.add_argument("--output", type=Path, help="Fichero JSON donde guardar los resultados")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Guarda los resultados como nueva línea base")
+    parser.add_argument("--tolerance", type=float, default=1.5, help="Factor de empeoramiento admitido")
+    args = parser.parse_args(argv)
+
+    from app_logging import configure_logging
+    configure_logging("WARNING")  # sin los INFO de cada envío GPIO
+
+    selected = [name.strip() for name in args.only.split(",") if name.strip()]
+    results = {}
+    for name in selected:
+        start = time.perf_counter()
+        results.update(_run_benchmark(name, args.quick))
+        print(f"{name}: {time.perf_counter() - start:.1f} s", file=sys.stderr)
+
+    report = {
+        "meta": {"python": platform.python_version(), "numpy": np.__version__,
+                 "platform": platform.platform(), "cpu_count": os.cpu_count(),
+                 "quick": args.quick, "only": selected},
+        "results": results,
+    }
+    for key, entry in results.items():
+        print(f"{key:55s} {entry['value']:12.3f} {entry['unit']}")
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+        print(f"Línea base guardada en {args.baseline}")
+        return 0
+    if not args.baseline.exists():
+        print(f"Sin línea base en {args.baseline}; no se compara.")
+        return 0
+
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    if baseline["meta"].get("quick") != args.quick:
+        # Tiempos en frío con una repetición frente a mejores de varias: la comparación no dice nada
+        print(f"La línea base {args.baseline} se midió con otro valor de --quick; no se compara "
+              f"(guarda una propia con --save-baseline --baseline <fichero>).")
+        return 0
+    regressions = compare(results, baseline["results"], args.tolerance)
+    for key, base_value, value, unit in regressions:
+        print(f"REGRESIÓN {key}: {base_value:.3f} -> {value:.3f} {unit}")
+    print(f"{len(regressions)} regresiones (tolerancia x{args.tolerance:g}).")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,193 @@
+"""
+Simulación de canal: jitter, filtro paso bajo y ruido blanco gaussiano (AWGN).
+
+La señal ideal (niveles int8) pasa por las etapas en el orden físico: el jitter desplaza los
+flancos del emisor, el filtro (RC de primer orden o paso bajo ideal, aplicado con una FFT sobre
+todo el buffer) limita el ancho de banda y el ruido se suma a la salida. Sobre la señal
+resultante se calcula el diagrama de ojo (histograma 2-D de todos los periodos plegados) y la
+curva BER-SNR (Monte Carlo reutilizando los decodificadores de `line_decoding`).
+"""
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from config import EYE_MAX_POINTS
+from line_codes import get_line_code
+from line_decoding import decode_samples
+from models import ChannelFilter, ChannelParams
+
+_FILTER_SETTLE = 8  # Constantes de tiempo (o periodos de corte) de relleno a cada lado del buffer
+
+
+def fast_fft_len(n: int) -> int:
+    """Menor longitud >= n con factores 2, 3 y 5 (tamaños rápidos para la FFT)."""
+    best = 1 << max(0, (n - 1).bit_length())
+    p5 = 1
+    while p5 < best:
+        p35 = p5
+        while p35 < best:
+            size = p35 << max(0, (-(-n // p35) - 1).bit_length())
+            best = min(best, size)
+            p35 *= 3
+        p5 *= 5
+    return best
+
+
+def apply_jitter(levels: np.ndarray, samples_per_bit: float, jitter_ui: float,
+                 rng: np.random.Generator) -> np.ndarray:
+    """
+    Desplaza cada flanco un tiempo gaussiano de desviación `jitter_ui` (en fracciones de bit).
+    Los flancos caen en posiciones fraccionarias: cada muestra toma el valor medio de su
+    intervalo, así el jitter es visible aunque sea menor que una muestra.
+    """
+    signal = levels.astype(np.float64)
+    edges = np.flatnonzero(np.diff(levels)) + 1
+    if not jitter_ui or len(edges) == 0:
+        return signal
+    n = len(levels)
+    steps = signal[edges] - signal[edges - 1]
+    positions = np.clip(edges + rng.normal(0.0, jitter_ui * samples_per_bit, len(edges)), 0, n)
+    index = np.floor(positions).astype(np.intp)
+    fraction = positions - index
+    # Un escalón en la posición fraccionaria e aporta (1 - frac) a la muestra floor(e) y 1 a las siguientes
+    deltas = np.bincount(index, steps * (1 - fraction), n + 1) + np.bincount(index + 1, steps * fraction, n + 2)[:n + 1]
+    return signal[0] + np.cumsum(deltas)[:n]
+
+
+def apply_filter(signal: np.ndarray, samples_per_bit: float, kind: ChannelFilter, bandwidth: float) -> np.ndarray:
+    """
+    Filtra la señal con la respuesta en frecuencia del canal. `bandwidth` es la frecuencia de
+    corte en múltiplos de la tasa de bits. El buffer se rellena con sus valores extremos (línea
+    en reposo) para que la convolución circular de la FFT no mezcle el final con el principio.
+    """
+    if kind == ChannelFilter.NONE or len(signal) == 0:
+        return signal
+    cutoff = bandwidth / samples_per_bit  # ciclos por muestra
+    pad = int(np.ceil(_FILTER_SETTLE / cutoff))
+    padded = np.pad(signal, pad, mode="edge")
+    size = fast_fft_len(len(padded))
+    spectrum = np.fft.rfft(padded, size)
+    freqs = np.fft.rfftfreq(size)
+    if kind == ChannelFilter.RC:
+        spectrum *= 1.0 / (1.0 + 1j * freqs / cutoff)
+    else:
+        spectrum[freqs > cutoff] = 0
+    return np.fft.irfft(spectrum, size)[pad:pad + len(signal)]
+
+
+def add_awgn(signal: np.ndarray, snr_db: Optional[float], reference_power: float,
+             rng: np.random.Generator) -> np.ndarray:
+    """Suma ruido gaussiano con varianza `reference_power / 10^(snr_db/10)` por muestra."""
+    if snr_db is None:
+        return signal
+    sigma = np.sqrt((reference_power or 1.0) / 10 ** (snr_db / 10))
+    return signal + rng.normal(0.0, sigma, len(signal))
+
+
+def noise_sigma(levels: np.ndarray, snr_db: Optional[float]) -> float:
+    """Desviación típica del ruido que `simulate_channel` añade a estos niveles."""
+    if snr_db is None:
+        return 0.0
+    return float(np.sqrt((_power(levels) or 1.0) / 10 ** (snr_db / 10)))
+
+
+def _power(levels: np.ndarray) -> float:
+    return float(np.mean(np.square(levels, dtype=np.float64))) if len(levels) else 0.0
+
+
+def simulate_channel(levels: np.ndarray, samples_per_bit: float, channel: ChannelParams,
+                     rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    """Señal recibida: jitter → filtro → AWGN. La SNR se mide respecto a la potencia transmitida."""
+    rng = rng or np.random.default_rng(channel.seed)
+    received = apply_jitter(levels, samples_per_bit, channel.jitter_ui, rng)
+    received = apply_filter(received, samples_per_bit, channel.filter, channel.bandwidth)
+    return add_awgn(received, channel.snr_db, _power(levels), rng)
+
+
+def channel_delay(samples_per_bit: float, channel: ChannelParams) -> int:
+    """Retardo de grupo del filtro en muestras (el RC retrasa τ = 1/(2π·fc); el ideal es de fase cero)."""
+    if channel.filter != ChannelFilter.RC:
+        return 0
+    return int(round(samples_per_bit / (2 * np.pi * channel.bandwidth)))
+
+
+# --- Diagrama de ojo ---
+
+def eye_histogram(samples: np.ndarray, samples_per_bit: float, columns: int, rows: int,
+                  y_range: Sequence[float], span_ui: int = 2) -> np.ndarray:
+    """
+    Histograma (rows × columns) de la señal plegada en ventanas de `span_ui` bits que empiezan
+    medio bit antes de cada límite de bit. La señal se interpola en el centro de cada columna de
+    cada ventana y cada tramo entre dos columnas se rasteriza como un segmento vertical (así los
+    flancos abruptos quedan continuos); todo se acumula con un `bincount` por bloque, sin
+    dibujar trazas una a una. Se usan como mucho EYE_MAX_POINTS puntos (las primeras ventanas).
+    """
+    hist = np.zeros(rows * columns, dtype=np.int64)
+    # Se descartan el primer y el último bit (transitorios del filtro)
+    first, last = samples_per_bit, len(samples) - 1 - samples_per_bit
+    step = span_ui * samples_per_bit / columns  # muestras por columna
+    # Punto k de la rejilla: t = k·step - medio bit, columna k mod columns
+    k_first = int(np.ceil((first + samples_per_bit / 2) / step))
+    k_last = min(int((last + samples_per_bit / 2) / step), k_first + EYE_MAX_POINTS)
+    if k_last - k_first < 2:
+        return hist.reshape(rows, columns)
+    y_min, y_max = y_range
+    positions = np.arange(len(samples))
+    block = max(2, EYE_MAX_POINTS // 16)
+    for k0 in range(k_first, k_last, block):
+        k = np.arange(k0, min(k0 + block + 1, k_last + 1))  # un punto de solape entre bloques
+        values = np.interp(k * step - samples_per_bit / 2, positions, samples)
+        row = np.floor((y_max - values) / (y_max - y_min) * rows)
+        col = k[:-1] % columns
+        lo = np.minimum(row[:-1], row[1:])
+        length = (np.abs(row[1:] - row[:-1]) + 1).astype(np.intp)
+        # Segmento vertical de cada tramo en su columna de partida
+        offsets = np.arange(length.sum()) - np.repeat(np.cumsum(length) - length, length)
+        seg_rows = np.repeat(lo, length).astype(np.intp) + offsets
+        seg_cols = np.repeat(col, length)
+        inside = (seg_rows >= 0) & (seg_rows < rows)
+        hist += np.bincount(seg_rows[inside] * columns + seg_cols[inside], minlength=rows * columns)
+    return hist.reshape(rows, columns)
+
+
+# --- Curva BER-SNR ---
+
+def ber_curve(mod_type, snr_points: Sequence[float], num_bits: int, samples_per_bit: int,
+              channel: ChannelParams, rng: np.random.Generator) -> List[Dict]:
+    """
+    BER de un código para cada SNR. El mensaje aleatorio se modula y pasa por jitter y filtro
+    una sola vez; en cada punto solo se suma ruido nuevo y se decodifica integrando cada chip
+    con la temporización ideal (la BER no incluye deslizamientos del reloj del receptor).
+    """
+    code = get_line_code(mod_type)
+    bits = rng.integers(0, 2, num_bits, dtype=np.uint8)
+    levels, _ = code.encode(bits, samples_per_bit)
+    clean = apply_filter(apply_jitter(levels, samples_per_bit, channel.jitter_ui, rng),
+                         samples_per_bit, channel.filter, channel.bandwidth)
+    # Temporización conocida: se compensa el retardo de grupo del filtro en lugar de recuperar el reloj
+    delay = channel_delay(samples_per_bit, channel)
+    if delay:
+        clean = np.concatenate((clean[delay:], np.repeat(clean[-1:], delay)))
+    power = _power(levels)
+    points = []
+    for snr_db in snr_points:
+        started = time.perf_counter()
+        result = decode_samples(add_awgn(clean, snr_db, power, rng), code, samples_per_bit,
+                                tolerant=True, track_clock=False)
+        compared = min(num_bits, result.num_bits)
+        errors = int(np.count_nonzero(bits[:compared] != result.bits[:compared])) + abs(num_bits - result.num_bits)
+        points.append({"snr_db": snr_db, "bits": num_bits, "bit_errors": errors, "ber": errors / num_bits,
+                       "violations": len(result.violations), "elapsed_ms": (time.perf_counter() - started) * 1e3})
+    return points
+
+
+def ber_sweep(mod_types, snr_points: Sequence[float], num_bits: int, samples_per_bit: int,
+              channel: ChannelParams, seed: Optional[int] = None) -> dict:
+    """Curvas BER-SNR de varios códigos con una semilla común (devuelta para reproducirlas)."""
+    seed = int(np.random.SeedSequence(seed).entropy) % 2 ** 63 if seed is None else seed
+    rng = np.random.default_rng(seed)
+    curves = [{"modulation": get_line_code(mod_type).name,
+               "points": ber_curve(mod_type, snr_points, num_bits, samples_per_bit, channel, rng)}
+              for mod_type in mod_types]
+    return {"seed": seed, "curves": curves}
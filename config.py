@@ -1,13 +1,109 @@
-﻿# --- Parámetros Comunes ---
+﻿import os
+import tempfile
+from typing import Optional, Tuple
+
+# --- Servidor (`python server.py`) ---
+APP_ENV: str = os.getenv("APP_ENV", "development")  # "development" (un proceso, recarga automática) o "production"
+APP_HOST: str = os.getenv("APP_HOST", "0.0.0.0")
+APP_PORT: int = int(os.getenv("APP_PORT", "8000"))
+APP_WORKERS: int = max(1, int(os.getenv("APP_WORKERS", "1")))  # Procesos de uvicorn en producción (uno solo con GPIO activo)
+
+# --- Parámetros Comunes ---
 BIT_DURATION: float = 0.1  # Duración de bit por defecto en segundos
 SAMPLES_PER_BIT: int = 100
+MIN_BIT_DURATION: float = 1e-6  # Límites de la duración de bit y las muestras por bit de cada solicitud
+MAX_BIT_DURATION: float = 10.0
+MAX_SAMPLES_PER_BIT: int = 1000
 VOLTAGE_HIGH: int = 1  # Nivel lógico/voltaje para '1' en algunas modulaciones
 VOLTAGE_LOW_BIPOLAR: int = -1  # Nivel bajo para señales bipolares
 VOLTAGE_LOW_UNIPOLAR: int = 0  # Nivel bajo/cero para señales unipolares
 
+# --- Mensajes largos y generación por bloques ---
+MAX_MESSAGE_BITS: int = 64 * 1024 * 1024  # Longitud máxima del mensaje (bits) aceptada por la API
+MAX_PLOT_BITS: int = 256  # Bits máximos que se dibujan en una gráfica
+CHUNK_BITS: int = 4096  # Bits por bloque en la generación por bloques (múltiplo de 8)
+WAVEFORM_CACHE_MAX_BYTES: int = 16 * 1024 * 1024  # Tablas de formas de onda por (código, muestras por bit)
+TIME_TEMPLATE_CACHE_ENTRIES: int = 64  # Bases de tiempo de un bit por (muestras por bit, duración de bit)
+
+# --- Caché de gráficas ---
+PLOT_CACHE_MAX_BYTES: int = 32 * 1024 * 1024  # Tamaño máximo en memoria de las imágenes en caché
+PLOT_CACHE_DIR: Optional[str] = None  # Directorio para volcar a disco lo desalojado (None = sin disco)
+PLOT_CACHE_DISK_MAX_BYTES: int = 256 * 1024 * 1024  # Tamaño máximo en disco
+PLOT_CACHE_WARMUP: bool = False  # Pre-renderizar al arrancar todos los mensajes de PLOT_CACHE_WARMUP_BITS bits
+PLOT_CACHE_WARMUP_BITS: int = 5
+
+# --- Lotes de modulaciones ---
+MAX_BATCH_MESSAGES: int = 32  # Mensajes por solicitud de lote
+MAX_BATCH_PANELS: int = 64  # Combinaciones mensaje × modulación por solicitud
+BATCH_WORKERS: int = 4  # Hilos del pool que reparte el dibujo de los paneles (con `parallel`)
+
+# --- Ejecutor de renderizado ---
+RENDER_EXECUTOR: str = "process"  # "process" (un proceso por núcleo), "thread" o "inline" (en el bucle de eventos)
+RENDER_WORKERS: int = max(1, (os.cpu_count() or 1) // APP_WORKERS)  # Procesos/hilos de renderizado (por proceso del servidor)
+RENDER_MAX_PENDING: int = 2 * RENDER_WORKERS  # Renders en curso o en espera; más allá se responde 503
+RENDER_TIMEOUT_S: float = 30.0  # Tiempo máximo de espera por render (también límite de `render_timeout_s`)
+RENDER_RETRY_AFTER_S: int = 1  # Valor de Retry-After en las respuestas 503
+RENDER_START_METHOD: str = "spawn"  # Arranque de los procesos ("spawn" evita heredar hilos y locks del servidor)
+
+# --- Decodificación y verificación de ida y vuelta ---
+MAX_DECODE_BYTES: int = 256 * 1024 * 1024  # Tamaño máximo del buffer aceptado por /demodulate
+MAX_DECODE_SAMPLES: int = 256 * 1024 * 1024  # Muestras máximas al expandir una lista de transiciones
+MAX_REPORTED_VIOLATIONS: int = 1000  # Índices de violación devueltos como mucho (el recuento es siempre completo)
+ROUNDTRIP_MAX_BITS: int = 1_000_000  # Bits por prueba en /verify/roundtrip
+ROUNDTRIP_MAX_TRIALS: int = 100  # Pruebas por modulación en /verify/roundtrip
+ROUNDTRIP_MAX_TOTAL_BITS: int = 20_000_000  # Bits verificados como mucho por solicitud (modulaciones × pruebas × bits)
+ROUNDTRIP_SAMPLES_PER_BIT: int = 20  # Muestras por bit de las señales de prueba (4 por chip en 4B5B)
+
+# --- Simulación de canal ---
+EYE_SAMPLES_PER_BIT: int = 32  # Muestras por bit por defecto en el diagrama de ojo
+EYE_DEFAULT_BITS: int = 2000  # Bits aleatorios del diagrama de ojo si no se envía mensaje
+EYE_MAX_BITS: int = 200_000  # Bits máximos superpuestos en un diagrama de ojo
+EYE_MAX_POINTS: int = 20_000_000  # Puntos interpolados como mucho al plegar la señal
+BER_SAMPLES_PER_BIT: int = 20  # Muestras por bit por defecto en las curvas BER (4 por chip en 4B5B)
+BER_MAX_POINTS: int = 64  # Puntos de SNR por curva
+BER_MAX_TOTAL_BITS: int = 20_000_000  # Bits simulados como mucho por solicitud (modulaciones × puntos × bits)
+SIMULATION_MAX_SAMPLES: int = 32 * 1024 * 1024  # Muestras por señal simulada (bits × muestras por bit) en BER, ojo e ida y vuelta
+
+# --- Análisis espectral (PSD de Welch) ---
+PSD_SAMPLES_PER_BIT: int = 16  # Muestras por bit por defecto (frecuencia máxima = 8 veces la tasa de bits)
+PSD_SEGMENT_BITS: int = 64  # Bits por segmento de Welch por defecto (resolución = Rb / segmento)
+PSD_MAX_SEGMENT_SAMPLES: int = 1 << 16  # Muestras máximas por segmento
+PSD_BLOCK_SEGMENTS: int = 256  # Segmentos por lote de FFT (acota la memoria con mensajes largos)
+PSD_RANDOM_BITS: int = 1 << 18  # Bits aleatorios con los que se estima el espectro de cada código
+PSD_MAX_MESSAGE_SAMPLES: int = 64 * 1024 * 1024  # Muestras analizadas como mucho con mensaje (modulaciones × bits × muestras por bit)
+PSD_CACHE_ENTRIES: int = 64  # Espectros memorizados como mucho
+
+# --- Registro y métricas ---
+LOG_LEVEL: str = (os.getenv("LOG_LEVEL") or "INFO").strip().upper()  # DEBUG, INFO, WARNING, ERROR, CRITICAL u OFF (sin registro, p. ej. en producción)
+LOG_LEVELS: Tuple[str, ...] = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL", "OFF")
+if LOG_LEVEL not in LOG_LEVELS:
+    raise ValueError(f"LOG_LEVEL='{LOG_LEVEL}' no es válido. Opciones: {', '.join(LOG_LEVELS)}.")
+METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "1") != "0"  # Con "0" las métricas no registran nada
+
 # --- Pin GPIO de Salida ---
 DEFAULT_OUTPUT_PIN: int = 17
 GPIO_PIN_MIN: int = 2
 GPIO_PIN_MAX: int = 27
+GPIO_SPIN_THRESHOLD_S: float = 0.0002  # Margen final de espera activa antes de cada flanco (segundos)
+GPIO_TIMING_MARGIN: float = 4.0  # El intervalo mínimo entre escrituras debe superar este múltiplo de la latencia p99
+GPIO_TIMING_HISTORY: int = 100_000  # Latencias de escritura recordadas de los envíos anteriores
+GPIO_REPORT_SAMPLES: int = 100_000  # Errores por pin con los que se estima el p99 del informe (muestreo de reservorio)
+GPIO_DEFAULT_WRITE_S: float = 20e-6  # Coste estimado de una escritura mientras no haya envíos medidos
+GPIO_CALIBRATION_WAITS: int = 200  # Esperas cortas con las que se mide la precisión del bucle de temporización
+
+# --- Backend GPIO (se carga en el primer uso) ---
+GPIO_BACKEND: str = os.getenv("GPIO_BACKEND", "auto")  # "auto" (RPi.GPIO si está disponible), "rpi", "pigpio", "simulated" o "none"
+GPIO_LOCK_DIR: Optional[str] = os.getenv("GPIO_LOCK_DIR", os.path.join(tempfile.gettempdir(), "modulador-gpio")) or None  # Bloqueos de pin entre procesos ("" = solo dentro del proceso)
+GPIO_SIMULATOR_MAX_EVENTS: int = 1_000_000  # Escrituras que recuerda el backend simulado (las más antiguas se descartan)
+PIGPIO_HOST: str = os.getenv("PIGPIO_HOST", "localhost")  # Demonio pigpiod
+PIGPIO_PORT: int = int(os.getenv("PIGPIO_PORT", "8888"))
+PIGPIO_SAMPLE_US: int = 5  # Resolución de muestreo del DMA de pigpiod (`pigpiod -s`, 5 us por defecto)
+PIGPIO_WAVE_PULSES: int = 2000  # Flancos por forma de onda DMA (los envíos largos se encadenan en varias)
+
+# --- Cola de transmisiones GPIO ---
+GPIO_QUEUE_SIZE: int = 32  # Trabajos en espera como máximo (más allá se responde 429)
+GPIO_WORKERS: int = 4  # Hilos que ejecutan transmisiones (pines distintos en paralelo)
+GPIO_JOB_HISTORY: int = 200  # Trabajos recordados para consulta (los terminados más antiguos se olvidan)
+GPIO_JOB_MAX_WAIT_S: float = 60.0  # Espera máxima admitida en /gpio/jobs/{id}/wait
 
 GPIO_CONSUMER_NAME: str = "ModuladorFastAPI"
\ No newline at end of file
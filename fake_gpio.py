@@ -0,0 +1,78 @@
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+
+class FakeGPIO:
+    """
+    Sustituto en memoria de `RPi.GPIO` para pruebas y equipos sin Raspberry Pi.
+
+    Implementa la parte de la API que usa `gpio_handler` (setmode, setwarnings, setup, output,
+    cleanup) y registra cada escritura como `(timestamp, pin, estado)` con `time.perf_counter()`;
+    con `max_events` solo se conservan las más recientes. Se activa con
+    `gpio_handler.set_gpio_module(FakeGPIO())` o, como backend, con `GPIO_BACKEND=simulated`.
+    """
+    BCM = 11
+    BOARD = 10
+    OUT = 0
+    IN = 1
+    LOW = 0
+    HIGH = 1
+
+    def __init__(self, max_events: Optional[int] = None):
+        self._lock = threading.Lock()
+        self.mode = None
+        self.pin_states: Dict[int, int] = {}
+        self.events = deque(maxlen=max_events)  # (timestamp, pin, estado)
+
+    def setmode(self, mode):
+        self.mode = mode
+
+    def setwarnings(self, flag):
+        pass
+
+    def setup(self, channel, direction, initial=LOW):
+        for pin in self._channels(channel):
+            self._write(pin, initial, time.perf_counter())
+
+    def output(self, channel, state):
+        timestamp = time.perf_counter()
+        for pin in self._channels(channel):
+            self._write(pin, state, timestamp)
+
+    def cleanup(self, channel=None):
+        with self._lock:
+            pins = list(self.pin_states) if channel is None else self._channels(channel)
+            for pin in pins:
+                self.pin_states.pop(pin, None)
+
+    # --- Consulta de lo registrado ---
+
+    def edges(self, pin: int) -> List[Tuple[float, int]]:
+        """Flancos reales del pin: `(timestamp, nuevo_estado)` solo cuando el estado cambia."""
+        edges, last = [], None
+        for timestamp, event_pin, state in self.snapshot():
+            if event_pin == pin and state != last:
+                edges.append((timestamp, state))
+                last = state
+        return edges
+
+    def snapshot(self) -> List[Tuple[float, int, int]]:
+        """Copia de las escrituras registradas (segura aunque otro hilo siga escribiendo)."""
+        with self._lock:
+            return list(self.events)
+
+    def clear(self):
+        with self._lock:
+            self.events.clear()
+
+    @staticmethod
+    def _channels(channel) -> List[int]:
+        return list(channel) if isinstance(channel, (list, tuple)) else [channel]
+
+    def _write(self, pin: int, state, timestamp: float):
+        state = int(bool(state))
+        with self._lock:
+            self.pin_states[pin] = state
+            self.events.append((timestamp, pin, state))
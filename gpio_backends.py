@@ -0,0 +1,288 @@
+"""
+Backends de salida GPIO.
+
+`gpio_handler` escribe los pines a través de un `GpioBackend`, elegido con `GPIO_BACKEND`:
+
+- `rpi`: RPi.GPIO; la temporización la hace el bucle de software de `gpio_handler`.
+- `pigpio`: el demonio pigpiod reproduce el calendario de flancos como formas de onda DMA
+  (temporización por hardware con la resolución de muestreo del demonio, `PIGPIO_SAMPLE_US`).
+- `simulated`: `fake_gpio.FakeGPIO` registra en memoria el instante de cada escritura; el envío
+  completo (cola, bucle de temporización, informe) se puede probar y medir sin Raspberry Pi.
+- `auto`: `rpi` si la librería está disponible; si no, GPIO desactivado.
+
+Las librerías se importan al crear el backend (`create_backend`), no al importar el módulo.
+"""
+import contextlib
+import itertools
+import os
+import threading
+import time
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from app_logging import get_logger
+from config import GPIO_LOCK_DIR, GPIO_SIMULATOR_MAX_EVENTS
+from config import PIGPIO_HOST, PIGPIO_PORT, PIGPIO_SAMPLE_US, PIGPIO_WAVE_PULSES
+from fake_gpio import FakeGPIO
+
+try:
+    import fcntl
+except ImportError:  # Windows: los bloqueos quedan limitados al proceso
+    fcntl = None
+
+logger = get_logger("gpio")
+
+_POLL_S = 0.001  # Intervalo de sondeo mientras pigpiod reproduce una forma de onda
+
+
+class TransmissionCancelled(Exception):
+    """El envío se interrumpió porque se activó su evento de cancelación."""
+
+
+def _channel_list(channels) -> List[int]:
+    return list(channels) if isinstance(channels, (list, tuple)) else [channels]
+
+
+class FileLock:
+    """
+    Bloqueo exclusivo entre procesos (`flock` sobre un fichero de GPIO_LOCK_DIR), para que varios
+    procesos del servidor no escriban el mismo pin a la vez. Sin `fcntl` o sin GPIO_LOCK_DIR no
+    bloquea nada. No es reentrante ni seguro entre hilos: se usa bajo un `threading.Lock`.
+    """
+
+    def __init__(self, name: str, lock_dir: Optional[str] = GPIO_LOCK_DIR):
+        self.path = os.path.join(lock_dir, f"{name}.lock") if lock_dir and fcntl is not None else None
+        self._fd: Optional[int] = None
+
+    def acquire(self, blocking: bool = True, cancel_event: Optional[threading.Event] = None) -> bool:
+        if self.path is None:
+            return True
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666)
+        except OSError as e:
+            logger.warning("Sin bloqueo entre procesos para %s: %s", self.path, e)
+            return True
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                self._fd = fd
+                return True
+            except BlockingIOError:
+                if not blocking:
+                    os.close(fd)
+                    return False
+            if cancel_event is not None and cancel_event.wait(_POLL_S):
+                os.close(fd)
+                raise TransmissionCancelled()
+            if cancel_event is None:
+                time.sleep(_POLL_S)
+
+    def release(self):
+        fd, self._fd = self._fd, None
+        if fd is not None:
+            os.close(fd)  # Cerrar el descriptor libera el flock
+
+
+class GpioBackend:
+    """
+    Interfaz de los backends. `write(canales, estado)` es la escritura del bucle temporizado
+    (`canales` es un pin o una lista). Los backends con `hardware_timed` reproducen ellos mismos
+    el calendario de flancos en `play_edges` y declaran su resolución en `min_interval_s`.
+    """
+    name = "base"
+    hardware_timed = False
+    interprocess_locks = True  # Los pines son hardware compartido por todos los procesos
+    HIGH = 1
+    LOW = 0
+
+    def prepare(self, pins: Sequence[int]):
+        """Configura los pines como salida, en LOW."""
+        raise NotImplementedError
+
+    def write(self, channels, state):
+        raise NotImplementedError
+
+    def release(self, pins: Sequence[int]):
+        """Devuelve los pines a su estado por defecto (sin lanzar excepciones)."""
+        raise NotImplementedError
+
+    def min_interval_s(self) -> Optional[float]:
+        """Separación mínima entre flancos en backends temporizados por hardware (None en los demás)."""
+        return None
+
+    def play_edges(self, blocks: Iterable, record: Callable[[np.ndarray, np.ndarray], None],
+                   cancel_event: Optional[threading.Event] = None):
+        """
+        Reproduce los bloques `(grupos, pines)` de `gpio_handler._iter_pin_schedule`, consumiéndolos
+        a medida que hacen falta, y entrega el error de cada flanco (s) de cada bloque con
+        `record(errores, pines)`. Solo en backends con `hardware_timed`.
+        """
+        raise NotImplementedError
+
+
+class ModuleBackend(GpioBackend):
+    """Backend sobre un módulo con la API de RPi.GPIO (el real o `fake_gpio.FakeGPIO`)."""
+    interprocess_locks = False
+
+    def __init__(self, module, name: str = "module"):
+        self.module = module
+        self.name = name
+        self.HIGH, self.LOW = module.HIGH, module.LOW
+        self.write = module.output  # Sin capas intermedias en el bucle temporizado
+
+    def prepare(self, pins: Sequence[int]):
+        self.module.setmode(self.module.BCM)
+        self.module.setwarnings(False)
+        for pin in pins:
+            self.module.setup(pin, self.module.OUT, initial=self.module.LOW)
+
+    def release(self, pins: Sequence[int]):
+        for pin in pins:
+            with contextlib.suppress(Exception):
+                self.module.cleanup(pin)  # Limpiar solo los pines usados
+
+
+class RpiGpioBackend(ModuleBackend):
+    """RPi.GPIO: solo se puede importar (y solo funciona) en una Raspberry Pi."""
+    interprocess_locks = True
+
+    def __init__(self):
+        import RPi.GPIO as GPIO
+        super().__init__(GPIO, "rpi")
+
+
+class SimulatedGpioBackend(ModuleBackend):
+    """Backend en memoria: cada escritura queda registrada en `recorder` (un `FakeGPIO`)."""
+
+    def __init__(self, max_events: Optional[int] = GPIO_SIMULATOR_MAX_EVENTS):
+        super().__init__(FakeGPIO(max_events), "simulated")
+
+    @property
+    def recorder(self) -> FakeGPIO:
+        return self.module
+
+
+class PigpioBackend(GpioBackend):
+    """
+    pigpiod con formas de onda DMA: el calendario de flancos se convierte en pulsos (máscaras de
+    pines a subir y bajar, más la espera hasta el siguiente flanco, en microsegundos) y se
+    reproduce sin intervención de la CPU. Los envíos largos se dividen en formas de onda de
+    PIGPIO_WAVE_PULSES flancos encadenadas con `WAVE_MODE_ONE_SHOT_SYNC`; los pulsos de cada una se
+    construyen justo antes de enviarla. pigpiod reproduce una sola forma de onda a la vez, así que
+    los envíos se serializan (también entre procesos).
+    """
+    name = "pigpio"
+    hardware_timed = True
+
+    def __init__(self, host: str = PIGPIO_HOST, port: int = PIGPIO_PORT):
+        import pigpio
+        self._pigpio = pigpio
+        self.pi = pigpio.pi(host, port)
+        if not self.pi.connected:
+            raise RuntimeError(f"No se pudo conectar con pigpiod en {host}:{port}.")
+        self._wave_lock = threading.Lock()
+        self._wave_file_lock = FileLock("pigpio-wave")
+
+    def prepare(self, pins: Sequence[int]):
+        for pin in pins:
+            self.pi.set_mode(pin, self._pigpio.OUTPUT)
+            self.pi.write(pin, 0)
+
+    def write(self, channels, state):
+        for pin in _channel_list(channels):
+            self.pi.write(pin, state)
+
+    def release(self, pins: Sequence[int]):
+        for pin in pins:
+            with contextlib.suppress(Exception):
+                self.pi.set_mode(pin, self._pigpio.INPUT)
+
+    def min_interval_s(self) -> float:
+        return PIGPIO_SAMPLE_US * 1e-6
+
+    def play_edges(self, blocks: Iterable, record: Callable[[np.ndarray, np.ndarray], None],
+                   cancel_event: Optional[threading.Event] = None):
+        with self._wave_lock:
+            self._wave_file_lock.acquire(cancel_event=cancel_event)
+            try:
+                self._transmit(self._iter_pulses(blocks, record), cancel_event)
+            finally:
+                self._wave_file_lock.release()
+
+    def _iter_pulses(self, blocks: Iterable, record: Callable[[np.ndarray, np.ndarray], None]) -> Iterator:
+        """
+        Pulsos de los bloques del calendario, en orden. La espera de cada pulso es la distancia al
+        flanco siguiente, así que el último de cada bloque se emite al conocer el primero del bloque
+        siguiente. El error de cada flanco es el redondeo de su instante al microsegundo.
+        """
+        last = None  # (máscara a subir, máscara a bajar, instante en us) del último flanco aún sin emitir
+        for groups, event_pins in blocks:
+            # Instantes absolutos redondeados al microsegundo: el redondeo no se acumula entre pulsos
+            deadlines = np.fromiter((group[0] for group in groups), dtype=np.float64, count=len(groups))
+            deadlines_us = np.rint(deadlines * 1e6).astype(np.int64)
+            errors = np.empty(len(event_pins))
+            for (deadline, channels, state, begin, end), deadline_us in zip(groups, deadlines_us.tolist()):
+                if last is not None:
+                    yield self._pigpio.pulse(last[0], last[1], deadline_us - last[2])
+                mask = sum(1 << pin for pin in _channel_list(channels))
+                last = (mask if state else 0, 0 if state else mask, deadline_us)
+                errors[begin:end] = deadline_us * 1e-6 - deadline
+            record(errors, event_pins)
+        if last is not None:
+            yield self._pigpio.pulse(last[0], last[1], 0)
+
+    def _wait(self, cancel_event: Optional[threading.Event]):
+        if cancel_event is None:
+            time.sleep(_POLL_S)
+        elif cancel_event.wait(_POLL_S):
+            self.pi.wave_tx_stop()
+            raise TransmissionCancelled()
+
+    def _transmit(self, pulses: Iterator, cancel_event: Optional[threading.Event]):
+        pending = []  # Formas de onda enviadas y aún no borradas, en orden
+        try:
+            while True:
+                wave = list(itertools.islice(pulses, PIGPIO_WAVE_PULSES))
+                if not wave:
+                    break
+                # Como mucho una forma de onda en cola detrás de la que se está reproduciendo
+                while len(pending) > 1 and self.pi.wave_tx_at() == pending[0]:
+                    self._wait(cancel_event)
+                if len(pending) > 1:
+                    self.pi.wave_delete(pending.pop(0))
+                self.pi.wave_add_generic(wave)
+                wave_id = self.pi.wave_create()
+                self.pi.wave_send_using_mode(wave_id, self._pigpio.WAVE_MODE_ONE_SHOT_SYNC)
+                pending.append(wave_id)
+            while self.pi.wave_tx_busy():
+                self._wait(cancel_event)
+        finally:
+            for wave_id in pending:
+                with contextlib.suppress(Exception):
+                    self.pi.wave_delete(wave_id)
+
+
+BACKENDS = {"rpi": RpiGpioBackend, "pigpio": PigpioBackend, "simulated": SimulatedGpioBackend}
+
+
+def create_backend(name: str) -> Optional[GpioBackend]:
+    """
+    Crea el backend `name` (ver el docstring del módulo). Devuelve None, registrando el motivo,
+    si es "none", si no existe o si su librería no está disponible.
+    """
+    if name == "none":
+        logger.info("GPIO desactivado (GPIO_BACKEND=none).")
+        return None
+    if name != "auto" and name not in BACKENDS:
+        logger.error("GPIO_BACKEND desconocido: '%s'. Opciones: auto, none, %s.", name, ", ".join(BACKENDS))
+        return None
+    try:
+        backend = BACKENDS["rpi" if name == "auto" else name]()
+    except (ImportError, RuntimeError, OSError) as e:
+        log = logger.warning if name == "auto" else logger.error
+        log("Backend GPIO '%s' no disponible: %s", name, e)
+        return None
+    logger.info("Backend GPIO '%s' cargado.", backend.name)
+    return backend
@@ -1,89 +1,566 @@
 ﻿import time
 import threading
 import contextlib
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Sequence, Union
 import numpy as np
-from config import SAMPLES_PER_BIT, BIT_DURATION  # Necesitamos SAMPLES_PER_BIT
-
-# --- Intentar importar la librería GPIO ---
-try:
-    import RPi.GPIO as GPIO
-    ON_RASPBERRY_PI = True
-    print("INFO: Librería RPi.GPIO cargada.")
-    # No hacer setmode global aquí, hacerlo por request/función
-except (ImportError, RuntimeError, Exception) as e:
-    print(f"ADVERTENCIA: Librería RPi.GPIO no disponible o error: {e}")
-    ON_RASPBERRY_PI = False
-    GPIO = None
-
-# --- Estado Global y Bloqueo para GPIO ---
-gpio_lock = threading.Lock()
-is_gpio_sending = False
+from config import GPIO_SPIN_THRESHOLD_S, GPIO_TIMING_MARGIN, GPIO_TIMING_HISTORY, GPIO_DEFAULT_WRITE_S
+from config import GPIO_CALIBRATION_WAITS, GPIO_BACKEND, GPIO_REPORT_SAMPLES
+from app_logging import get_logger
+from gpio_backends import FileLock, GpioBackend, ModuleBackend, TransmissionCancelled, create_backend
+from line_codes import get_line_code
+from metrics import GPIO_EDGE_ERROR_SECONDS, LOCK_ACQUISITIONS, STAGE_SECONDS
+from models import GpioPlaybackMode
+from signal_types import ModulatedSignal
+
+logger = get_logger("gpio")
+
+# --- Backend GPIO ---
+# Se crea en el primer uso (no al importar): la librería del hardware solo se carga si hace falta.
+_backend: Optional[GpioBackend] = None
+_backend_resolved = False
+_backend_guard = threading.Lock()
+
+def get_gpio_backend() -> Optional[GpioBackend]:
+    """Backend GPIO en uso (según GPIO_BACKEND), o None si GPIO no está disponible."""
+    global _backend, _backend_resolved
+    with _backend_guard:
+        if not _backend_resolved:
+            _backend = create_backend(GPIO_BACKEND)
+            _backend_resolved = True
+        return _backend
+
+def set_gpio_backend(backend: Optional[GpioBackend]):
+    """Sustituye el backend usado para los envíos. Con `None` la funcionalidad GPIO queda desactivada."""
+    global _backend, _backend_resolved, _calibrated_wait_s
+    with _backend_guard:
+        _backend, _backend_resolved = backend, True
+    # Las latencias medidas con el backend anterior ya no son representativas
+    with _timing_lock:
+        _write_latencies.clear()
+        _calibrated_wait_s = None
+
+def set_gpio_module(module):
+    """
+    Sustituye el módulo GPIO usado para los envíos por otro con la API de RPi.GPIO
+    (p. ej. `fake_gpio.FakeGPIO()` en pruebas). Con `None` la funcionalidad GPIO queda desactivada.
+    """
+    set_gpio_backend(None if module is None else ModuleBackend(module))
+
+# --- Estado Global y Bloqueos por pin ---
+# Cada pin tiene su propio bloqueo: envíos a pines distintos pueden ejecutarse a la vez. Con hardware
+# real el bloqueo se extiende a los demás procesos del servidor con un `FileLock` por pin.
+_pin_locks: Dict[int, threading.Lock] = {}
+_pin_file_locks: Dict[int, FileLock] = {}
+_pin_locks_guard = threading.Lock()
+_busy_pins = set()
+
+def _get_pin_lock(pin: int) -> threading.Lock:
+    with _pin_locks_guard:
+        return _pin_locks.setdefault(pin, threading.Lock())
+
+def _get_pin_file_lock(pin: int) -> FileLock:
+    with _pin_locks_guard:
+        return _pin_file_locks.setdefault(pin, FileLock(f"pin{pin}"))
+
+def _acquire_pins(pins: Sequence[int], interprocess: bool = False,
+                  cancel_event: Optional[threading.Event] = None):
+    """
+    Adquiere los bloqueos de todos los pines o ninguno. Dentro del proceso no espera: lanza
+    ValueError si alguno está ocupado (la cola ya serializa los trabajos que comparten pines). Un
+    pin ocupado por otro proceso se espera, en orden de pin para no bloquearse entre procesos;
+    si se activa `cancel_event` durante la espera se lanza `TransmissionCancelled`.
+    """
+    acquired = []
+    try:
+        for pin in sorted(set(pins)):
+            lock = _get_pin_lock(pin)
+            if not lock.acquire(blocking=False):
+                LOCK_ACQUISITIONS.inc(lock="gpio_pin", result="contended")
+                raise ValueError(f"GPIO ya está en uso enviando otra señal (pin {pin}).")
+            if interprocess and not _get_pin_file_lock(pin).acquire(blocking=False):
+                LOCK_ACQUISITIONS.inc(lock="gpio_pin", result="contended")
+                logger.info("Pin %d ocupado por otro proceso; esperando a que se libere.", pin)
+                try:
+                    _get_pin_file_lock(pin).acquire(cancel_event=cancel_event)
+                except TransmissionCancelled:
+                    lock.release()
+                    raise
+            acquired.append(pin)
+            _busy_pins.add(pin)
+    except (ValueError, TransmissionCancelled):
+        _release_pins(acquired, interprocess)
+        raise
+    LOCK_ACQUISITIONS.inc(len(acquired), lock="gpio_pin", result="uncontended")
+
+def _release_pins(pins: Sequence[int], interprocess: bool = False):
+    for pin in sorted(set(pins)):
+        _busy_pins.discard(pin)
+        if interprocess:
+            _get_pin_file_lock(pin).release()
+        _get_pin_lock(pin).release()
 
 def get_gpio_state():
-    """Devuelve el estado actual del handler GPIO."""
+    """Devuelve el estado actual del handler GPIO (los pines ocupados son los de este proceso)."""
+    backend = get_gpio_backend()
+    busy_pins = sorted(_busy_pins)
     return {
-        "functional": ON_RASPBERRY_PI,
-        "busy": is_gpio_sending,
-        "locked": gpio_lock.locked()
+        "functional": backend is not None,
+        "backend": backend.name if backend is not None else None,
+        "busy": bool(busy_pins),
+        "locked": any(lock.locked() for lock in list(_pin_locks.values())),
+        "busy_pins": busy_pins,
     }
 
-def send_to_gpio(output_pin: int, t: np.ndarray, modulated_signal: np.ndarray):
+def iter_gpio_edges(modulated_signal: Union[ModulatedSignal, Iterable[ModulatedSignal]]):
     """
-    Envía la señal modulada DIGITAL a un pin GPIO específico.
-    Esta función es BLOQUEANTE mientras dura el envío.
-    Utiliza RPi.GPIO. Lanza ValueError en caso de error o si GPIO no está disponible/ocupado.
+    Flancos a reproducir, bloque a bloque: `(deadlines, states)` por cada bloque de la señal, donde
+    `deadlines[k]` es el instante (segundos desde el inicio) en que el pin debe pasar a `states[k]`.
+    Solo se incluyen cambios reales del estado digital (niveles -1 y 0 son ambos LOW), también
+    respecto al bloque anterior, más un flanco final a LOW al terminar la señal.
     """
-    global is_gpio_sending # Necesitamos modificar el estado global
+    chunks = [modulated_signal] if isinstance(modulated_signal, ModulatedSignal) else modulated_signal
+    last_state = None
+    end_time = 0.0
+    for chunk in chunks:
+        starts, levels = chunk.transitions()
+        states = (levels > 0).astype(np.int8)
+        # Descartar tramos cuyo estado digital no cambia (también respecto al bloque anterior)
+        changed = np.ones(len(states), dtype=bool)
+        changed[1:] = states[1:] != states[:-1]
+        if len(states) and last_state is not None:
+            changed[0] = states[0] != last_state
+        if len(states):
+            last_state = states[-1]
+        end_time = chunk.start_time + chunk.duration
+        if np.any(changed):
+            yield (chunk.start_sample + starts[changed]) * chunk.sample_duration, states[changed]
+    yield np.array([end_time]), np.array([0], dtype=np.int8)
 
-    if not ON_RASPBERRY_PI or GPIO is None:
-        print("ERROR Interno: Intento de enviar a GPIO sin librería disponible.")
-        raise ValueError("Funcionalidad GPIO no disponible en el servidor.")
+def compile_gpio_edges(modulated_signal: Union[ModulatedSignal, Iterable[ModulatedSignal]]):
+    """
+    Todos los flancos de `iter_gpio_edges` en dos arrays `(deadlines, states)`. La memoria depende
+    del número de transiciones: los envíos los recorren por bloques, sin compilarlos enteros.
+    """
+    deadline_parts, state_parts = zip(*iter_gpio_edges(modulated_signal))
+    return np.concatenate(deadline_parts), np.concatenate(state_parts)
+
+def _wait_until(deadline: float, cancel_event: Optional[threading.Event] = None):
+    """
+    Espera hasta `deadline` (perf_counter): duerme mientras queda margen y termina con espera activa.
+    Si se da `cancel_event`, la espera larga se hace sobre el evento para poder interrumpirla.
+    """
+    while True:
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            return
+        if remaining > GPIO_SPIN_THRESHOLD_S:
+            if cancel_event is None:
+                time.sleep(remaining - GPIO_SPIN_THRESHOLD_S)
+            elif cancel_event.wait(remaining - GPIO_SPIN_THRESHOLD_S):
+                raise TransmissionCancelled()
+
+# --- Temporización alcanzable ---
+# Retraso de cada escritura respecto a su instante programado en los envíos anteriores. Junto con
+# una calibración del bucle de espera permite rechazar tasas que el servidor no puede mantener.
+_write_latencies = deque(maxlen=GPIO_TIMING_HISTORY)
+_calibrated_wait_s: Optional[float] = None
+_timing_lock = threading.Lock()
+
+def _calibrate_wait_loop(waits: int = GPIO_CALIBRATION_WAITS) -> float:
+    """p99 del retraso de `_wait_until` en esperas cortas (solo el bucle de espera, sin escribir pines)."""
+    lateness = np.empty(waits)
+    for i in range(waits):
+        deadline = time.perf_counter() + GPIO_SPIN_THRESHOLD_S / 4
+        _wait_until(deadline)
+        lateness[i] = time.perf_counter() - deadline
+    return float(np.percentile(lateness, 99))
+
+def _record_latencies(errors: np.ndarray):
+    with _timing_lock:
+        _write_latencies.extend(np.abs(errors[-GPIO_TIMING_HISTORY:]).tolist())
+
+def achievable_timing() -> dict:
+    """
+    Intervalo mínimo entre escrituras que el bucle de temporización puede mantener: la latencia p99
+    de escritura por GPIO_TIMING_MARGIN. La latencia sale de los envíos anteriores; si aún no hay
+    ninguno, de la calibración del bucle de espera más el coste estimado de una escritura. Con un
+    backend temporizado por hardware es su resolución (`source` = "hardware").
+    """
+    global _calibrated_wait_s
+    backend = get_gpio_backend()
+    hardware_interval = backend.min_interval_s() if backend is not None else None
+    if hardware_interval is not None:
+        return {"latency_p99_s": hardware_interval, "min_interval_s": hardware_interval,
+                "source": "hardware", "samples": 0}
+    with _timing_lock:
+        history = np.fromiter(_write_latencies, dtype=np.float64, count=len(_write_latencies))
+    if len(history):
+        latency, source = float(np.percentile(history, 99)), "measured"
+    else:
+        if _calibrated_wait_s is None:
+            _calibrated_wait_s = _calibrate_wait_loop()
+        latency, source = _calibrated_wait_s + GPIO_DEFAULT_WRITE_S, "calibrated"
+    return {"latency_p99_s": latency, "min_interval_s": latency * GPIO_TIMING_MARGIN,
+            "source": source, "samples": int(len(history))}
+
+def required_write_interval(mod_type, samples_per_bit: int, bit_duration: float,
+                            mode: GpioPlaybackMode = GpioPlaybackMode.EDGES,
+                            skews_s: Optional[Sequence[float]] = None) -> float:
+    """
+    Separación mínima entre dos escrituras consecutivas al reproducir la señal: una muestra en
+    modo `samples`; en modo `edges` el chip más corto del código, o menos si los desfases entre
+    pines acercan los flancos de pines distintos.
+    """
+    sample_duration = bit_duration / samples_per_bit
+    if mode == GpioPlaybackMode.SAMPLES:
+        return sample_duration
+    interval = (samples_per_bit // get_line_code(mod_type).chips_per_bit) * sample_duration
+    if skews_s is not None and interval > 0:
+        offsets = np.unique(np.mod(np.asarray(skews_s, dtype=np.float64), interval))
+        if len(offsets) > 1:
+            interval = float(np.min(np.diff(np.append(offsets, offsets[0] + interval))))
+    return interval
+
+def check_gpio_rate(mod_type, samples_per_bit: int, bit_duration: float,
+                    mode: GpioPlaybackMode = GpioPlaybackMode.EDGES,
+                    skews_s: Optional[Sequence[float]] = None) -> dict:
+    """
+    Comprueba que la tasa pedida se puede reproducir con la temporización medida.
+    Lanza ValueError (con la duración de bit mínima admisible) si no es así.
+    """
+    required = required_write_interval(mod_type, samples_per_bit, bit_duration, mode, skews_s)
+    timing = achievable_timing()
+    if required < timing["min_interval_s"]:
+        min_bit_duration = bit_duration * timing["min_interval_s"] / required if required > 0 else float("inf")
+        raise ValueError(
+            f"La tasa pedida exige escrituras cada {required * 1e6:.1f} us y el GPIO solo mantiene "
+            f"{timing['min_interval_s'] * 1e6:.1f} us (latencia p99 {timing['latency_p99_s'] * 1e6:.1f} us). "
+            f"Duración de bit mínima con {samples_per_bit} muestras por bit en modo '{mode.value}': "
+            f"{min_bit_duration:.6g} s.")
+    return timing
+
+def _check_cancelled(cancel_event: Optional[threading.Event]):
+    if cancel_event is not None and cancel_event.is_set():
+        raise TransmissionCancelled()
+
+class _ErrorSummary:
+    """
+    Resumen acumulado del error de temporización de un pin (en microsegundos): recuento, media y
+    máximo exactos y p99 sobre una muestra de reservorio de como mucho `capacity` errores, así la
+    memoria no crece con la longitud del envío.
+    """
+
+    def __init__(self, capacity: int = GPIO_REPORT_SAMPLES):
+        self.capacity = capacity
+        self.count = 0
+        self.total_us = 0.0
+        self.max_us = 0.0
+        self._sample = np.empty(0)
+        self._rng = np.random.default_rng(0)
+
+    def add(self, errors: np.ndarray):
+        abs_us = np.abs(errors) * 1e6
+        if not len(abs_us):
+            return
+        self.total_us += float(abs_us.sum())
+        self.max_us = max(self.max_us, float(abs_us.max()))
+        fill = min(self.capacity - len(self._sample), len(abs_us))
+        if fill > 0:
+            self._sample = np.concatenate((self._sample, abs_us[:fill]))
+        rest = abs_us[fill:]
+        if len(rest):
+            # Algoritmo R: el error de índice global j sustituye a uno al azar con probabilidad capacity/(j+1)
+            slots = self._rng.integers(0, self.count + fill + np.arange(1, len(rest) + 1))
+            keep = slots < self.capacity
+            self._sample[slots[keep]] = rest[keep]
+        self.count += len(abs_us)
+
+    def p99_us(self) -> float:
+        return float(np.percentile(self._sample, 99)) if len(self._sample) else 0.0
 
-    # Adquirir bloqueo (no bloqueante, falla rápido si está ocupado)
-    if not gpio_lock.acquire(blocking=False):
-        raise ValueError("GPIO ya está en uso enviando otra señal.")
+class _BlockPipeline:
+    """
+    Bloques del bucle temporizado con precarga: el siguiente bloque se prepara, y los errores del
+    anterior se resumen con `fold`, en el primer hueco entre escrituras que dé para ello (según lo
+    que tardó la última vez), no en la frontera entre bloques. Si ningún hueco basta, se hace al
+    pedir el bloque con `take`.
+    """
+
+    def __init__(self, blocks: Iterable, fold):
+        self._blocks = iter(blocks)
+        self._fold = fold
+        self._next = None
+        self._finished = None  # Errores del último bloque reproducido, aún sin resumir
+        self._exhausted = False
+        self._cost = 0.0
+        self.ready = False  # Nada pendiente: `prefetch` no hace falta
+
+    def _step(self):
+        start = time.perf_counter()
+        if self._finished is not None:
+            finished, self._finished = self._finished, None
+            self._fold(*finished)
+        if self._next is None and not self._exhausted:
+            try:
+                self._next = next(self._blocks)
+            except StopIteration:
+                self._exhausted = True
+        self._cost = time.perf_counter() - start
+        self._update_ready()
+
+    def _update_ready(self):
+        self.ready = self._finished is None and (self._next is not None or self._exhausted)
+
+    def prefetch(self, deadline: float):
+        """Adelanta el trabajo pendiente si cabe (con margen) antes de `deadline`."""
+        if deadline - time.perf_counter() > 2 * self._cost:
+            self._step()
+
+    def take(self):
+        """Siguiente bloque, o None al terminar (tras resumir los errores que falten)."""
+        if self._next is None and not self._exhausted:
+            self._step()
+        block, self._next = self._next, None
+        if block is None and self._finished is not None:
+            self._step()
+        self._update_ready()
+        return block
+
+    def finish(self, *errors):
+        """Entrega los errores del bloque reproducido (se resumen en un hueco posterior)."""
+        self._finished = errors
+        self.ready = False
+
+def _record_errors(errors: np.ndarray, mode: GpioPlaybackMode):
+    """Suma los errores de un bloque a la historia de latencias y a la métrica de error."""
+    _record_latencies(errors)
+    GPIO_EDGE_ERROR_SECONDS.observe_many(np.abs(errors), mode=mode.value)
+
+def _play_samples(backend: GpioBackend, output_pins: List[int], chunks: Iterable[ModulatedSignal],
+                  summary: _ErrorSummary, cancel_event: Optional[threading.Event] = None):
+    """
+    Modo por muestra: escribe todos los pines en cada muestra (en fase, una sola llamada por muestra).
+    El error de cada escritura (s) se guarda en un array preasignado por bloque y se acumula en
+    `summary`, común a todos los pines.
+    """
+    channels = output_pins[0] if len(output_pins) == 1 else list(output_pins)
+    output = backend.write
+
+    def fold(errors):
+        summary.add(errors)
+        _record_errors(errors, GpioPlaybackMode.SAMPLES)
+
+    # Traducir niveles a estados GPIO una vez por bloque (fuera del bucle temporizado)
+    blocks = ((np.where(chunk.levels > 0, backend.HIGH, backend.LOW).tolist(), chunk.sample_duration)
+              for chunk in chunks)
+    pipeline = _BlockPipeline(blocks, fold)
+    block = pipeline.take()
+    sample_index = 0
+    start_time = time.perf_counter()
+    while block is not None:
+        gpio_states, sample_duration = block
+        errors = np.empty(len(gpio_states))
+        for i, gpio_state in enumerate(gpio_states):
+            deadline = start_time + (sample_index + i) * sample_duration
+            if not pipeline.ready:
+                pipeline.prefetch(deadline)
+            _check_cancelled(cancel_event)
+            _wait_until(deadline, cancel_event)
+            output(channels, gpio_state)
+            errors[i] = time.perf_counter() - deadline
+        sample_index += len(gpio_states)
+        pipeline.finish(errors)
+        block = pipeline.take()
+
+def _schedule_pin_edges(backend: GpioBackend, event_deadlines: np.ndarray, event_states: np.ndarray,
+                        event_pins: np.ndarray):
+    """
+    Ordena por instante los flancos de todos los pines (instante, estado y pin de cada uno).
+    Los flancos simultáneos con el mismo estado se agrupan para escribirse en una sola llamada.
+    Devuelve la lista de grupos `(instante, canales, estado, índices)` y el pin de cada flanco.
+    """
+    order = np.lexsort((event_pins, event_states, event_deadlines))
+    event_deadlines, event_states, event_pins = event_deadlines[order], event_states[order], event_pins[order]
+
+    new_group = np.ones(len(order), dtype=bool)
+    new_group[1:] = (event_deadlines[1:] != event_deadlines[:-1]) | (event_states[1:] != event_states[:-1])
+    bounds = np.append(np.flatnonzero(new_group), len(order)).tolist()
+    gpio_states = np.where(event_states > 0, backend.HIGH, backend.LOW).tolist()
+    deadline_list = event_deadlines.tolist()
+    pin_list = event_pins.tolist()
+    groups = []
+    for begin, end in zip(bounds[:-1], bounds[1:]):
+        channels = pin_list[begin] if end - begin == 1 else pin_list[begin:end]
+        groups.append((deadline_list[begin], channels, gpio_states[begin], begin, end))
+    return groups, event_pins
+
+def _iter_pin_schedule(backend: GpioBackend, output_pins: List[int], edge_blocks: Iterable, skews: np.ndarray):
+    """
+    Calendario de todos los pines (ver `_schedule_pin_edges`) bloque a bloque, a partir de los
+    bloques de `iter_gpio_edges` y del desfase (>= 0) de cada pin. Un flanco desfasado puede caer
+    después de los del bloque siguiente: los posteriores al último instante del bloque pasan al
+    siguiente, así que cada bloque del calendario está ordenado respecto a los demás.
+    """
+    pins = np.asarray(output_pins)
+    pending_deadlines, pending_states, pending_pins = np.empty(0), np.empty(0, dtype=np.int8), pins[:0]
+    for deadlines, states in edge_blocks:
+        event_deadlines = np.concatenate((pending_deadlines, (deadlines[None, :] + skews[:, None]).ravel()))
+        event_states = np.concatenate((pending_states, np.tile(states, len(pins))))
+        event_pins = np.concatenate((pending_pins, np.repeat(pins, len(deadlines))))
+        # Los bloques siguientes empiezan después de deadlines[-1] y los desfases no son negativos
+        ready = event_deadlines <= deadlines[-1]
+        pending_deadlines, pending_states, pending_pins = (
+            event_deadlines[~ready], event_states[~ready], event_pins[~ready])
+        if np.any(ready):
+            yield _schedule_pin_edges(backend, event_deadlines[ready], event_states[ready], event_pins[ready])
+    if len(pending_deadlines):
+        yield _schedule_pin_edges(backend, pending_deadlines, pending_states, pending_pins)
+
+def _play_edges(backend: GpioBackend, output_pins: List[int], chunks: Iterable[ModulatedSignal],
+                skews: np.ndarray, summaries: Dict[int, _ErrorSummary], mode: GpioPlaybackMode,
+                cancel_event: Optional[threading.Event] = None):
+    """
+    Modo por flancos: todos los pines comparten un único bucle de temporización y solo se
+    escriben en sus transiciones (desplazadas por el `skew` de cada pin). Los backends
+    temporizados por hardware reproducen el calendario ellos mismos.
+    Los flancos se compilan y se ordenan bloque a bloque mientras se reproducen; el error de cada
+    flanco (instante real de escritura - instante programado, s) se acumula en el resumen de su pin.
+    """
+    # Normalizar para que el primer flanco (el de menor skew) ocurra en t=0
+    skews = skews - skews.min()
+    blocks = _iter_pin_schedule(backend, output_pins, iter_gpio_edges(chunks), skews)
+
+    def fold(errors, event_pins):
+        for pin in output_pins:
+            summaries[pin].add(errors[event_pins == pin])
+        _record_errors(errors, mode)
+
+    if backend.hardware_timed:
+        backend.play_edges(blocks, fold, cancel_event)
+        return
+    output = backend.write
+    pipeline = _BlockPipeline(blocks, fold)
+    block = pipeline.take()
+    start_time = time.perf_counter()
+    while block is not None:
+        groups, event_pins = block
+        errors = np.empty(len(event_pins))
+        for deadline, channels, gpio_state, begin, end in groups:
+            deadline += start_time
+            if not pipeline.ready:
+                pipeline.prefetch(deadline)
+            # `_wait_until` solo mira el evento cuando duerme: con flancos muy juntos no llega a dormir
+            _check_cancelled(cancel_event)
+            _wait_until(deadline, cancel_event)
+            output(channels, gpio_state)
+            errors[begin:end] = time.perf_counter() - deadline
+        pipeline.finish(errors, event_pins)
+        block = pipeline.take()
+
+def _timing_report(output_pin: int, mode: GpioPlaybackMode, summary: _ErrorSummary, duration: float) -> dict:
+    """Informe del error de temporización de un envío (en microsegundos)."""
+    return {
+        "pin": output_pin,
+        "mode": mode.value,
+        "writes": summary.count,
+        "duration_s": duration,
+        "mean_abs_error_us": summary.total_us / summary.count if summary.count else 0.0,
+        "p99_abs_error_us": summary.p99_us(),
+        "max_abs_error_us": summary.max_us,
+    }
+
+def send_to_gpio_pins(output_pins: Sequence[int],
+                      modulated_signal: Union[ModulatedSignal, Iterable[ModulatedSignal]],
+                      mode: GpioPlaybackMode = GpioPlaybackMode.EDGES,
+                      skews_s: Optional[Sequence[float]] = None,
+                      cancel_event: Optional[threading.Event] = None) -> List[dict]:
+    """
+    Envía la señal modulada DIGITAL a varios pines GPIO a la vez, con un único reloj compartido.
+    Por defecto los pines van en fase; `skews_s` (uno por pin, en segundos, solo en modo `edges`)
+    retrasa la salida de cada pin respecto a los demás.
+    Si se activa `cancel_event` el envío se corta, los pines quedan en LOW y se lanza `TransmissionCancelled`.
+    `modulated_signal` puede ser una señal completa o un iterable de bloques consecutivos
+    (p. ej. de `iter_modulated_chunks`), de modo que los mensajes largos no se materializan enteros.
+    Esta función es BLOQUEANTE mientras dura el envío y devuelve un informe de temporización por pin.
+    Escribe a través del backend de `get_gpio_backend()`; con uno temporizado por hardware el modo
+    `samples` se reproduce como `edges` (la forma de onda resultante es la misma).
+    Lanza ValueError en caso de error o si GPIO no está disponible/algún pin ocupado en este proceso.
+    """
+    if not output_pins:
+        raise ValueError("No se indicó ningún pin GPIO.")
+    if skews_s is not None and len(skews_s) != len(output_pins):
+        raise ValueError("Se debe indicar un desfase por cada pin.")
+    # Sin duplicados (pines y desfases a la vez), conservando el orden
+    pin_skews = {}
+    for pin, skew in zip(output_pins, [0.0] * len(output_pins) if skews_s is None else skews_s):
+        if pin_skews.setdefault(pin, float(skew)) != float(skew):
+            raise ValueError(f"El pin {pin} aparece repetido con desfases distintos.")
+    output_pins = list(pin_skews)
+    skews = np.fromiter(pin_skews.values(), dtype=np.float64, count=len(pin_skews))
+    if mode == GpioPlaybackMode.SAMPLES and np.any(skews != skews[0]):
+        raise ValueError("El desfase entre pines solo está disponible en modo 'edges'.")
 
-    # Marcar como ocupado DESPUÉS de adquirir el bloqueo
-    is_gpio_sending = True
-    print(f"--- [GPIO TASK] Bloqueo adquirido. Iniciando envío a GPIO Pin {output_pin} ---")
+    backend = get_gpio_backend()
+    if backend is None:
+        logger.error("Intento de enviar a GPIO sin librería disponible.")
+        raise ValueError("Funcionalidad GPIO no disponible en el servidor.")
+
+    # Adquirir los bloqueos de los pines (falla rápido si el pin está ocupado en este proceso,
+    # espera si lo está en otro)
+    interprocess = backend.interprocess_locks
+    _acquire_pins(output_pins, interprocess, cancel_event)
+    logger.info("Bloqueos adquiridos. Iniciando envío a GPIO pines %s (%s).", output_pins, mode.value)
 
     error_occurred = None
+    reports = None
     try:
         # Configurar GPIO DENTRO de la función
-        GPIO.setmode(GPIO.BCM)
-        GPIO.setwarnings(False) # Podría estar fuera si se hace una sola vez al inicio
-        GPIO.setup(output_pin, GPIO.OUT, initial=GPIO.LOW)
-        print(f"GPIO {output_pin} configurado como salida.")
-
-        samples_per_bit_eff = max(1, SAMPLES_PER_BIT)
-        sample_duration = BIT_DURATION / samples_per_bit_eff
-        print(f"Duración por muestra: {sample_duration:.6f}s")
+        backend.prepare(output_pins)
+        logger.debug("GPIO %s configurados como salida.", output_pins)
 
+        chunks = [modulated_signal] if isinstance(modulated_signal, ModulatedSignal) else modulated_signal
         start_time = time.perf_counter()
-        for i in range(len(modulated_signal)):
-            level = modulated_signal[i]
-            gpio_state = GPIO.HIGH if level > 0 else GPIO.LOW
-            GPIO.output(output_pin, gpio_state)
-            wait_until = start_time + (i + 1) * sample_duration
-            while time.perf_counter() < wait_until:
-                 if wait_until - time.perf_counter() > 0.0001:
-                    time.sleep(0.00005)
-                 pass # Espera activa
-
-        GPIO.output(output_pin, GPIO.LOW)
-        print(f"--- [GPIO TASK] Envío a GPIO Pin {output_pin} completado ---")
+        if mode == GpioPlaybackMode.SAMPLES and not backend.hardware_timed:
+            summaries = dict.fromkeys(output_pins, _ErrorSummary())  # Todos los pines se escriben juntos
+            _play_samples(backend, output_pins, chunks, summaries[output_pins[0]], cancel_event)
+        else:
+            summaries = {pin: _ErrorSummary() for pin in output_pins}
+            _play_edges(backend, output_pins, chunks, skews, summaries, mode, cancel_event)
+        duration = time.perf_counter() - start_time
+        STAGE_SECONDS.observe(duration, stage="gpio_transmission")
 
+        backend.write(output_pins[0] if len(output_pins) == 1 else output_pins, backend.LOW)
+        reports = [_timing_report(pin, mode, summaries[pin], duration) for pin in output_pins]
+        worst = max(report["max_abs_error_us"] for report in reports)
+        logger.info("Envío a GPIO pines %s completado (error máx %.1f us).", output_pins, worst)
+
+    except TransmissionCancelled as e:
+        logger.info("Envío a GPIO pines %s cancelado.", output_pins)
+        error_occurred = e
     except Exception as e:
-        print(f"Error durante el envío a GPIO {output_pin}: {e}")
+        logger.error("Error durante el envío a GPIO %s: %r", output_pins, e)
         error_occurred = e # Guardar error
     finally:
-        print(f"Limpiando GPIO Pin {output_pin}...")
-        with contextlib.suppress(Exception):
-             GPIO.cleanup(output_pin) # Limpiar solo el pin usado
-        is_gpio_sending = False # Marcar como no ocupado ANTES de liberar bloqueo
-        gpio_lock.release()     # SIEMPRE liberar el bloqueo
-        print(f"Bloqueo GPIO liberado para pin {output_pin}.")
+        logger.debug("Limpiando GPIO pines %s.", output_pins)
+        if error_occurred:
+            with contextlib.suppress(Exception):
+                backend.write(output_pins[0] if len(output_pins) == 1 else output_pins, backend.LOW)
+        backend.release(output_pins)
+        _release_pins(output_pins, interprocess)     # SIEMPRE liberar los bloqueos
+        logger.debug("Bloqueos GPIO liberados para pines %s.", output_pins)
         # Si ocurrió un error, lanzarlo
+        if isinstance(error_occurred, TransmissionCancelled):
+            raise error_occurred
         if error_occurred:
             # Usar un tipo de error genérico o específico si se prefiere
-            raise ValueError(f"Error de GPIO en pin {output_pin}: {error_occurred}")
\ No newline at end of file
+            raise ValueError(f"Error de GPIO en pines {output_pins}: {error_occurred}")
+    return reports
+
+def send_to_gpio(output_pin: int, modulated_signal: Union[ModulatedSignal, Iterable[ModulatedSignal]],
+                 mode: GpioPlaybackMode = GpioPlaybackMode.EDGES) -> dict:
+    """
+    Envía la señal modulada DIGITAL a un pin GPIO específico (ver `send_to_gpio_pins`).
+    Esta función es BLOQUEANTE mientras dura el envío y devuelve el informe de temporización.
+    """
+    return send_to_gpio_pins([output_pin], modulated_signal, mode=mode)[0]
@@ -0,0 +1,203 @@
+import heapq
+import itertools
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from app_logging import get_logger
+from config import GPIO_QUEUE_SIZE, GPIO_WORKERS, GPIO_JOB_HISTORY
+from gpio_handler import TransmissionCancelled
+from metrics import GPIO_JOBS, GPIO_QUEUE_WAIT_SECONDS
+from models import GpioJobStatus
+
+logger = get_logger("gpio.queue")
+
+_FINISHED = (GpioJobStatus.COMPLETED, GpioJobStatus.FAILED, GpioJobStatus.CANCELLED)
+
+
+class QueueFullError(Exception):
+    """La cola de transmisiones está llena."""
+
+
+@dataclass
+class GpioJob:
+    """
+    Transmisión GPIO encolada. `run(cancel_event)` hace el envío y devuelve los informes de temporización;
+    al terminar se descarta (retiene el mensaje completo) y el historial solo guarda el estado.
+    """
+    pins: List[int]
+    run: Optional[Callable[[threading.Event], List[dict]]]
+    priority: int = 0
+    description: str = ""
+    job_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: GpioJobStatus = GpioJobStatus.QUEUED
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    timing: List[dict] = field(default_factory=list)
+    cancel_event: threading.Event = field(default_factory=threading.Event)
+    done_event: threading.Event = field(default_factory=threading.Event)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in _FINISHED
+
+
+class TransmissionScheduler:
+    """
+    Planificador de transmisiones GPIO en segundo plano.
+
+    Los trabajos esperan en una cola acotada ordenada por prioridad (mayor primero, FIFO a igual
+    prioridad) y se ejecutan en hilos dedicados. Un trabajo solo arranca cuando todos sus pines
+    están libres, de modo que los envíos a un mismo pin se serializan mientras que los de pines
+    distintos se ejecutan en paralelo.
+    """
+
+    def __init__(self, workers: int = GPIO_WORKERS, max_queued: int = GPIO_QUEUE_SIZE,
+                 history: int = GPIO_JOB_HISTORY):
+        self._max_queued = max_queued
+        self._history = history
+        self._condition = threading.Condition()
+        self._queue = []  # heap de (-prioridad, secuencia, job)
+        self._sequence = itertools.count()
+        self._jobs: "OrderedDict[str, GpioJob]" = OrderedDict()
+        self._busy_pins = set()
+        self._active: Dict[str, GpioJob] = {}
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"gpio-worker-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    # --- API pública ---
+
+    def submit(self, job: GpioJob) -> GpioJob:
+        """Encola el trabajo y lo devuelve de inmediato. Lanza QueueFullError si la cola está llena."""
+        with self._condition:
+            if len(self._queue) >= self._max_queued:
+                raise QueueFullError(f"La cola de transmisiones GPIO está llena ({self._max_queued} trabajos).")
+            heapq.heappush(self._queue, (-job.priority, next(self._sequence), job))
+            self._jobs[job.job_id] = job
+            self._trim_history()
+            self._condition.notify_all()
+        return job
+
+    def get(self, job_id: str) -> Optional[GpioJob]:
+        with self._condition:
+            return self._jobs.get(job_id)
+
+    def list_jobs(self) -> List[GpioJob]:
+        with self._condition:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id: str) -> Optional[GpioJob]:
+        """Cancela un trabajo: si está en cola se descarta, si está en curso se interrumpe el envío."""
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                return job
+            job.cancel_event.set()
+            if job.status == GpioJobStatus.QUEUED:
+                self._queue = [entry for entry in self._queue if entry[2] is not job]
+                heapq.heapify(self._queue)
+                self._finish(job, GpioJobStatus.CANCELLED)
+            return job
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[GpioJob]:
+        """Bloquea hasta que el trabajo termine o venza `timeout`. Devuelve el trabajo (o None si no existe)."""
+        job = self.get(job_id)
+        if job is not None:
+            job.done_event.wait(timeout)
+        return job
+
+    def queue_position(self, job: GpioJob) -> Optional[int]:
+        """Posición (0 = siguiente) del trabajo en la cola, o None si ya no está en cola."""
+        with self._condition:
+            if job.status != GpioJobStatus.QUEUED:
+                return None
+            ordered = sorted(self._queue)
+            for position, entry in enumerate(ordered):
+                if entry[2] is job:
+                    return position
+            return None
+
+    def state(self) -> dict:
+        with self._condition:
+            return {
+                "queue_depth": len(self._queue),
+                "active_jobs": list(self._active),
+                "busy_pins": sorted(self._busy_pins),
+            }
+
+    # --- Ejecución ---
+
+    def _next_runnable(self) -> Optional[GpioJob]:
+        """Extrae el trabajo de mayor prioridad cuyos pines estén todos libres (se llama con el lock)."""
+        for entry in sorted(self._queue):
+            job = entry[2]
+            if self._busy_pins.isdisjoint(job.pins):
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                return job
+        return None
+
+    def _worker(self):
+        while True:
+            with self._condition:
+                job = self._next_runnable()
+                while job is None:
+                    self._condition.wait()
+                    job = self._next_runnable()
+                self._busy_pins.update(job.pins)
+                self._active[job.job_id] = job
+                job.status = GpioJobStatus.RUNNING
+                job.started_at = time.time()
+            GPIO_QUEUE_WAIT_SECONDS.observe(job.started_at - job.created_at)
+            logger.info("Iniciando trabajo %s: %s", job.job_id, job.description)
+            status, error, timing = GpioJobStatus.COMPLETED, None, []
+            try:
+                timing = job.run(job.cancel_event)
+            except TransmissionCancelled:
+                status = GpioJobStatus.CANCELLED
+            except Exception as e:
+                status, error = GpioJobStatus.FAILED, str(e)
+            with self._condition:
+                self._busy_pins.difference_update(job.pins)
+                self._active.pop(job.job_id, None)
+                job.timing = timing or []
+                job.error = error
+                self._finish(job, status)
+                self._condition.notify_all()
+            logger.info("Trabajo %s terminado: %s", job.job_id, status.value)
+
+    def _finish(self, job: GpioJob, status: GpioJobStatus):
+        job.status = status
+        job.finished_at = time.time()
+        job.run = None  # Liberar la señal y la solicitud capturadas
+        job.done_event.set()
+        GPIO_JOBS.inc(status=status.value)
+
+    def _trim_history(self):
+        """Olvida los trabajos terminados más antiguos si se supera el historial."""
+        excess = len(self._jobs) - self._history
+        if excess <= 0:
+            return
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished][:excess]:
+            del self._jobs[job_id]
+
+
+_scheduler: Optional[TransmissionScheduler] = None
+_scheduler_guard = threading.Lock()
+
+def get_scheduler() -> TransmissionScheduler:
+    """Devuelve el planificador global, creándolo (y arrancando sus hilos) en el primer uso."""
+    global _scheduler
+    with _scheduler_guard:
+        if _scheduler is None:
+            _scheduler = TransmissionScheduler()
+        return _scheduler
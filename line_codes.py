@@ -0,0 +1,388 @@
+"""
+Registro de códigos de línea definidos como máquinas de estados.
+
+Cada código se declara con una función `step(estado, ventana) -> (chips, siguiente_estado)`:
+`ventana` es el bit actual seguido de `lookahead` bits futuros (como entero, el bit actual en la
+posición más significativa) y `chips` son los niveles que ocupa ese bit, de igual duración
+(`chips_per_bit` = 2 para los códigos de medio bit). Al registrarlo, el código se compila
+recorriendo todos los estados alcanzables y se convierte en tablas NumPy:
+
+  - `next_state[estado, símbolo]` para avanzar la máquina, y
+  - la forma de onda completa de un bit (muestras int8) para cada par (estado, símbolo).
+
+Codificar un mensaje es entonces un escaneo vectorizado de estados por bloques más un único
+indexado en la tabla de formas de onda, igual de rápido para cualquier código.
+"""
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config import VOLTAGE_HIGH, VOLTAGE_LOW_BIPOLAR, VOLTAGE_LOW_UNIPOLAR, WAVEFORM_CACHE_MAX_BYTES
+
+State = Hashable
+StepFunction = Callable[[State, int], Tuple[Sequence[int], State]]
+
+_SCAN_BLOCK_BITS = 64  # Bits que se avanzan a la vez en el escaneo por bloques
+_SEQUENTIAL_MAX_BITS = 512  # Por debajo, el recorrido secuencial es más rápido que el escaneo
+_MAX_STATES = 4096
+
+
+def _run_states(symbols: np.ndarray, next_state: np.ndarray, initial: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Estado antes de cada bit y estado final, recorriendo la máquina sin bucles por bit.
+
+    Los bits se agrupan en bloques de `_SCAN_BLOCK_BITS`: se calcula a la vez la función de
+    transición de cada bloque para todos los estados de partida, se componen esas funciones con
+    un escaneo prefijo (log2 del número de bloques pasos) y se rellenan los estados de cada bloque.
+    `next_state` tiene una última columna identidad que se usa como relleno. Admite filas (2-D).
+    """
+    lead, n = symbols.shape[:-1], symbols.shape[-1]
+    num_states, width = next_state.shape
+    if n == 0 or num_states == 1:
+        return np.zeros(symbols.shape, dtype=np.intp), np.full(lead, initial, dtype=np.intp)
+    if not lead and n <= _SEQUENTIAL_MAX_BITS:
+        # Mensajes cortos: recorrer la tabla en Python es más barato que lanzar el escaneo
+        rows, state, states = next_state.tolist(), initial, []
+        for symbol in symbols.tolist():
+            states.append(state)
+            state = rows[state][symbol]
+        return np.array(states, dtype=np.intp), np.intp(state)
+    block = min(_SCAN_BLOCK_BITS, n)
+    num_blocks = -(-n // block)
+    padded = np.full(lead + (num_blocks * block,), width - 1, dtype=np.intp)
+    padded[..., :n] = symbols
+    # (..., bit dentro del bloque, bloque): cada paso del bucle lee una fila contigua
+    blocks = np.ascontiguousarray(np.swapaxes(padded.reshape(lead + (num_blocks, block)), -1, -2))
+    table = next_state.ravel()
+
+    # Función de transición de cada bloque para todos los estados de partida
+    maps = np.broadcast_to(np.arange(num_states), lead + (num_blocks, num_states)).copy()
+    for j in range(block):
+        maps = np.take(table, maps * width + blocks[..., j, :, None])
+    # Composición prefija: maps[b] pasa a ser bloque b ∘ ... ∘ bloque 0
+    shift = 1
+    while shift < num_blocks:
+        maps[..., shift:, :] = np.take_along_axis(maps[..., shift:, :], maps[..., :-shift, :], axis=-1)
+        shift *= 2
+    ends = maps[..., initial]
+    current = np.concatenate((np.full(lead + (1,), initial, dtype=np.intp), ends[..., :-1]), axis=-1)
+
+    states = np.empty(blocks.shape, dtype=np.intp)
+    for j in range(block):
+        states[..., j, :] = current
+        current = np.take(table, current * width + blocks[..., j, :])
+    states = np.swapaxes(states, -1, -2).reshape(lead + (-1,))
+    return states[..., :n], ends[..., -1]
+
+
+class WaveformCache:
+    """
+    Caché LRU, acotada en bytes, de las tablas de formas de onda por (código, muestras por bit).
+    Las muestras por bit llegan con cada solicitud, así que las tablas no pueden crecer sin límite.
+    Un código reemplazado en el registro no reutiliza las tablas del anterior.
+    """
+
+    def __init__(self, max_bytes: int = WAVEFORM_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[LineCode, np.ndarray]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, code: "LineCode", samples_per_bit: int) -> Optional[np.ndarray]:
+        key = (code.name, samples_per_bit)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] is not code:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, code: "LineCode", samples_per_bit: int, table: np.ndarray):
+        key = (code.name, samples_per_bit)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1].nbytes
+            self._entries[key] = (code, table)
+            self._bytes += table.nbytes
+            # Se conserva siempre la última tabla aunque supere el límite por sí sola
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {"entries": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
+
+
+waveform_cache = WaveformCache()
+
+
+class LineCode:
+    """
+    Código de línea declarado como máquina de estados (ver el docstring del módulo).
+
+    `tail_bit` es el valor con el que se completa la ventana más allá del final del mensaje
+    (y el relleno de las filas cortas en los lotes).
+    """
+
+    def __init__(self, name: str, step: StepFunction, initial_state: State, lookahead: int = 0,
+                 chips_per_bit: int = 2, tail_bit: int = 0, description: str = ""):
+        self.name = name
+        self.step = step
+        self.initial_state = initial_state
+        self.lookahead = lookahead
+        self.chips_per_bit = chips_per_bit
+        self.tail_bit = tail_bit
+        self.description = description
+        self._compile()
+
+    @property
+    def num_states(self) -> int:
+        return len(self.states)
+
+    @property
+    def num_symbols(self) -> int:
+        return 1 << (self.lookahead + 1)
+
+    def _compile(self):
+        """Enumera los estados alcanzables y construye las tablas de transición y de chips."""
+        index = {self.initial_state: 0}
+        self.states: List[State] = [self.initial_state]
+        transitions, chips = [], []
+        for state in self.states:  # la lista crece mientras se recorre (búsqueda en anchura)
+            row_next, row_chips = [], []
+            for symbol in range(self.num_symbols):
+                levels, following = self.step(state, symbol)
+                if len(levels) != self.chips_per_bit:
+                    raise ValueError(f"El código '{self.name}' devolvió {len(levels)} chips "
+                                     f"(se esperaban {self.chips_per_bit}).")
+                if following not in index:
+                    if len(self.states) >= _MAX_STATES:
+                        raise ValueError(f"El código '{self.name}' supera {_MAX_STATES} estados.")
+                    index[following] = len(self.states)
+                    self.states.append(following)
+                row_next.append(index[following])
+                row_chips.append(levels)
+            transitions.append(row_next)
+            chips.append(row_chips)
+        self.state_index = index
+        identity = np.arange(len(self.states))[:, None]
+        self.next_state = np.hstack((np.array(transitions, dtype=np.intp), identity))
+        self.chips = np.array(chips, dtype=np.int8)  # (estados, símbolos, chips_per_bit)
+
+    def waveforms(self, samples_per_bit: int) -> np.ndarray:
+        """
+        Tabla (estados × símbolos, samples_per_bit) con las muestras de un bit para cada par.
+        El chip `c` ocupa las muestras [floor(c·spb/cpb), floor((c+1)·spb/cpb)), así que en los
+        códigos de medio bit la primera mitad tiene samples_per_bit // 2 muestras.
+        """
+        table = waveform_cache.get(self, samples_per_bit)
+        if table is None:
+            bounds = np.arange(self.chips_per_bit + 1) * samples_per_bit // self.chips_per_bit
+            table = np.repeat(self.chips.reshape(-1, self.chips_per_bit), np.diff(bounds), axis=1)
+            table.flags.writeable = False
+            waveform_cache.put(self, samples_per_bit, table)
+        return table
+
+    def symbols(self, bits: np.ndarray, lookahead_bits: Optional[np.ndarray] = None) -> np.ndarray:
+        """Ventana de cada bit como entero: el bit actual y los `lookahead` siguientes."""
+        if self.lookahead == 0:
+            return bits.astype(np.intp)
+        tail = np.full(bits.shape[:-1] + (self.lookahead,), self.tail_bit, dtype=np.uint8)
+        if lookahead_bits is not None:
+            tail[..., :len(lookahead_bits)] = lookahead_bits[:self.lookahead]
+        extended = np.concatenate((bits.astype(np.uint8, copy=False), tail), axis=-1)
+        n = bits.shape[-1]
+        symbols = np.zeros(bits.shape, dtype=np.intp)
+        for k in range(self.lookahead + 1):
+            symbols = (symbols << 1) | extended[..., k:k + n]
+        return symbols
+
+    def encode(self, bits: np.ndarray, samples_per_bit: int, state: int = 0,
+               lookahead_bits: Optional[np.ndarray] = None, dtype=np.int8) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Codifica `bits` (1-D, o 2-D con un mensaje por fila) desde el estado `state` (índice).
+        `lookahead_bits` son los bits que siguen al bloque (si el mensaje continúa).
+        Devuelve las muestras y el estado (índice) tras el último bit.
+        """
+        symbols = self.symbols(bits, lookahead_bits)
+        states, final = _run_states(symbols, self.next_state, state)
+        samples = np.take(self.waveforms(samples_per_bit), states * self.num_symbols + symbols, axis=0)
+        return samples.reshape(bits.shape[:-1] + (-1,)).astype(dtype, copy=False), final
+
+    def advance(self, bits: np.ndarray, state: int = 0, lookahead_bits: Optional[np.ndarray] = None) -> int:
+        """Estado (índice) tras recorrer `bits` sin generar muestras."""
+        return int(_run_states(self.symbols(bits, lookahead_bits), self.next_state, state)[1])
+
+
+# --- Registro ---
+
+_registry: Dict[str, LineCode] = {}
+_registry_lock = threading.Lock()
+
+
+def register_line_code(code: LineCode, replace: bool = False) -> LineCode:
+    """Añade un código al registro. Lanza ValueError si el nombre ya existe (salvo `replace`)."""
+    with _registry_lock:
+        if code.name in _registry and not replace:
+            raise ValueError(f"Ya existe un código de línea llamado '{code.name}'.")
+        _registry[code.name] = code
+    return code
+
+
+def get_line_code(name) -> LineCode:
+    """Devuelve el código registrado con ese nombre (acepta también miembros de ModulationType y códigos)."""
+    if isinstance(name, LineCode):
+        return name
+    name = getattr(name, "value", name)
+    code = _registry.get(name)
+    if code is None:
+        raise ValueError(f"Tipo de modulación '{name}' no soportado.")
+    return code
+
+
+def is_line_code(name) -> bool:
+    return getattr(name, "value", name) in _registry
+
+
+def line_codes() -> List[LineCode]:
+    """Códigos registrados, en orden de registro."""
+    with _registry_lock:
+        return list(_registry.values())
+
+
+def line_code(name: str, initial_state: State, **options):
+    """Decorador: registra la función `step` decorada como código de línea."""
+    def decorator(step: StepFunction) -> StepFunction:
+        register_line_code(LineCode(name, step, initial_state, description=(step.__doc__ or "").strip(), **options))
+        return step
+    return decorator
+
+
+# --- Códigos incluidos ---
+# Convenciones comunes: el nivel "bajo" bipolar es VOLTAGE_LOW_BIPOLAR y los códigos diferenciales
+# parten de él; en los pseudoternarios la primera marca es positiva.
+
+HIGH, LOW, ZERO = VOLTAGE_HIGH, VOLTAGE_LOW_BIPOLAR, VOLTAGE_LOW_UNIPOLAR
+
+
+@line_code("NRZ-M", initial_state=LOW)
+def _nrz_m(level, bit):
+    """NRZ-Mark: el nivel se invierte con cada '1'."""
+    level = -level if bit else level
+    return (level, level), level
+
+
+@line_code("Manchester (Bi-phase L)", initial_state=None)
+def _manchester(_, bit):
+    """Manchester (IEEE 802.3 invertido, como el original): '0' alto→bajo, '1' bajo→alto."""
+    return ((LOW, HIGH) if bit else (HIGH, LOW)), None
+
+
+@line_code("Unipolar RZ", initial_state=None)
+def _unipolar_rz(_, bit):
+    """Unipolar RZ: '1' alto durante la primera mitad del bit y vuelta a cero."""
+    return ((HIGH, ZERO) if bit else (ZERO, ZERO)), None
+
+
+@line_code("Bipolar AMI", initial_state=LOW)
+def _bipolar_ami(last_mark, bit):
+    """AMI: los '1' alternan polaridad y los '0' son cero."""
+    if bit:
+        return (-last_mark, -last_mark), -last_mark
+    return (ZERO, ZERO), last_mark
+
+
+@line_code("NRZ-L", initial_state=None)
+def _nrz_l(_, bit):
+    """NRZ-Level: '1' alto y '0' bajo durante todo el bit."""
+    return ((HIGH, HIGH) if bit else (LOW, LOW)), None
+
+
+@line_code("NRZ-S", initial_state=LOW)
+def _nrz_s(level, bit):
+    """NRZ-Space: el nivel se invierte con cada '0'."""
+    level = level if bit else -level
+    return (level, level), level
+
+
+@line_code("Differential Manchester", initial_state=LOW)
+def _differential_manchester(level, bit):
+    """Manchester diferencial: transición siempre a mitad de bit; un '0' añade otra al inicio."""
+    first = level if bit else -level
+    return (first, -first), -first
+
+
+@line_code("Polar RZ", initial_state=None)
+def _polar_rz(_, bit):
+    """RZ polar: '1' positivo y '0' negativo durante la primera mitad, vuelta a cero en la segunda."""
+    return ((HIGH, ZERO) if bit else (LOW, ZERO)), None
+
+
+_MLT3_CYCLE = (ZERO, HIGH, ZERO, LOW)
+
+
+@line_code("MLT-3", initial_state=0)
+def _mlt3(phase, bit):
+    """MLT-3: cada '1' avanza un paso en el ciclo 0, +, 0, −; los '0' mantienen el nivel."""
+    phase = (phase + bit) % 4
+    level = _MLT3_CYCLE[phase]
+    return (level, level), phase
+
+
+@line_code("HDB3", initial_state=(LOW, 0, ()), lookahead=3, tail_bit=1)
+def _hdb3(state, window):
+    """HDB3: AMI que sustituye cada cuatro '0' por 000V o B00V para mantener la paridad de violaciones."""
+    last_mark, odd_marks, pending = state
+    if pending:
+        return (pending[0], pending[0]), (last_mark, odd_marks, pending[1:])
+    if window == 0:  # este bit y los tres siguientes son '0'
+        if odd_marks:
+            group = (ZERO, ZERO, ZERO, last_mark)
+        else:
+            group = (-last_mark, ZERO, ZERO, -last_mark)
+        return (group[0], group[0]), (group[3], 0, group[1:])
+    if window >> 3:
+        return (-last_mark, -last_mark), (-last_mark, odd_marks ^ 1, ())
+    return (ZERO, ZERO), (last_mark, odd_marks, ())
+
+
+@line_code("B8ZS", initial_state=(LOW, ()), lookahead=7, tail_bit=1)
+def _b8zs(state, window):
+    """B8ZS: AMI que sustituye cada ocho '0' por 000VB0VB."""
+    last_mark, pending = state
+    if pending:
+        return (pending[0], pending[0]), (last_mark, pending[1:])
+    if window == 0:  # este bit y los siete siguientes son '0'
+        group = (ZERO, ZERO, ZERO, last_mark, -last_mark, ZERO, -last_mark, last_mark)
+        return (ZERO, ZERO), (last_mark, group[1:])
+    if window >> 7:
+        return (-last_mark, -last_mark), (-last_mark, ())
+    return (ZERO, ZERO), (last_mark, ())
+
+
+_4B5B_CODES = (0b11110, 0b01001, 0b10100, 0b10101, 0b01010, 0b01011, 0b01110, 0b01111,
+               0b10010, 0b10011, 0b10110, 0b10111, 0b11010, 0b11011, 0b11100, 0b11101)
+
+
+@line_code("4B5B/NRZI", initial_state=(0, (), LOW), lookahead=3, chips_per_bit=5)
+def _4b5b_nrzi(state, window):
+    """4B5B + NRZI: cada grupo de 4 bits se envía como 5 bits de código (en el mismo tiempo), invirtiendo el nivel con cada '1'."""
+    position, chips, level = state
+    if position == 0:
+        code = _4B5B_CODES[window]
+        chips = []
+        for shift in range(4, -1, -1):
+            level = -level if (code >> shift) & 1 else level
+            chips.extend([level] * 4)  # 20 chips por grupo: 4 por bit de código, 5 por bit de datos
+        chips = tuple(chips)
+    return chips[5 * position:5 * position + 5], ((position + 1) % 4, chips if position < 3 else (), level)
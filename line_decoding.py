@@ -0,0 +1,391 @@
+"""
+Decodificación de señales moduladas y verificación de ida y vuelta.
+
+La señal recibida se convierte primero en el valor medio de cada chip (integración sobre la
+parte central del chip, lo que filtra ruido) y después se decodifica:
+
+  - Códigos sin anticipación (`lookahead = 0`): el decodificador se compila automáticamente a
+    partir de las tablas del codificador. Es otra máquina de estados cuya entrada es el patrón
+    de chips observado en cada bit, así que se recorre con el mismo escaneo vectorizado. Un
+    patrón que el estado actual no puede emitir es una violación de código (p. ej. violación
+    bipolar en AMI o falta de la transición central en Manchester).
+  - Códigos con sustituciones o bloques (HDB3, B8ZS, 4B5B): decodificadores vectorizados
+    específicos, registrados con `@line_decoder`.
+
+Con `tolerant=True` además se sigue la fase del reloj por ventanas (media circular de la
+posición de los flancos respecto a la rejilla de chips), lo que absorbe deriva de reloj y
+desfases iniciales de hasta medio chip.
+"""
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from line_codes import LineCode, get_line_code, _run_states, _4B5B_CODES
+
+# decoder(chips, code) -> (bits uint8, violaciones bool), con `chips` (n, chips_per_bit) float
+Decoder = Callable[[np.ndarray, LineCode], Tuple[np.ndarray, np.ndarray]]
+
+_DRIFT_WINDOW_CHIPS = 128  # Chips por ventana al estimar la fase (la deriva por ventana debe ser < medio chip)
+_CHIP_MARGIN = 0.25  # Fracción del chip que se descarta a cada lado al integrar
+_MIN_TOLERANT_CHIP_SAMPLES = 4  # Por debajo no se puede medir la fase del reloj dentro del chip
+
+
+@dataclass
+class DecodeResult:
+    bits: np.ndarray  # uint8
+    violations: np.ndarray  # índices de bit con violación de código
+    modulation: str
+
+    @property
+    def num_bits(self) -> int:
+        return len(self.bits)
+
+    def bit_string(self) -> str:
+        return (self.bits + ord("0")).tobytes().decode("ascii")
+
+
+# --- Registro de decodificadores específicos ---
+
+_decoders: Dict[str, Decoder] = {}
+
+
+def line_decoder(name: str):
+    """Decorador: registra un decodificador vectorizado para el código `name`."""
+    def decorator(func: Decoder) -> Decoder:
+        _decoders[name] = func
+        return func
+    return decorator
+
+
+def _quantize(values: np.ndarray, alphabet: np.ndarray) -> np.ndarray:
+    """Índice del nivel más cercano de `alphabet` (ordenado) para cada valor."""
+    midpoints = (alphabet[1:] + alphabet[:-1]) / 2
+    return np.searchsorted(midpoints, values)
+
+
+# --- Decodificador genérico compilado desde el codificador ---
+
+class _TableDecoder:
+    """Máquina de estados inversa de un código sin anticipación."""
+
+    def __init__(self, code: LineCode):
+        if code.lookahead:
+            raise ValueError(f"El código '{code.name}' necesita un decodificador específico.")
+        self.alphabet = np.unique(code.chips).astype(np.float64)
+        base, cpb = len(self.alphabet), code.chips_per_bit
+        num_patterns = base ** cpb
+        digits = (np.arange(num_patterns)[:, None] // base ** np.arange(cpb - 1, -1, -1)) % base
+        patterns = self.alphabet[digits]  # (patrones, chips)
+        pattern_index = {tuple(p): i for i, p in enumerate(patterns.tolist())}
+        emitted = {}  # patrón -> [(estado, bit)] que lo emiten
+        for state in range(code.num_states):
+            for bit in (0, 1):
+                emitted.setdefault(pattern_index[tuple(code.chips[state, bit].tolist())], []).append((state, bit))
+
+        self.next_state = np.zeros((code.num_states, num_patterns + 1), dtype=np.intp)
+        self.bit = np.zeros((code.num_states, num_patterns), dtype=np.uint8)
+        self.violation = np.zeros((code.num_states, num_patterns), dtype=bool)
+        self.next_state[:, -1] = np.arange(code.num_states)  # columna identidad para el escaneo
+        for state in range(code.num_states):
+            own = {pattern_index[tuple(code.chips[state, bit].tolist())]: bit for bit in (0, 1)}
+            if len(own) < 2:
+                raise ValueError(f"El código '{code.name}' emite el mismo patrón para '0' y '1'; no es decodificable.")
+            for pattern in range(num_patterns):
+                if pattern in own:
+                    bit = own[pattern]
+                    following = code.next_state[state, bit]
+                elif pattern in emitted:
+                    # Patrón válido en otro estado: violación, y el decodificador se resincroniza
+                    other_state, bit = emitted[pattern][0]
+                    following = code.next_state[other_state, bit]
+                    self.violation[state, pattern] = True
+                else:
+                    # Patrón imposible: se toma el más parecido de los que puede emitir este estado
+                    distances = {p: np.sum((patterns[p] - patterns[pattern]) ** 2) for p in own}
+                    bit = own[min(distances, key=distances.get)]
+                    following = code.next_state[state, bit]
+                    self.violation[state, pattern] = True
+                self.bit[state, pattern] = bit
+                self.next_state[state, pattern] = following
+        self._weights = base ** np.arange(cpb - 1, -1, -1)
+        self.code = code
+
+    def __call__(self, chips: np.ndarray, code: LineCode) -> Tuple[np.ndarray, np.ndarray]:
+        patterns = _quantize(chips, self.alphabet) @ self._weights
+        states, _ = _run_states(patterns, self.next_state, 0)
+        return self.bit[states, patterns], self.violation[states, patterns]
+
+
+_table_decoders: Dict[str, _TableDecoder] = {}
+_table_decoders_lock = threading.Lock()
+
+
+def get_decoder(mod_type) -> Decoder:
+    """Decodificador del código: el específico si está registrado o el compilado desde sus tablas."""
+    code = get_line_code(mod_type)
+    if code.name in _decoders:
+        return _decoders[code.name]
+    with _table_decoders_lock:
+        decoder = _table_decoders.get(code.name)
+        if decoder is None or decoder.code is not code:  # compilado de nuevo si el código se reemplazó
+            decoder = _table_decoders[code.name] = _TableDecoder(code)
+        return decoder
+
+
+# --- Decodificadores específicos ---
+
+def _bit_levels(chips: np.ndarray) -> np.ndarray:
+    """Nivel (-1, 0, +1) de cada bit en códigos de nivel completo (media de sus chips)."""
+    return _quantize(chips.mean(axis=1), np.array([-1.0, 0.0, 1.0])) - 1
+
+
+def _previous_mark_polarity(levels: np.ndarray, initial: int) -> np.ndarray:
+    """Polaridad de la última marca anterior a cada bit (`initial` si aún no hubo ninguna)."""
+    positions = np.where(levels != 0, np.arange(len(levels)), -1)
+    last = np.maximum.accumulate(np.concatenate(([-1], positions[:-1])))
+    return np.where(last >= 0, levels[np.maximum(last, 0)], initial)
+
+
+def _zero_runs(levels: np.ndarray, length: int) -> np.ndarray:
+    """Bits en los que empieza una racha de al menos `length` ceros."""
+    if len(levels) < length:
+        return np.zeros(len(levels), dtype=bool)
+    windows = np.lib.stride_tricks.sliding_window_view(levels == 0, length)
+    return np.concatenate((windows.all(axis=1), np.zeros(length - 1, dtype=bool)))
+
+
+@line_decoder("HDB3")
+def _decode_hdb3(chips: np.ndarray, code: LineCode) -> Tuple[np.ndarray, np.ndarray]:
+    """Las violaciones bipolares marcan cada sustitución 000V/B00V: se anulan V y el bit 3 posiciones antes."""
+    levels = _bit_levels(chips)
+    n = len(levels)
+    previous = _previous_mark_polarity(levels, code.initial_state[0])
+    v_positions = np.flatnonzero((levels != 0) & (levels == previous))
+    bits = (levels != 0).astype(np.uint8)
+    violations = _zero_runs(levels, 4)
+    starts = v_positions - 3
+    bits[v_positions] = 0
+    bits[starts[starts >= 0]] = 0
+
+    # Reglas de HDB3: dos ceros antes de V, V alternan polaridad, B solo con nº par de marcas desde la V anterior
+    bad = starts < 0
+    ok = ~bad
+    bad[ok] |= (levels[v_positions[ok] - 1] != 0) | (levels[v_positions[ok] - 2] != 0)
+    if len(v_positions) > 1:
+        bad[1:] |= levels[v_positions[1:]] == levels[v_positions[:-1]]
+    marks_before = np.concatenate(([0], np.cumsum(levels != 0)))  # marcas en [0, i)
+    previous_v = np.concatenate(([-1], v_positions[:-1]))
+    clipped = np.clip(starts, 0, n)
+    between = marks_before[clipped] - marks_before[previous_v + 1]
+    has_b = np.zeros(len(v_positions), dtype=bool)
+    has_b[ok] = levels[starts[ok]] != 0
+    bad |= has_b == (between % 2 == 1)
+    violations[v_positions[bad]] = True
+    return bits, violations
+
+
+@line_decoder("B8ZS")
+def _decode_b8zs(chips: np.ndarray, code: LineCode) -> Tuple[np.ndarray, np.ndarray]:
+    """Busca los grupos 000VB0VB (V con la polaridad de la marca anterior) y los sustituye por ocho '0'."""
+    levels = _bit_levels(chips)
+    n = len(levels)
+    previous = _previous_mark_polarity(levels, code.initial_state[0])
+    padded = np.concatenate((levels, np.zeros(7, dtype=levels.dtype)))
+    w = np.lib.stride_tricks.sliding_window_view(padded, 8)[:n]
+    x = w[:, 3]
+    groups = ((w[:, 0] == 0) & (w[:, 1] == 0) & (w[:, 2] == 0) & (x != 0) & (x == previous)
+              & (w[:, 4] == -x) & (w[:, 5] == 0) & (w[:, 6] == -x) & (w[:, 7] == x))
+    in_group = np.convolve(groups, np.ones(8, dtype=int))[:n] > 0
+    bits = ((levels != 0) & ~in_group).astype(np.uint8)
+    bipolar = (levels != 0) & (levels == previous) & ~in_group
+    return bits, bipolar | _zero_runs(levels, 8)
+
+
+_4B5B_DECODE = np.full(32, -1, dtype=np.int16)
+
+
+@line_decoder("4B5B/NRZI")
+def _decode_4b5b_nrzi(chips: np.ndarray, code: LineCode) -> Tuple[np.ndarray, np.ndarray]:
+    """NRZI → bits de código (un '1' por cambio de nivel) → tabla inversa 5B→4B por grupo de 4 bits."""
+    if _4B5B_DECODE[_4B5B_CODES[0]] < 0:
+        _4B5B_DECODE[list(_4B5B_CODES)] = np.arange(16)
+    n = len(chips)
+    groups = -(-n // 4)
+    flat = chips.reshape(-1)
+    # Un grupo incompleto al final se completa repitiendo el último chip (se marca si no decodifica)
+    padded = np.concatenate((flat, np.repeat(flat[-1:], groups * 20 - len(flat)))) if len(flat) else flat
+    levels = np.where(padded.reshape(-1, 4).mean(axis=1) >= 0, 1, -1)  # un nivel por bit de código
+    previous = np.concatenate(([code.initial_state[2]], levels[:-1]))
+    code_bits = (levels != previous).reshape(groups, 5)
+    symbols = code_bits @ (1 << np.arange(4, -1, -1))
+    nibbles = _4B5B_DECODE[symbols]
+    invalid = nibbles < 0
+    partial = n % 4
+    if partial:
+        # Último grupo incompleto: el emisor lo rellenó con `tail_bit`; se elige el nibble cuyos
+        # chips coinciden mejor con los observados
+        observed = np.where(flat[-partial * 5:] >= 0, 1, -1)
+        level = previous[(groups - 1) * 5]
+        best = None
+        for prefix in range(1 << partial):
+            nibble = (prefix << (4 - partial)) | (((1 << (4 - partial)) - 1) if code.tail_bit else 0)
+            toggles = (_4B5B_CODES[nibble] >> np.arange(4, -1, -1)) & 1
+            expected = np.repeat(level * np.cumprod(np.where(toggles, -1, 1)), 4)[:partial * 5]
+            mismatches = np.count_nonzero(expected != observed)
+            if best is None or mismatches < best[0]:
+                best = (mismatches, nibble)
+        nibbles[-1], invalid[-1] = best[1], best[0] > 0
+    bits = ((np.maximum(nibbles, 0)[:, None] >> np.arange(3, -1, -1)) & 1).astype(np.uint8).reshape(-1)[:n]
+    return bits, np.repeat(invalid, 4)[:n]
+
+
+# --- Recuperación de chips a partir de las muestras ---
+
+def _clock_offsets(samples: np.ndarray, chip_len: float, alphabet: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Desfase del reloj (en muestras) medido por ventanas: la media circular de la posición de
+    los flancos respecto a la rejilla nominal de chips. Devuelve (centros de ventana, desfases),
+    con los desfases desenrollados para seguir una deriva acumulada de varios chips.
+    """
+    window = max(1, int(round(chip_len / 4)))
+    smooth = np.convolve(samples, np.ones(window) / window, mode="same")
+    edges = np.flatnonzero(np.diff(_quantize(smooth, alphabet))) + 1.0
+    window_len = _DRIFT_WINDOW_CHIPS * chip_len
+    num_windows = max(1, int(np.ceil(len(samples) / window_len)))
+    centers = (np.arange(num_windows) + 0.5) * window_len
+    if len(edges) == 0:
+        return centers, np.zeros(num_windows)
+    angles = 2 * np.pi * edges / chip_len
+    index = np.minimum((edges // window_len).astype(np.intp), num_windows - 1)
+    sin = np.bincount(index, np.sin(angles), num_windows)
+    cos = np.bincount(index, np.cos(angles), num_windows)
+    seen = np.bincount(index, minlength=num_windows) > 0
+    phases = np.unwrap(np.arctan2(sin[seen], cos[seen]))
+    return centers[seen], phases / (2 * np.pi) * chip_len
+
+
+def chip_values(samples: np.ndarray, code: LineCode, samples_per_bit: float, tolerant: bool = False,
+                track_clock: Optional[bool] = None) -> np.ndarray:
+    """
+    Valor de cada chip (n_bits, chips_per_bit). Sin tolerancia se toma la muestra central de
+    cada chip en la rejilla nominal; con tolerancia se promedia la parte central del chip, sobre
+    una rejilla corregida con la fase del reloj medida por ventanas salvo con `track_clock=False`
+    (temporización conocida, p. ej. en simulaciones de BER).
+    """
+    samples = np.asarray(samples, dtype=np.float64)
+    cpb = code.chips_per_bit
+    chip_len = samples_per_bit / cpb
+    alphabet = np.unique(code.chips).astype(np.float64)
+    if not tolerant:
+        num_bits = int(round(len(samples) / samples_per_bit))
+        k = np.arange(num_bits * cpb)
+        centers = (np.floor(k * chip_len) + np.floor((k + 1) * chip_len) - 1) // 2
+        return samples[np.clip(centers.astype(np.intp), 0, len(samples) - 1)].reshape(num_bits, cpb)
+    if track_clock is False:
+        num_bits = int(round(len(samples) / samples_per_bit))
+        return _integrate_chips(samples, np.arange(num_bits * cpb + 1) * chip_len, cpb)
+
+    window_centers, offsets = _clock_offsets(samples, chip_len, alphabet)
+    # Rejilla corregida: inicio de cada chip = posición nominal + desfase interpolado
+    max_chips = int(len(samples) / chip_len * 1.1) + cpb
+    nominal = np.arange(max_chips + 1) * chip_len
+    # Los desfases se midieron sobre la captura: se evalúan en la posición ya corregida
+    bounds = nominal + np.interp(nominal, window_centers, offsets)
+    bounds = nominal + np.interp(bounds, window_centers, offsets)
+    bounds = bounds[bounds <= len(samples) + chip_len / 2]
+    num_bits = (len(bounds) - 1) // cpb
+    return _integrate_chips(samples, bounds[:num_bits * cpb + 1], cpb)
+
+
+def _integrate_chips(samples: np.ndarray, bounds: np.ndarray, cpb: int) -> np.ndarray:
+    """Media de la parte central de cada chip (integración y descarga) a partir de sus límites."""
+    margin = _CHIP_MARGIN * np.diff(bounds)
+    lo = np.clip(np.round(bounds[:-1] + margin), 0, len(samples) - 1).astype(np.intp)
+    hi = np.clip(np.round(bounds[1:] - margin), 0, len(samples)).astype(np.intp)
+    hi = np.maximum(hi, lo + 1)
+    cumulative = np.concatenate(([0.0], np.cumsum(samples)))
+    return ((cumulative[hi] - cumulative[lo]) / (hi - lo)).reshape(-1, cpb)
+
+
+def decode_samples(samples: np.ndarray, mod_type, samples_per_bit: float, tolerant: bool = False,
+                   track_clock: Optional[bool] = None) -> DecodeResult:
+    """Decodifica un buffer de muestras de la modulación indicada."""
+    code = get_line_code(mod_type)
+    tracking = tolerant and track_clock is not False
+    min_samples = code.chips_per_bit * (_MIN_TOLERANT_CHIP_SAMPLES if tracking else 1)
+    if samples_per_bit < min_samples:
+        raise ValueError(f"'{code.name}' necesita al menos {min_samples} muestras por bit"
+                         f"{' para recuperar el reloj' if tracking else ''}.")
+    chips = chip_values(samples, code, samples_per_bit, tolerant, track_clock)
+    if len(chips) == 0:
+        return DecodeResult(np.empty(0, dtype=np.uint8), np.empty(0, dtype=np.intp), code.name)
+    bits, violations = get_decoder(code)(chips, code)
+    return DecodeResult(bits.astype(np.uint8, copy=False), np.flatnonzero(violations), code.name)
+
+
+# --- Verificación de ida y vuelta ---
+
+def distort(levels: np.ndarray, noise_std: float = 0.0, drift_ppm: float = 0.0,
+            rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    """Simula una captura: remuestrea con una deriva de reloj de `drift_ppm` y añade ruido gaussiano."""
+    rng = rng or np.random.default_rng()
+    samples = levels.astype(np.float64)
+    if drift_ppm:
+        positions = np.arange(int(len(samples) / (1 + drift_ppm * 1e-6))) * (1 + drift_ppm * 1e-6)
+        samples = samples[np.minimum(positions.astype(np.intp), len(samples) - 1)]
+    if noise_std:
+        samples = samples + rng.normal(0.0, noise_std, len(samples))
+    return samples
+
+
+def verify_roundtrip(mod_type, bits: np.ndarray, samples_per_bit: int, noise_std: float = 0.0,
+                     drift_ppm: float = 0.0, tolerant: Optional[bool] = None,
+                     rng: Optional[np.random.Generator] = None) -> dict:
+    """
+    Codifica `bits`, opcionalmente degrada la señal, la decodifica y compara.
+    Por defecto se decodifica con tolerancia solo si hay ruido o deriva.
+    """
+    code = get_line_code(mod_type)
+    tolerant = bool(noise_std or drift_ppm) if tolerant is None else tolerant
+    levels, _ = code.encode(bits, samples_per_bit)
+    samples = distort(levels, noise_std, drift_ppm, rng)
+    started = time.perf_counter()
+    result = decode_samples(samples, code, samples_per_bit, tolerant)
+    decode_s = time.perf_counter() - started
+    compared = min(len(bits), result.num_bits)
+    errors = int(np.count_nonzero(bits[:compared] != result.bits[:compared])) + abs(len(bits) - result.num_bits)
+    return {
+        "modulation": code.name,
+        "bits": len(bits),
+        "decoded_bits": result.num_bits,
+        "bit_errors": errors,
+        "violations": len(result.violations),
+        "decode_ms": decode_s * 1e3,
+        "ok": errors == 0,
+    }
+
+
+def run_roundtrip(mod_types, num_bits: int, trials: int, samples_per_bit: int, noise_std: float = 0.0,
+                  drift_ppm: float = 0.0, tolerant: Optional[bool] = None, seed: Optional[int] = None) -> dict:
+    """
+    Verificación masiva: `trials` mensajes aleatorios de `num_bits` bits por modulación.
+    Pensada para CI (ver benchmarks/check_roundtrip.py) y para /verify/roundtrip.
+    """
+    seed = int(np.random.SeedSequence(seed).entropy) % 2 ** 63 if seed is None else seed
+    rng = np.random.default_rng(seed)
+    results = []
+    for mod_type in mod_types:
+        totals = {"modulation": get_line_code(mod_type).name, "trials": trials, "bits": 0, "bit_errors": 0,
+                  "violations": 0, "failed_trials": 0, "decode_ms": 0.0}
+        for _ in range(trials):
+            bits = rng.integers(0, 2, num_bits, dtype=np.uint8)
+            trial = verify_roundtrip(mod_type, bits, samples_per_bit, noise_std, drift_ppm, tolerant, rng)
+            for key in ("bits", "bit_errors", "violations", "decode_ms"):
+                totals[key] += trial[key]
+            totals["failed_trials"] += not trial["ok"]
+        totals["ok"] = totals["failed_trials"] == 0
+        results.append(totals)
+    return {"ok": all(result["ok"] for result in results), "seed": seed, "results": results}
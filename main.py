@@ -1,23 +1,84 @@
 ﻿# main.py
 
-import threading
-from fastapi import FastAPI, HTTPException, Body
-from fastapi.responses import StreamingResponse
-from scalar_fastapi import get_scalar_api_reference
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from fastapi import FastAPI, HTTPException, Body, Query, Header, Request
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from starlette.middleware.cors import CORSMiddleware
 
 # Módulos locales
-from models import ModulateRequest, ModulationType, GpioStatusResponse, ModulationListResponse, GpioSendResponse
-from config import GPIO_PIN_MIN, GPIO_PIN_MAX
-from signal_generation import generate_original_signal, get_modulation_function
-from plotting import create_plot_image
-from gpio_handler import send_to_gpio, get_gpio_state, ON_RASPBERRY_PI
+from models import ModulateRequest, ModulationType, GpioStatusResponse, ModulationListResponse, GpioTimingReport
+from models import GpioJobResponse, GpioJobStatus, PlotCacheStatsResponse, PlotRequest, PlotFormat
+from models import SamplesRequest, SampleFormat, BatchRequest, BatchOutput, RenderPoolStatsResponse, LineCodeInfo
+from models import SampleDtype, DecodeResponse, RoundTripRequest, RoundTripResponse
+from models import EyeDiagramRequest, BerRequest, BerResponse
+from models import SpectrumRequest, SpectrumResponse, SpectrumOutput, PsdCacheStatsResponse
+from models import SimulatedEdge, SimulatedEdgesResponse
+from line_codes import line_codes, is_line_code, waveform_cache
+from line_decoding import decode_samples, run_roundtrip
+from config import GPIO_PIN_MIN, GPIO_PIN_MAX, MAX_PLOT_BITS, GPIO_JOB_MAX_WAIT_S
+from config import PLOT_CACHE_WARMUP, PLOT_CACHE_WARMUP_BITS, SAMPLES_PER_BIT
+from config import RENDER_RETRY_AFTER_S, MAX_DECODE_BYTES, MAX_REPORTED_VIOLATIONS, GPIO_SIMULATOR_MAX_EVENTS
+from signal_generation import modulate, modulate_batch, get_modulation_function, iter_modulated_chunks, message_to_bits
+from rendering import PLOT_MEDIA_TYPES, RenderPoolBusy, render_message, render_signal, render_batch, get_render_pool
+from rendering import render_eye_message, render_psd
+from channel import ber_sweep
+from spectrum import random_psd, message_psd, segment_length, occupied_bandwidth, psd_cache
+from plot_cache import plot_cache, plot_cache_key, make_etag
+from signal_export import SampleStream, TransitionStream, RangeNotSatisfiable, parse_range, read_sample_buffer
+from gpio_handler import send_to_gpio_pins, get_gpio_state, check_gpio_rate, achievable_timing, get_gpio_backend
+from gpio_backends import SimulatedGpioBackend
+from gpio_jobs import GpioJob, QueueFullError, get_scheduler
+from signal_types import bit_time_offsets
+from app_logging import get_logger
+from metrics import render_metrics, register_collector, cache_collector
+
+logger = get_logger("api")
+
+async def _warm_up_plot_cache():
+    """
+    Pre-renderiza todos los mensajes de PLOT_CACHE_WARMUP_BITS bits para cada modulación.
+    Los renders van al ejecutor de renderizado de uno en uno, así que el bucle de eventos sigue
+    libre y el precalentamiento ocupa como mucho un hueco; si el pool está lleno se espera y se reintenta.
+    """
+    logger.info("Precalentando caché de gráficas (%d bits)...", PLOT_CACHE_WARMUP_BITS)
+    render_pool = get_render_pool()
+    for digits in itertools.product("01", repeat=PLOT_CACHE_WARMUP_BITS):
+        bits = message_to_bits("".join(digits))
+        for code in line_codes():
+            key = plot_cache_key(bits, code.name)
+            if plot_cache.get(key) is not None:
+                continue
+            while True:
+                try:
+                    plot_cache.put(key, await render_pool.run(render_message, bits, code.name))
+                    break
+                except RenderPoolBusy:
+                    await asyncio.sleep(RENDER_RETRY_AFTER_S)
+                except Exception as e:
+                    logger.warning("No se pudo precalentar la gráfica %s de '%s': %s", code.name, bits, e)
+                    break
+    logger.info("Caché de gráficas precalentada: %d entradas.", plot_cache.stats()["entries"])
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    render_pool = get_render_pool()
+    logger.info("Arrancando ejecutor de renderizado (%s, %d trabajadores)...", render_pool.mode, render_pool.workers)
+    await asyncio.to_thread(render_pool.warm_up)
+    warmup = asyncio.create_task(_warm_up_plot_cache()) if PLOT_CACHE_WARMUP else None
+    yield
+    if warmup is not None:
+        warmup.cancel()
+    render_pool.shutdown()
 
 # --- Crear la Aplicación FastAPI ---
 app = FastAPI(
     title="API Modulador de Señales",
     description="Genera gráficas de señales PCM o las envía a pines GPIO de Raspberry Pi.",
-    version="1.1.0"
+    version="1.1.0",
+    lifespan=lifespan
 )
 
 # --- Configurar CORS ---
@@ -31,13 +92,15 @@ app.add_middleware(
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
-    allow_headers=["*"]
+    allow_headers=["*"],
+    expose_headers=["ETag", "Accept-Ranges", "Content-Range", "X-Num-Bits", "X-Samples-Per-Bit", "X-Bit-Duration"]
 )
 
 # --- Endpoint para Documentación Scalar ---
 @app.get("/scalar", include_in_schema=False)
 async def scalar_html():
     """Sirve la interfaz de documentación API de Scalar."""
+    from scalar_fastapi import get_scalar_api_reference  # Solo se carga si se abre la documentación
     return get_scalar_api_reference(
         openapi_url=app.openapi_url,
         title=app.title + " - Scalar"
@@ -46,112 +109,506 @@ async def scalar_html():
 
 # --- Endpoints de la API ---
 
+def _render_busy(error: RenderPoolBusy) -> HTTPException:
+    return HTTPException(status_code=503, detail=str(error), headers={"Retry-After": str(RENDER_RETRY_AFTER_S)})
+
+def _render_timeout() -> HTTPException:
+    return HTTPException(status_code=504, detail="El renderizado superó el tiempo máximo.")
+
 @app.post(
     "/modulate/plot",
-    response_class=StreamingResponse,
+    response_class=Response,
     summary="Generar Gráfica de Señal Modulada",
     tags=["Modulación"],
     responses={
-        200: {"content": {"image/png": {}}, "description": "Imagen PNG de la gráfica generada."},
+        200: {"content": {"image/png": {}, "image/svg+xml": {}}, "description": "Imagen PNG o SVG de la gráfica generada."},
+        304: {"description": "La gráfica no cambió respecto al ETag enviado en If-None-Match."},
         400: {"description": "Tipo de modulación no soportado"},
-        422: {"description": "Error de validación en los datos de entrada"},
-        500: {"description": "Error interno del servidor al generar la gráfica"}
+        422: {"description": "Error de validación en los datos de entrada o mensaje demasiado largo para graficar"},
+        500: {"description": "Error interno del servidor al generar la gráfica"},
+        503: {"description": "Ejecutor de renderizado saturado; reintentar tras Retry-After."},
+        504: {"description": "El renderizado superó el tiempo máximo."}
     }
 )
-async def get_modulation_plot(request: ModulateRequest):
+async def get_modulation_plot(request: PlotRequest, if_none_match: Optional[str] = Header(None)):
     """
-    Genera una señal modulada según los parámetros y devuelve una imagen PNG de la gráfica.
+    Genera una señal modulada según los parámetros y devuelve una imagen PNG o SVG de la gráfica,
+    renderizada con matplotlib (referencia) o con el rasterizador rápido según `renderer`.
+    Las imágenes se guardan en caché; con `If-None-Match` igual al ETag se responde 304 sin cuerpo.
+    El dibujo se hace en el ejecutor de renderizado (por defecto un pool de procesos), sin bloquear el servidor.
     """
-    print(f"Solicitud de gráfica: {request.modulation_type.value} para '{request.binary_data}'")
+    logger.info("Solicitud de gráfica: %s para %d bits", request.modulation_type, request.num_bits())
     generate_func = get_modulation_function(request.modulation_type)
     if not generate_func:
         raise HTTPException(status_code=400, detail=f"Tipo de modulación '{request.modulation_type}' no soportado.")
+    if request.num_bits() > MAX_PLOT_BITS:
+        raise HTTPException(status_code=422,
+                            detail=f"Solo se pueden graficar mensajes de hasta {MAX_PLOT_BITS} bits.")
 
     try:
-        t_orig, sig_orig = generate_original_signal(request.binary_data)
-        t_mod, sig_mod = generate_func(request.binary_data)
-        image_buffer = create_plot_image(t_mod, request.binary_data, sig_mod, request.modulation_type.value)
-        return StreamingResponse(image_buffer, media_type="image/png")
+        bits = message_to_bits(request.payload())
+        key = plot_cache_key(bits, request.modulation_type, request.plot_style(),
+                             request.bit_duration, request.samples_per_bit)
+        etag = make_etag(key)
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+            # El cliente ya tiene la imagen: es un acierto aunque no se lea de la caché
+            plot_cache.record_hit(key)
+            return Response(status_code=304, headers=headers)
+        image = plot_cache.get(key)
+        if image is None:
+            signal = modulate(bits, request.modulation_type, request.samples_per_bit, request.bit_duration)
+            image = await get_render_pool().run(render_signal, signal, request.renderer, request.image_format,
+                                                timeout=request.render_timeout_s)
+            plot_cache.put(key, image)
+        return Response(content=image, media_type=PLOT_MEDIA_TYPES[request.image_format], headers=headers)
+    except RenderPoolBusy as e:
+        raise _render_busy(e)
+    except asyncio.TimeoutError:
+        raise _render_timeout()
     except Exception as e:
-        print(f"Error generando gráfica: {e}")
+        logger.error("Error generando gráfica: %s", e)
         raise HTTPException(status_code=500, detail=f"Error interno al generar la gráfica: {e}")
 
 
 @app.post(
-    "/modulate/send_gpio",
-    response_model=GpioSendResponse,
-    summary="Enviar Señal Modulada a GPIO",
-    tags=["GPIO"],
+    "/modulate/batch",
+    response_class=Response,
+    summary="Generar Gráficas de un Lote de Mensajes y Modulaciones",
+    tags=["Modulación"],
     responses={
-        200: {"description": "Envío a GPIO completado con éxito."},
-        400: {"description": "Tipo de modulación no soportado."},
-        422: {"description": "Error de validación en los datos de entrada."},
-        429: {"description": "GPIO ya está en uso."},
-        500: {"description": "Error interno durante el envío a GPIO."},
-        501: {"description": "Funcionalidad GPIO no disponible en el servidor."}
+        200: {"content": {"image/png": {}, "image/svg+xml": {}, "application/zip": {}},
+              "description": "Imagen multipanel o zip con una gráfica por combinación."},
+        422: {"description": "Error de validación, lote demasiado grande o mensaje demasiado largo para graficar"},
+        500: {"description": "Error interno del servidor al generar las gráficas"},
+        503: {"description": "Ejecutor de renderizado saturado; reintentar tras Retry-After."},
+        504: {"description": "El renderizado superó el tiempo máximo."}
+    }
+)
+async def get_batch_plot(request: BatchRequest):
+    """
+    Modula todos los `messages` con todos los `modulation_types` en una sola pasada vectorizada
+    (matriz 2-D de bits por código) y devuelve una imagen multipanel (fila = mensaje,
+    columna = modulación) o un zip con una gráfica por combinación.
+    """
+    logger.info("Solicitud de lote: %d mensajes × %d modulaciones (%s, %s)", len(request.messages),
+                len(request.modulation_types), request.output.value, "en paralelo" if request.parallel else "secuencial")
+    if request.max_bits() > MAX_PLOT_BITS:
+        raise HTTPException(status_code=422,
+                            detail=f"Solo se pueden graficar mensajes de hasta {MAX_PLOT_BITS} bits.")
+
+    try:
+        grid = modulate_batch(request.payloads(), request.modulation_types, request.samples_per_bit,
+                              request.bit_duration)
+        data = await get_render_pool().run(render_batch, grid, request.renderer, request.image_format,
+                                           request.output, request.parallel, timeout=request.render_timeout_s)
+        if request.output == BatchOutput.ZIP:
+            return Response(content=data, media_type="application/zip",
+                            headers={"Content-Disposition": 'attachment; filename="modulaciones.zip"'})
+        return Response(content=data, media_type=PLOT_MEDIA_TYPES[request.image_format])
+    except RenderPoolBusy as e:
+        raise _render_busy(e)
+    except asyncio.TimeoutError:
+        raise _render_timeout()
+    except Exception as e:
+        logger.error("Error generando el lote: %s", e)
+        raise HTTPException(status_code=500, detail=f"Error interno al generar el lote: {e}")
+
+
+SAMPLE_FILENAMES = {SampleFormat.RAW: "signal.bin", SampleFormat.NPY: "signal.npy",
+                    SampleFormat.TRANSITIONS: "transitions.bin"}
+
+@app.post(
+    "/modulate/samples",
+    response_class=Response,
+    summary="Descargar Muestras de la Señal Modulada",
+    tags=["Modulación"],
+    responses={
+        200: {"content": {"application/octet-stream": {}}, "description": "Señal completa en el formato binario pedido."},
+        206: {"description": "Parte de la señal indicada por la cabecera Range."},
+        400: {"description": "Tipo de modulación no soportado"},
+        416: {"description": "El rango pedido queda fuera de la señal."},
+        422: {"description": "Error de validación en los datos de entrada"}
+    }
+)
+async def get_modulation_samples(request: SamplesRequest, range_header: Optional[str] = Header(None, alias="Range")):
+    """
+    Devuelve la señal modulada como buffer binario en lugar de una imagen:
+    `raw` (cabecera de 40 bytes + muestras int8/float32 little-endian), `npy` o `transitions`.
+    Todos los formatos se generan y envían por bloques (sin cargar la señal entera en memoria) y
+    admiten `Range: bytes=a-b` para descargar solo una parte de señales largas.
+    """
+    logger.info("Solicitud de muestras: %s para %d bits (%s, %s)", request.modulation_type, request.num_bits(),
+                request.sample_format.value, request.sample_dtype.value)
+    if not get_modulation_function(request.modulation_type):
+        raise HTTPException(status_code=400, detail=f"Tipo de modulación '{request.modulation_type}' no soportado.")
+
+    payload, num_bits = request.payload(), request.num_bits()
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f'attachment; filename="{SAMPLE_FILENAMES[request.sample_format]}"',
+        "X-Num-Bits": str(num_bits),
+        "X-Samples-Per-Bit": str(request.samples_per_bit),
+        "X-Bit-Duration": repr(request.bit_duration),
+    }
+    if request.sample_format == SampleFormat.TRANSITIONS:
+        # Cuenta las transiciones de cada bloque (recorre la señal una vez, sin guardarla)
+        stream = await asyncio.to_thread(TransitionStream, payload, request.modulation_type, num_bits,
+                                         samples_per_bit=request.samples_per_bit, bit_duration=request.bit_duration)
+    else:
+        stream = SampleStream(payload, request.modulation_type, num_bits, request.sample_format, request.sample_dtype,
+                              samples_per_bit=request.samples_per_bit, bit_duration=request.bit_duration)
+    total = stream.size
+
+    try:
+        byte_range = parse_range(range_header, total)
+    except RangeNotSatisfiable as e:
+        raise HTTPException(status_code=416, detail=str(e), headers={"Content-Range": f"bytes */{total}"})
+    status_code = 200
+    start, stop = 0, total
+    if byte_range is not None:
+        status_code = 206
+        start, stop = byte_range
+        headers["Content-Range"] = f"bytes {start}-{stop - 1}/{total}"
+    headers["Content-Length"] = str(stop - start)
+
+    return StreamingResponse(stream.iter_bytes(start, stop), status_code=status_code,
+                             media_type="application/octet-stream", headers=headers)
+
+
+async def _read_body(request: Request, max_bytes: int) -> bytearray:
+    """Lee el cuerpo de la solicitud; responde 413 en cuanto (o antes de que) supere `max_bytes`."""
+    too_large = HTTPException(status_code=413, detail=f"El buffer supera el máximo de {max_bytes} bytes.")
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > max_bytes:
+        raise too_large
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > max_bytes:
+            raise too_large
+    return body  # bytearray: sin copiar el buffer completo otra vez
+
+
+@app.post(
+    "/demodulate",
+    response_model=DecodeResponse,
+    summary="Decodificar un Buffer de Muestras",
+    tags=["Decodificación"],
+    openapi_extra={"requestBody": {"required": True, "content": {"application/octet-stream": {}}}},
+    responses={
+        400: {"description": "Tipo de modulación no soportado o buffer mal formado"},
+        413: {"description": "El buffer supera el tamaño máximo"},
+    }
+)
+async def demodulate_samples(
+        request: Request,
+        modulation_type: str = Query(..., description="Código de línea con el que se moduló la señal."),
+        samples_per_bit: Optional[float] = Query(None, gt=0, description="Muestras por bit; por defecto las de la cabecera o las del servidor."),
+        sample_dtype: SampleDtype = Query(SampleDtype.INT8, description="Tipo de las muestras si el buffer no trae cabecera."),
+        tolerant: bool = Query(False, description="Integra cada chip y sigue la fase del reloj (ruido y deriva)."),
+        include_bits: bool = Query(True, description="Incluir los bits decodificados en la respuesta."),
+):
+    """
+    Decodifica una captura enviada en el cuerpo: `raw` (con cabecera PCMS, incluidas las
+    transiciones), `.npy` o muestras sin cabecera. Devuelve los bits y las violaciones de código
+    detectadas (violaciones bipolares en AMI, falta de transición central en Manchester, grupos
+    5B inválidos en 4B5B...).
+    """
+    if not is_line_code(modulation_type):
+        raise HTTPException(status_code=400, detail=f"Tipo de modulación '{modulation_type}' no soportado.")
+    data = await _read_body(request, MAX_DECODE_BYTES)
+    try:
+        buffer = read_sample_buffer(data, sample_dtype)
+        spb = samples_per_bit or buffer.samples_per_bit or SAMPLES_PER_BIT
+        result = await asyncio.to_thread(decode_samples, buffer.samples, modulation_type, spb, tolerant)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    logger.info("Decodificados %d bits de %s (%d violaciones)", result.num_bits, modulation_type, len(result.violations))
+    return DecodeResponse(
+        modulation_type=result.modulation,
+        samples_per_bit=spb,
+        num_bits=result.num_bits,
+        bits=result.bit_string() if include_bits else None,
+        violation_count=len(result.violations),
+        violations=result.violations[:MAX_REPORTED_VIOLATIONS].tolist(),
+        violations_truncated=len(result.violations) > MAX_REPORTED_VIOLATIONS,
+    )
+
+
+@app.post(
+    "/verify/roundtrip",
+    response_model=RoundTripResponse,
+    summary="Verificación de Ida y Vuelta",
+    tags=["Decodificación"]
+)
+async def verify_roundtrip_endpoint(request: RoundTripRequest):
+    """
+    Modula mensajes aleatorios, opcionalmente les añade ruido y deriva de reloj, los decodifica
+    y compara. `ok` es falso si alguna prueba no recupera exactamente los bits enviados.
+    """
+    report = await asyncio.to_thread(
+        run_roundtrip, request.modulation_types, request.num_bits, request.trials, request.samples_per_bit,
+        request.noise_std, request.drift_ppm, request.tolerant, request.seed)
+    return RoundTripResponse(**report)
+
+
+@app.post(
+    "/channel/eye",
+    response_class=Response,
+    summary="Diagrama de Ojo tras el Canal",
+    tags=["Canal"],
+    responses={
+        200: {"content": {"image/png": {}}, "description": "Diagrama de ojo (mapa de densidad)."},
+        503: {"description": "Ejecutor de renderizado saturado"},
+        504: {"description": "El renderizado superó el tiempo máximo"},
     }
 )
+async def get_eye_diagram(request: EyeDiagramRequest):
+    """
+    Pasa el mensaje (o `random_bits` bits aleatorios) por el canal simulado (jitter, filtro RC o
+    ideal y AWGN) y superpone todos los periodos de bit en un histograma 2-D.
+    """
+    try:
+        image = await get_render_pool().run(render_eye_message, request.payload(), request.modulation_type,
+                                            request.samples_per_bit, request.random_bits, request.channel,
+                                            timeout=request.render_timeout_s)
+    except RenderPoolBusy as e:
+        raise _render_busy(e)
+    except asyncio.TimeoutError:
+        raise _render_timeout()
+    return Response(content=image, media_type="image/png")
+
+
+@app.post(
+    "/channel/ber",
+    response_model=BerResponse,
+    summary="Curva BER-SNR (Monte Carlo)",
+    tags=["Canal"]
+)
+async def get_ber_curve(request: BerRequest):
+    """
+    Simula `num_bits` bits aleatorios por punto de SNR y modulación a través del canal y cuenta
+    los errores del receptor (integración por chip con temporización ideal).
+    """
+    try:
+        report = await asyncio.to_thread(ber_sweep, request.modulation_types, request.snr_db, request.num_bits,
+                                         request.samples_per_bit, request.channel(), request.seed)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return BerResponse(samples_per_bit=request.samples_per_bit, **report)
+
+
+def _compute_spectra(request: SpectrumRequest):
+    """PSD de cada código pedido: memorizada con datos aleatorios o calculada sobre el mensaje."""
+    payload = request.payload()
+    nperseg = segment_length(request.segment_bits, request.samples_per_bit)
+    spectra = []
+    for mod in request.modulation_types:
+        if payload is None:
+            freqs, psd = random_psd(mod, request.samples_per_bit, request.segment_bits)
+        else:
+            freqs, psd = message_psd(payload, mod, request.samples_per_bit, nperseg)
+        spectra.append((mod, psd))
+    return freqs, nperseg, spectra
+
+@app.post(
+    "/spectrum",
+    response_model=SpectrumResponse,
+    summary="Densidad Espectral de Potencia",
+    tags=["Canal"],
+    responses={
+        200: {"content": {"image/png": {}, "image/svg+xml": {}},
+              "description": "PSD en JSON o como gráfica según `output`."},
+        503: {"description": "Ejecutor de renderizado saturado"},
+        504: {"description": "El renderizado superó el tiempo máximo"},
+    }
+)
+async def get_spectrum(request: SpectrumRequest):
+    """
+    Compara el espectro de los códigos (PSD de Welch, ventana de Hann, solape del 50 %) con datos
+    aleatorios o con el mensaje enviado. Incluye los anchos de banda que contienen el 90 % y el
+    99 % de la potencia y la fracción en continua.
+    """
+    try:
+        freqs, nperseg, spectra = await asyncio.to_thread(_compute_spectra, request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    keep = freqs <= request.max_frequency if request.max_frequency else slice(None)
+    if request.output != SpectrumOutput.JSON:
+        image_format = PlotFormat(request.output.value)
+        curves = [(mod, psd[keep]) for mod, psd in spectra]
+        try:
+            image = await get_render_pool().run(render_psd, freqs[keep], curves, image_format,
+                                                timeout=request.render_timeout_s)
+        except RenderPoolBusy as e:
+            raise _render_busy(e)
+        except asyncio.TimeoutError:
+            raise _render_timeout()
+        return Response(content=image, media_type=PLOT_MEDIA_TYPES[image_format])
+    return SpectrumResponse(
+        samples_per_bit=request.samples_per_bit,
+        segment_samples=nperseg,
+        bit_rate_hz=1.0 / request.bit_duration,
+        frequencies=freqs[keep].tolist(),
+        curves=[{"modulation": mod, "psd": psd[keep].tolist(),
+                 "bandwidth_90": occupied_bandwidth(freqs, psd, 0.90),
+                 "bandwidth_99": occupied_bandwidth(freqs, psd, 0.99),
+                 "dc_fraction": float(psd[0] / psd.sum()) if psd.sum() > 0 else 0.0}
+                for mod, psd in spectra],
+    )
+
+
 @app.post(
     "/modulate/send_gpio",
-    response_model=GpioSendResponse,
-    summary="Enviar Señal Modulada a GPIO",
+    response_model=GpioJobResponse,
+    status_code=202,
+    summary="Encolar Envío de Señal Modulada a GPIO",
     tags=["GPIO"],
     responses={
-        200: {"description": "Envío a GPIO completado con éxito."},
+        202: {"description": "Envío encolado; consultar su estado en /gpio/jobs/{job_id}."},
         400: {"description": "Tipo de modulación no soportado."},
-        422: {"description": "Error de validación en los datos de entrada."},
-        429: {"description": "GPIO ya está en uso."},
-        500: {"description": "Error interno durante el envío a GPIO."},
+        422: {"description": "Error de validación en los datos de entrada o tasa de bits inalcanzable en el GPIO."},
+        429: {"description": "Cola de transmisiones GPIO llena."},
+        500: {"description": "Error interno preparando el envío a GPIO."},
         501: {"description": "Funcionalidad GPIO no disponible en el servidor."}
     }
 )
 async def send_modulation_to_gpio_endpoint(request: ModulateRequest):
     """
-    Genera una señal modulada **PCM** y la envía a los pines GPIO especificados.
+    Genera una señal modulada **PCM** y encola su envío a los pines GPIO especificados.
+    Devuelve de inmediato el identificador del trabajo; el envío se ejecuta en segundo plano.
     """
-    print(
-        f"Solicitud de envío a GPIO: {request.modulation_type.value} para '{request.binary_data}' a pines {request.output_pins}")
+    logger.info("Solicitud de envío a GPIO: %s para %d bits a pines %s", request.modulation_type, request.num_bits(),
+                request.output_pins)
 
-    if not ON_RASPBERRY_PI:
+    if not (await asyncio.to_thread(get_gpio_state))["functional"]:
         raise HTTPException(status_code=501, detail="Funcionalidad GPIO no disponible en este servidor.")
 
     generate_func = get_modulation_function(request.modulation_type)
     if not generate_func:
         raise HTTPException(status_code=400, detail=f"Tipo de modulación '{request.modulation_type}' no soportado.")
 
+    for pin in request.output_pins:
+        if pin < GPIO_PIN_MIN or pin > GPIO_PIN_MAX:
+            raise HTTPException(status_code=422,
+                                detail=f"El pin GPIO {pin} está fuera del rango permitido ({GPIO_PIN_MIN}-{GPIO_PIN_MAX}).")
+
+    skews_s = None if request.gpio_skew_us is None else [skew * 1e-6 for skew in request.gpio_skew_us]
+    try:
+        # Rechazar antes de encolar las tasas que el bucle de temporización no puede mantener
+        await asyncio.to_thread(check_gpio_rate, request.modulation_type, request.samples_per_bit,
+                                request.bit_duration, request.gpio_playback, skews_s)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
     try:
-        # Generar la señal
-        t_mod, sig_mod = generate_func(request.binary_data)
-
-        # Función para enviar a un pin individual
-        def send_to_single_pin(pin):
-            try:
-                send_to_gpio(pin, t_mod, sig_mod)
-            except ValueError as e:
-                # Entregar errores relacionados con GPIO
-                if "GPIO ya está en uso" in str(e):
-                    raise HTTPException(status_code=429, detail=f"GPIO {pin} ya está en uso.")
-                else:
-                    raise HTTPException(status_code=500, detail=f"Error al enviar al GPIO {pin}: {str(e)}")
-
-        # Ejecutar la función para todos los pines
-        for pin in request.output_pins:
-            if pin < GPIO_PIN_MIN or pin > GPIO_PIN_MAX:
-                raise HTTPException(status_code=422,
-                                    detail=f"El pin GPIO {pin} está fuera del rango permitido ({GPIO_PIN_MIN}-{GPIO_PIN_MAX}).")
-            send_to_single_pin(pin)
-
-        return GpioSendResponse(
-            status="completed",
-            message=f"Señal {request.modulation_type.value} enviada a los GPIO {request.output_pins}.",
+        # El cierre solo captura lo necesario para el envío (no la solicitud con el mensaje original)
+        payload, pins, mod_type = request.payload(), list(request.output_pins), request.modulation_type
+        samples_per_bit, bit_duration, playback = request.samples_per_bit, request.bit_duration, request.gpio_playback
+
+        # Envío a todos los pines con un único reloj (la señal se genera por bloques durante el envío)
+        def run(cancel_event):
+            return send_to_gpio_pins(pins,
+                                     iter_modulated_chunks(payload, mod_type, samples_per_bit=samples_per_bit,
+                                                           bit_duration=bit_duration),
+                                     mode=playback, skews_s=skews_s, cancel_event=cancel_event)
+
+        job = GpioJob(
+            pins=list(dict.fromkeys(request.output_pins)),
+            run=run,
+            priority=request.priority,
+            description=f"{request.modulation_type} ({request.num_bits()} bits) a GPIO {request.output_pins}",
         )
+        get_scheduler().submit(job)
+        return _job_response(job)
 
-    except HTTPException:
-        raise  # Re-throw HTTP-specific exceptions
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
     except Exception as e:
-        print(f"Error preparando envío a GPIO: {e}")
+        logger.error("Error preparando envío a GPIO: %s", e)
         raise HTTPException(status_code=500, detail=f"Error interno preparando el envío a GPIO: {e}")
 
+
+def _job_response(job: GpioJob) -> GpioJobResponse:
+    """Construye la respuesta pública de un trabajo de transmisión."""
+    messages = {
+        GpioJobStatus.QUEUED: "Envío en cola.",
+        GpioJobStatus.RUNNING: "Envío en curso.",
+        GpioJobStatus.COMPLETED: "Envío completado.",
+        GpioJobStatus.FAILED: "El envío falló.",
+        GpioJobStatus.CANCELLED: "Envío cancelado.",
+    }
+    return GpioJobResponse(
+        job_id=job.job_id,
+        status=job.status,
+        message=f"{messages[job.status]} {job.description}",
+        output_pins=job.pins,
+        priority=job.priority,
+        queue_position=get_scheduler().queue_position(job),
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+        error=job.error,
+        timing=[GpioTimingReport(**report) for report in job.timing],
+    )
+
+def _get_job_or_404(job_id: str) -> GpioJob:
+    job = get_scheduler().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Trabajo GPIO '{job_id}' no encontrado.")
+    return job
+
+
+@app.get(
+    "/gpio/jobs",
+    response_model=List[GpioJobResponse],
+    summary="Listar Trabajos GPIO",
+    tags=["GPIO"]
+    )
+async def list_gpio_jobs():
+    """Devuelve los trabajos de transmisión en cola, en curso y los terminados recientes."""
+    return [_job_response(job) for job in get_scheduler().list_jobs()]
+
+
+@app.get(
+    "/gpio/jobs/{job_id}",
+    response_model=GpioJobResponse,
+    summary="Consultar Trabajo GPIO",
+    tags=["GPIO"],
+    responses={404: {"description": "Trabajo no encontrado."}}
+    )
+async def get_gpio_job(job_id: str):
+    """Devuelve el estado de un trabajo de transmisión."""
+    return _job_response(_get_job_or_404(job_id))
+
+
+@app.get(
+    "/gpio/jobs/{job_id}/wait",
+    response_model=GpioJobResponse,
+    summary="Esperar Trabajo GPIO",
+    tags=["GPIO"],
+    responses={404: {"description": "Trabajo no encontrado."}}
+    )
+async def wait_gpio_job(job_id: str, timeout_s: float = Query(10.0, ge=0, le=GPIO_JOB_MAX_WAIT_S)):
+    """Espera (sin bloquear el servidor) a que el trabajo termine o venza `timeout_s`, y devuelve su estado."""
+    job = _get_job_or_404(job_id)
+    await asyncio.to_thread(job.done_event.wait, timeout_s)
+    return _job_response(job)
+
+
+@app.delete(
+    "/gpio/jobs/{job_id}",
+    response_model=GpioJobResponse,
+    summary="Cancelar Trabajo GPIO",
+    tags=["GPIO"],
+    responses={404: {"description": "Trabajo no encontrado."}}
+    )
+async def cancel_gpio_job(job_id: str):
+    """Cancela un trabajo: si está en cola se descarta; si está en curso se interrumpe y los pines quedan en LOW."""
+    _get_job_or_404(job_id)
+    return _job_response(get_scheduler().cancel(job_id))
+
 @app.get(
     "/modulations",
     response_model=ModulationListResponse,
@@ -159,10 +616,47 @@ async def send_modulation_to_gpio_endpoint(request: ModulateRequest):
     tags=["Información"]
     )
 async def list_modulations():
-    """Devuelve la lista de tipos de modulación PCM soportados."""
-    # Obtener claves del Enum
-    supported = [m.value for m in ModulationType]
-    return ModulationListResponse(supported_modulations=supported)
+    """Devuelve los códigos de línea registrados (se lee el registro en cada llamada)."""
+    codes = line_codes()
+    return ModulationListResponse(
+        supported_modulations=[code.name for code in codes],
+        line_codes=[LineCodeInfo(name=code.name, description=code.description, states=code.num_states,
+                                 lookahead_bits=code.lookahead, chips_per_bit=code.chips_per_bit)
+                    for code in codes],
+    )
+
+
+@app.get(
+    "/cache/stats",
+    response_model=PlotCacheStatsResponse,
+    summary="Estadísticas de la Caché de Gráficas",
+    tags=["Información"]
+    )
+async def get_plot_cache_stats():
+    """Devuelve ocupación, aciertos y fallos de la caché de gráficas."""
+    return PlotCacheStatsResponse(**plot_cache.stats())
+
+
+@app.get(
+    "/spectrum/stats",
+    response_model=PsdCacheStatsResponse,
+    summary="Estadísticas de la Caché de Espectros",
+    tags=["Información"]
+    )
+async def get_spectrum_cache_stats():
+    """Devuelve ocupación, aciertos y fallos de la caché de espectros con datos aleatorios."""
+    return PsdCacheStatsResponse(**psd_cache.stats())
+
+
+@app.get(
+    "/render/stats",
+    response_model=RenderPoolStatsResponse,
+    summary="Estado del Ejecutor de Renderizado",
+    tags=["Información"]
+    )
+async def get_render_stats():
+    """Devuelve el modo del ejecutor de renderizado, sus trabajadores y los renders en curso, rechazados o vencidos."""
+    return RenderPoolStatsResponse(**get_render_pool().stats())
 
 
 @app.get(
@@ -172,28 +666,92 @@ async def list_modulations():
     tags=["GPIO"]
     )
 async def get_gpio_status_endpoint():
-     """Verifica si la funcionalidad GPIO está activa y si está ocupada."""
-     state = get_gpio_state()
+     """Verifica si la funcionalidad GPIO está activa, los trabajos en curso y la profundidad de la cola."""
+     state = await asyncio.to_thread(get_gpio_state)  # La primera llamada carga el backend GPIO
+     queue = get_scheduler().state()
      if not state["functional"]:
          status = "disabled"
          detail = "Librería GPIO no disponible."
-     elif state["busy"]:
+     elif state["busy"] or queue["active_jobs"]:
           status = "busy"
-          detail = f"Actualmente enviando una señal (Bloqueo {'activo' if state['locked'] else 'inactivo'})."
+          detail = (f"Actualmente enviando {len(queue['active_jobs'])} trabajo(s) en los pines {state['busy_pins']}; "
+                    f"{queue['queue_depth']} en cola.")
      else:
           status = "idle"
           detail = "GPIO disponible."
-     return GpioStatusResponse(status=status, detail=detail, gpio_library_functional=state["functional"])
+     timing = await asyncio.to_thread(achievable_timing) if state["functional"] else None
+     return GpioStatusResponse(status=status, detail=detail, gpio_library_functional=state["functional"],
+                               queue_depth=queue["queue_depth"], active_jobs=queue["active_jobs"],
+                               busy_pins=state["busy_pins"],
+                               min_write_interval_us=timing["min_interval_s"] * 1e6 if timing else None,
+                               timing_source=timing["source"] if timing else None,
+                               gpio_backend=state["backend"])
+
+
+@app.get(
+    "/gpio/simulator/edges",
+    response_model=SimulatedEdgesResponse,
+    summary="Flancos del GPIO Simulado",
+    tags=["GPIO"],
+    responses={404: {"description": "El backend GPIO no es el simulado."}}
+    )
+async def get_simulated_edges(pin: int = Query(..., ge=GPIO_PIN_MIN, le=GPIO_PIN_MAX),
+                              limit: int = Query(1000, ge=1, le=GPIO_SIMULATOR_MAX_EVENTS)):
+    """
+    Con `GPIO_BACKEND=simulated`, devuelve los últimos `limit` flancos registrados en el pin
+    (instantes relativos al primero devuelto): la forma de onda que habría salido por el pin.
+    """
+    backend = await asyncio.to_thread(get_gpio_backend)
+    if not isinstance(backend, SimulatedGpioBackend):
+        raise HTTPException(status_code=404, detail="El backend GPIO en uso no es el simulado.")
+    edges = await asyncio.to_thread(backend.recorder.edges, pin)
+    recent = edges[-limit:]
+    origin = recent[0][0] if recent else 0.0
+    return SimulatedEdgesResponse(pin=pin, total_edges=len(edges),
+                                  edges=[SimulatedEdge(time_s=timestamp - origin, state=state)
+                                         for timestamp, state in recent])
+
+
+# --- Métricas ---
+
+def _collect_runtime():
+    """Valores que viven en otros objetos: ejecutor de renderizado, cola GPIO y temporización alcanzable."""
+    pool = get_render_pool().stats()
+    yield ("modulador_render_in_flight", "gauge", "Renders en curso o en espera.", {(): pool["in_flight"]}, [])
+    yield ("modulador_render_rejected_total", "counter", "Renders rechazados con 503 (ejecutor lleno).",
+           {(): pool["rejected"]}, [])
+    yield ("modulador_render_timeouts_total", "counter", "Renders que superaron su tiempo máximo.", {(): pool["timeouts"]}, [])
+    queue = get_scheduler().state()
+    yield ("modulador_gpio_queue_depth", "gauge", "Trabajos GPIO en cola.", {(): queue["queue_depth"]}, [])
+    yield ("modulador_gpio_active_jobs", "gauge", "Trabajos GPIO en curso.", {(): len(queue["active_jobs"])}, [])
+
+def _time_template_stats() -> dict:
+    info = bit_time_offsets.cache_info()
+    return {"hits": info.hits, "misses": info.misses, "entries": info.currsize}
+
+register_collector(cache_collector("plot", plot_cache.stats))
+register_collector(cache_collector("psd", psd_cache.stats))
+register_collector(cache_collector("waveform", waveform_cache.stats))
+register_collector(cache_collector("time_template", _time_template_stats))
+register_collector(_collect_runtime)
+
+@app.get(
+    "/metrics",
+    response_class=PlainTextResponse,
+    summary="Métricas (Prometheus)",
+    tags=["Monitorización"]
+)
+async def get_metrics():
+    """
+    Métricas en formato de texto de Prometheus: histogramas de duración por etapa (validación,
+    generación, render, codificación PNG, transmisión GPIO), distribución del error de cada
+    flanco GPIO, esperas y contención de bloqueos, aciertos de las cachés y estado de las colas.
+    """
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 
 # --- Ejecutar el Servidor ---
 if __name__ == "__main__":
-    import uvicorn
-    print("\nIniciando servidor FastAPI...")
-    print(f" - Funcionalidad GPIO: {'ACTIVA' if ON_RASPBERRY_PI else 'DESACTIVADA'}")
-    print(" - Documentación interactiva: http://127.0.0.1:8000/scalar")
-    print(" - Acceso local: http://127.0.0.1:8000/")
-    print("   (Para acceso desde otros dispositivos, usa la IP de tu Raspberry Pi)")
-
-    # Escuchar en 0.0.0.0 para acceso externo
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True) # reload=True para desarrollo
\ No newline at end of file
+    # Equivale a `python server.py` (desarrollo con recarga o producción con varios procesos)
+    import server
+    server.run()
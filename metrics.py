@@ -0,0 +1,300 @@
+"""
+Instrumentación de bajo coste expuesta en `/metrics` con el formato de texto de Prometheus.
+
+Cada métrica guarda sus valores por combinación de etiquetas bajo un lock propio; observar un
+valor es una búsqueda binaria en los límites de los cubos y una suma. Los valores que solo
+existen en otros objetos (cachés, cola GPIO, ejecutor de renderizado) se leen al exportar con
+colectores registrados mediante `register_collector`.
+
+Las gráficas se dibujan en procesos trabajadores: `capture_observations` recoge las
+observaciones de histogramas hechas durante una llamada para devolverlas con el resultado, y
+`replay_observations` las suma en el proceso principal, que es el que sirve `/metrics`.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+from config import METRICS_ENABLED
+
+# Límites (segundos) para duraciones de etapas: de 50 µs a 30 s
+DURATION_BUCKETS = (5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                    1.0, 2.5, 5.0, 10.0, 30.0)
+# Límites (segundos) para el error de temporización de los flancos GPIO: de 1 µs a 10 ms
+JITTER_BUCKETS = (1e-6, 2e-6, 5e-6, 1e-5, 2e-5, 5e-5, 1e-4, 2e-4, 5e-4, 1e-3, 2e-3, 5e-3, 1e-2)
+
+Labels = Tuple[str, ...]
+
+_metrics: Dict[str, "_Metric"] = {}
+_collectors: List[Callable[[], Iterable[Tuple[str, str, str, Dict[Labels, float], Sequence[str]]]]] = []
+_registry_lock = threading.Lock()
+_capture = threading.local()
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _format_labels(names: Sequence[str], values: Labels, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        with _registry_lock:
+            if name in _metrics:
+                raise ValueError(f"La métrica '{name}' ya está registrada.")
+            _metrics[name] = self
+
+    def _key(self, labels: dict) -> Labels:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Contador monótono."""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in sorted(values.items())]
+
+
+class Histogram(_Metric):
+    """Histograma acumulativo con límites fijos (más `+Inf`), suma y número de observaciones."""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DURATION_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._edges = np.asarray(self.buckets)
+        self._series: Dict[Labels, list] = {}  # etiquetas -> [cuentas por cubo (+Inf al final), suma]
+
+    def _series_for(self, key: Labels) -> list:
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        return series
+
+    def observe(self, value: float, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        captured = getattr(_capture, "observations", None)
+        if captured is not None:
+            captured.append((self.name, key, (float(value),)))
+            return
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series_for(key)
+            series[0][index] += 1
+            series[1] += value
+
+    def observe_many(self, values: np.ndarray, **labels):
+        """Suma muchas observaciones a la vez (p. ej. el error de cada flanco de un envío)."""
+        if not METRICS_ENABLED or len(values) == 0:
+            return
+        values = np.asarray(values, dtype=np.float64)
+        key = self._key(labels)
+        captured = getattr(_capture, "observations", None)
+        if captured is not None:
+            captured.append((self.name, key, tuple(values.tolist())))
+            return
+        counts = np.bincount(np.searchsorted(self._edges, values, side="left"), minlength=len(self.buckets) + 1)
+        total = float(values.sum())
+        with self._lock:
+            series = self._series_for(key)
+            series[0] = [a + int(b) for a, b in zip(series[0], counts)]
+            series[1] += total
+
+    @contextmanager
+    def time(self, **labels):
+        """Observa la duración del bloque `with`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = {key: (list(counts), total) for key, (counts, total) in self._series.items()}
+        lines = []
+        for key, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def register_collector(collector: Callable[[], Iterable[Tuple[str, str, str, Dict[Labels, float], Sequence[str]]]]):
+    """
+    Registra una función que, al exportar, devuelve métricas calculadas en ese momento como
+    tuplas `(nombre, tipo, ayuda, {etiquetas: valor}, nombres_de_etiquetas)`.
+    """
+    with _registry_lock:
+        _collectors.append(collector)
+
+
+# --- Observaciones hechas en otros procesos ---
+
+@contextmanager
+def capture_observations():
+    """Durante el bloque, las observaciones de histogramas de este hilo se acumulan en la lista devuelta."""
+    previous = getattr(_capture, "observations", None)
+    observations = []
+    _capture.observations = observations
+    try:
+        yield observations
+    finally:
+        _capture.observations = previous
+
+
+def replay_observations(observations: Iterable[Tuple[str, Labels, Tuple[float, ...]]]):
+    """Suma en este proceso las observaciones capturadas en otro."""
+    for name, key, values in observations:
+        metric = _metrics.get(name)
+        if isinstance(metric, Histogram):
+            labels = dict(zip(metric.labelnames, key))
+            if len(values) == 1:
+                metric.observe(values[0], **labels)
+            else:
+                metric.observe_many(np.asarray(values), **labels)
+
+
+# --- Exportación ---
+
+def render_metrics() -> str:
+    """Todas las métricas (y las de los colectores) en el formato de texto de Prometheus 0.0.4."""
+    with _registry_lock:
+        metrics = list(_metrics.values())
+        collectors = list(_collectors)
+    lines = []
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render())
+    # Varios colectores pueden aportar series a la misma familia (p. ej. una por caché)
+    families: Dict[str, tuple] = {}
+    for collector in collectors:
+        for name, kind, documentation, values, labelnames in collector():
+            family = families.setdefault(name, (kind, documentation, tuple(labelnames), {}))
+            family[3].update(values)
+    for name, (kind, documentation, labelnames, values) in families.items():
+        lines.append(f"# HELP {name} {documentation}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(f"{name}{_format_labels(labelnames, key)} {_format_value(value)}"
+                     for key, value in sorted(values.items()))
+    return "\n".join(lines) + "\n"
+
+
+# --- Métricas de la aplicación ---
+
+STAGE_SECONDS = Histogram(
+    "modulador_stage_duration_seconds",
+    "Duración de cada etapa: validation, generation, generation_chunk, render, png_encode, svg_encode, gpio_transmission.",
+    ["stage"])
+GPIO_EDGE_ERROR_SECONDS = Histogram(
+    "modulador_gpio_edge_error_seconds",
+    "Retraso de cada escritura GPIO respecto a su instante programado (jitter de flancos).",
+    ["mode"], buckets=JITTER_BUCKETS)
+LOCK_WAIT_SECONDS = Histogram(
+    "modulador_lock_wait_seconds",
+    "Tiempo de espera para adquirir un bloqueo compartido.",
+    ["lock"])
+LOCK_ACQUISITIONS = Counter(
+    "modulador_lock_acquisitions_total",
+    "Intentos de adquirir un bloqueo; result=contended si estaba ocupado.",
+    ["lock", "result"])
+
+GPIO_QUEUE_WAIT_SECONDS = Histogram(
+    "modulador_gpio_queue_wait_seconds",
+    "Espera de un trabajo GPIO en la cola hasta que sus pines quedan libres y arranca.")
+GPIO_JOBS = Counter(
+    "modulador_gpio_jobs_total",
+    "Trabajos GPIO terminados por estado final.",
+    ["status"])
+
+
+class stage:
+    """Mide la duración del bloque `with` como la etapa `name` (clase y no generador: cuesta menos)."""
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        STAGE_SECONDS.observe(time.perf_counter() - self.start, stage=self.name)
+        return False
+
+
+@contextmanager
+def timed_lock(lock: threading.Lock, name: str):
+    """Adquiere `lock` midiendo la espera y contando si estaba ocupado."""
+    if lock.acquire(blocking=False):
+        LOCK_ACQUISITIONS.inc(lock=name, result="uncontended")
+        LOCK_WAIT_SECONDS.observe(0.0, lock=name)
+    else:
+        start = time.perf_counter()
+        lock.acquire()
+        LOCK_ACQUISITIONS.inc(lock=name, result="contended")
+        LOCK_WAIT_SECONDS.observe(time.perf_counter() - start, lock=name)
+    try:
+        yield
+    finally:
+        lock.release()
+
+
+def cache_collector(name: str, stats: Callable[[], dict]):
+    """Colector de aciertos, fallos y entradas de una caché a partir de su `stats()`."""
+    def collect():
+        values = stats()
+        key = (name,)
+        hits = values.get("hits", 0) + values.get("disk_hits", 0)
+        yield ("modulador_cache_hits_total", "counter", "Aciertos de caché.", {key: hits}, ["cache"])
+        yield ("modulador_cache_misses_total", "counter", "Fallos de caché.", {key: values.get("misses", 0)}, ["cache"])
+        yield ("modulador_cache_entries", "gauge", "Entradas en caché.", {key: values.get("entries", 0)}, ["cache"])
+    return collect
@@ -1,46 +1,661 @@
-﻿from typing import List
+﻿import base64
+import binascii
+from typing import Annotated, List, Optional, Union
 
-from pydantic import BaseModel, Field, validator, field_validator
+from pydantic import BaseModel, Field, validator, field_validator, model_validator, PrivateAttr, AfterValidator
 from enum import Enum
-from config import DEFAULT_OUTPUT_PIN, GPIO_PIN_MIN, GPIO_PIN_MAX
+from config import DEFAULT_OUTPUT_PIN, GPIO_PIN_MIN, GPIO_PIN_MAX, MAX_MESSAGE_BITS
+from config import BIT_DURATION, SAMPLES_PER_BIT, MIN_BIT_DURATION, MAX_BIT_DURATION, MAX_SAMPLES_PER_BIT
+from config import MAX_BATCH_MESSAGES, MAX_BATCH_PANELS, RENDER_TIMEOUT_S
+from config import ROUNDTRIP_MAX_BITS, ROUNDTRIP_MAX_TRIALS, ROUNDTRIP_MAX_TOTAL_BITS, ROUNDTRIP_SAMPLES_PER_BIT
+from config import EYE_SAMPLES_PER_BIT, EYE_DEFAULT_BITS, EYE_MAX_BITS
+from config import BER_SAMPLES_PER_BIT, BER_MAX_POINTS, BER_MAX_TOTAL_BITS, SIMULATION_MAX_SAMPLES
+from config import PSD_SAMPLES_PER_BIT, PSD_SEGMENT_BITS, PSD_MAX_SEGMENT_SAMPLES, PSD_MAX_MESSAGE_SAMPLES
+from line_codes import get_line_code, is_line_code, line_codes
+from metrics import stage
+
+_NOT_BINARY_DIGITS = str.maketrans("", "", "01")
 
 class ModulationType(str, Enum):
-    """Tipos de modulación PCM soportados."""
+    """Modulaciones PCM clásicas. El conjunto completo es el registro de `line_codes.py`."""
     NRZ_M = "NRZ-M"
     MANCHESTER = "Manchester (Bi-phase L)"
     UNIPOLAR_RZ = "Unipolar RZ"
     BIPOLAR_AMI = "Bipolar AMI"
 
+def _registered_modulation(name: str) -> str:
+    """Acepta cualquier código de línea registrado (el registro puede crecer en tiempo de ejecución)."""
+    if not is_line_code(name):
+        available = ", ".join(code.name for code in line_codes())
+        raise ValueError(f"Tipo de modulación '{name}' no soportado. Disponibles: {available}.")
+    return name
+
+ModulationName = Annotated[str, AfterValidator(_registered_modulation)]
+
+class DataEncoding(str, Enum):
+    """Formatos aceptados para el mensaje."""
+    BINARY = "binary"  # Texto '0'/'1'
+    HEX = "hex"  # Bytes empaquetados en hexadecimal (MSB primero)
+    BASE64 = "base64"  # Bytes empaquetados en base64 (MSB primero)
+
+class GpioPlaybackMode(str, Enum):
+    """Modos de reproducción de la señal en el pin GPIO."""
+    EDGES = "edges"  # Escribe el pin solo en las transiciones
+    SAMPLES = "samples"  # Escribe el pin en cada muestra
+
+class GpioJobStatus(str, Enum):
+    """Estados de un trabajo de transmisión GPIO."""
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+def _decode_message(binary_data: str, encoding: DataEncoding) -> Union[str, bytes]:
+    """Valida el mensaje según su codificación y lo devuelve como texto '0'/'1' o bytes empaquetados."""
+    if encoding == DataEncoding.BINARY:
+        if binary_data.translate(_NOT_BINARY_DIGITS):
+            raise ValueError("binary_data solo puede contener los dígitos 0 y 1.")
+        payload = binary_data
+    else:
+        try:
+            if encoding == DataEncoding.HEX:
+                payload = bytes.fromhex(binary_data)
+            else:
+                payload = base64.b64decode(binary_data, validate=True)
+        except (ValueError, binascii.Error) as e:
+            raise ValueError(f"binary_data no es {encoding.value} válido: {e}")
+    if _payload_bits(payload) > MAX_MESSAGE_BITS:
+        raise ValueError(f"El mensaje supera el máximo de {MAX_MESSAGE_BITS} bits.")
+    return payload
+
+def _payload_bits(payload: Union[str, bytes]) -> int:
+    return len(payload) if isinstance(payload, str) else len(payload) * 8
+
+def _check_signal_samples(num_bits: int, samples_per_bit: int):
+    """Cada señal simulada se genera entera en memoria: acota bits × muestras por bit."""
+    if num_bits * samples_per_bit > SIMULATION_MAX_SAMPLES:
+        raise ValueError(f"La señal simulada tendría {num_bits * samples_per_bit} muestras "
+                         f"({num_bits} bits × {samples_per_bit}); el máximo es {SIMULATION_MAX_SAMPLES}.")
+
+def _check_samples_per_bit(samples_per_bit: int, modulation_types: List[str]):
+    """Cada chip del código necesita al menos una muestra (p. ej. 2 por bit en Manchester)."""
+    for name in modulation_types:
+        chips = get_line_code(name).chips_per_bit
+        if samples_per_bit < chips:
+            raise ValueError(f"'{name}' necesita al menos {chips} muestras por bit.")
+
+def _bit_duration_field():
+    return Field(
+        BIT_DURATION,
+        ge=MIN_BIT_DURATION,
+        le=MAX_BIT_DURATION,
+        title="Duración de Bit (s)",
+        description=f"Duración de cada bit (inversa de la tasa de bits); por defecto {BIT_DURATION} s."
+    )
+
+def _samples_per_bit_field():
+    return Field(
+        SAMPLES_PER_BIT,
+        ge=1,
+        le=MAX_SAMPLES_PER_BIT,
+        title="Muestras por Bit",
+        description=f"Sobremuestreo de la señal generada; por defecto {SAMPLES_PER_BIT}."
+    )
+
 class ModulateRequest(BaseModel):
     """Modelo para la solicitud de modulación/envío."""
     binary_data: str = Field(
         ...,
-        pattern=r"^[01]{5}$",
+        min_length=1,
         title="Mensaje Binario",
-        description="Cadena binaria de exactamente 5 dígitos (0 o 1)."
+        description="Mensaje a modular: cadena de dígitos 0/1, o bytes en hex/base64 según `data_encoding`."
+    )
+    data_encoding: DataEncoding = Field(
+        DataEncoding.BINARY,
+        title="Codificación del Mensaje",
+        description="Formato de `binary_data`. Con hex/base64 cada byte aporta 8 bits (MSB primero)."
     )
-    modulation_type: ModulationType = Field(
+    modulation_type: ModulationName = Field(
         ...,
         title="Tipo de Modulación",
-        description="Tipo de modulación PCM a aplicar."
+        description="Código de línea a aplicar (ver `/modulations`)."
     )
     output_pins: List[int] = Field(
-        DEFAULT_OUTPUT_PIN,
+        default_factory=lambda: [DEFAULT_OUTPUT_PIN],
+        min_length=1,
         title="Pines GPIO",
         description=f"Lista de pines GPIO (BCM) para la salida."
     )
+    gpio_playback: GpioPlaybackMode = Field(
+        GpioPlaybackMode.EDGES,
+        title="Modo de Reproducción GPIO",
+        description="`edges` escribe el pin solo en las transiciones; `samples` en cada muestra."
+    )
+    priority: int = Field(
+        0,
+        ge=-10,
+        le=10,
+        title="Prioridad",
+        description="Prioridad del envío en la cola GPIO (mayor se atiende antes)."
+    )
+    gpio_skew_us: Optional[List[float]] = Field(
+        None,
+        title="Desfase por Pin (µs)",
+        description="Retardo de cada pin de `output_pins` respecto al reloj común (solo modo `edges`). "
+                    "Sin valor, todos los pines salen en fase."
+    )
+    bit_duration: float = _bit_duration_field()
+    samples_per_bit: int = _samples_per_bit_field()
+
+    _payload: Union[str, bytes, None] = PrivateAttr(None)
+
+    @model_validator(mode="after")
+    def _validate_payload(self):
+        """Valida el mensaje según su codificación y el límite de longitud."""
+        with stage("validation"):
+            self._payload = _decode_message(self.binary_data, self.data_encoding)
+        _check_samples_per_bit(self.samples_per_bit, [self.modulation_type])
+        if len(set(self.output_pins)) != len(self.output_pins):
+            raise ValueError("output_pins no admite pines repetidos.")
+        if self.gpio_skew_us is not None:
+            if len(self.gpio_skew_us) != len(self.output_pins):
+                raise ValueError("gpio_skew_us debe tener un valor por cada pin de output_pins.")
+            if any(skew < 0 for skew in self.gpio_skew_us):
+                raise ValueError("gpio_skew_us no admite valores negativos.")
+        return self
+
+    def payload(self) -> Union[str, bytes]:
+        """
+        Devuelve el mensaje listo para los generadores: la cadena '0'/'1' tal cual,
+        o los bytes empaquetados si llegó en hex/base64 (sin expandirlo a texto).
+        """
+        return self._payload
+
+    def num_bits(self) -> int:
+        """Número de bits del mensaje."""
+        return _payload_bits(self._payload)
+
+class PlotRenderer(str, Enum):
+    """Motores de renderizado de gráficas."""
+    MATPLOTLIB = "matplotlib"  # Referencia (más lento)
+    FAST = "fast"  # Dibujo directo sobre un buffer NumPy / SVG
+
+class PlotFormat(str, Enum):
+    """Formatos de imagen de las gráficas."""
+    PNG = "png"
+    SVG = "svg"
+
+class PlotRequest(ModulateRequest):
+    """Modelo para la solicitud de gráfica: modulación más opciones de renderizado."""
+    renderer: PlotRenderer = Field(
+        PlotRenderer.MATPLOTLIB,
+        title="Motor de Renderizado",
+        description="`matplotlib` (referencia) o `fast` (rasterizador propio, mucho más rápido)."
+    )
+    image_format: PlotFormat = Field(
+        PlotFormat.PNG,
+        title="Formato de Imagen",
+        description="`png` o `svg`."
+    )
+    render_timeout_s: Optional[float] = Field(
+        None,
+        gt=0,
+        le=RENDER_TIMEOUT_S,
+        title="Tiempo Máximo de Renderizado (s)",
+        description=f"Tiempo máximo de espera del render; por defecto {RENDER_TIMEOUT_S} s."
+    )
+
+    def plot_style(self) -> str:
+        """Estilo de la gráfica (forma parte de la clave de caché)."""
+        return f"{self.renderer.value}-{self.image_format.value}"
+
+class BatchOutput(str, Enum):
+    """Forma de devolver los resultados de un lote."""
+    IMAGE = "image"  # Una sola imagen con un panel por combinación
+    ZIP = "zip"  # Un fichero por combinación dentro de un zip
+
+class BatchRequest(BaseModel):
+    """Modelo para la solicitud de un lote: todos los mensajes × todas las modulaciones."""
+    messages: List[str] = Field(
+        ...,
+        min_length=1,
+        max_length=MAX_BATCH_MESSAGES,
+        title="Mensajes",
+        description="Mensajes a modular, todos con la misma `data_encoding`."
+    )
+    data_encoding: DataEncoding = Field(
+        DataEncoding.BINARY,
+        title="Codificación de los Mensajes",
+        description="Formato de cada mensaje (binary, hex o base64)."
+    )
+    modulation_types: List[ModulationName] = Field(
+        default_factory=lambda: [code.name for code in line_codes()],
+        min_length=1,
+        title="Tipos de Modulación",
+        description="Modulaciones a aplicar a cada mensaje (por defecto todas las registradas)."
+    )
+    renderer: PlotRenderer = Field(PlotRenderer.MATPLOTLIB, title="Motor de Renderizado")
+    image_format: PlotFormat = Field(PlotFormat.PNG, title="Formato de Imagen")
+    bit_duration: float = _bit_duration_field()
+    samples_per_bit: int = _samples_per_bit_field()
+    output: BatchOutput = Field(
+        BatchOutput.IMAGE,
+        title="Salida",
+        description="`image` (una imagen multipanel: una fila por mensaje, una columna por modulación) o `zip`."
+    )
+    parallel: bool = Field(
+        False,
+        title="Reparto en Pool",
+        description="Dibuja los paneles repartidos en el pool de trabajadores en lugar de uno tras otro."
+    )
+    render_timeout_s: Optional[float] = Field(
+        None,
+        gt=0,
+        le=RENDER_TIMEOUT_S,
+        title="Tiempo Máximo de Renderizado (s)",
+        description=f"Tiempo máximo de espera del render; por defecto {RENDER_TIMEOUT_S} s."
+    )
+
+    _payloads: List[Union[str, bytes]] = PrivateAttr(default_factory=list)
+
+    @model_validator(mode="after")
+    def _validate_batch(self):
+        """Valida cada mensaje y el número total de paneles."""
+        if len(self.messages) * len(self.modulation_types) > MAX_BATCH_PANELS:
+            raise ValueError(f"El lote supera el máximo de {MAX_BATCH_PANELS} combinaciones mensaje × modulación.")
+        _check_samples_per_bit(self.samples_per_bit, self.modulation_types)
+        self._payloads = []
+        with stage("validation"):
+            for index, message in enumerate(self.messages):
+                if not message:
+                    raise ValueError(f"El mensaje {index} está vacío.")
+                self._payloads.append(_decode_message(message, self.data_encoding))
+        return self
+
+    def payloads(self) -> List[Union[str, bytes]]:
+        """Mensajes ya decodificados, en el orden recibido."""
+        return self._payloads
+
+    def max_bits(self) -> int:
+        """Bits del mensaje más largo."""
+        return max(_payload_bits(payload) for payload in self._payloads)
+
+class SampleFormat(str, Enum):
+    """Formatos binarios de descarga de la señal."""
+    RAW = "raw"  # Cabecera de 40 bytes + muestras little-endian
+    NPY = "npy"  # Fichero .npy de NumPy (array 1-D de muestras)
+    TRANSITIONS = "transitions"  # Cabecera + índices de inicio (int64) + niveles (int8) de cada tramo
+
+class SampleDtype(str, Enum):
+    """Tipo de las muestras en los formatos `raw` y `npy`."""
+    INT8 = "int8"
+    FLOAT32 = "float32"
+
+class SamplesRequest(ModulateRequest):
+    """Modelo para la descarga de las muestras de la señal en binario."""
+    sample_format: SampleFormat = Field(
+        SampleFormat.RAW,
+        title="Formato",
+        description="`raw` (cabecera + muestras), `npy` o `transitions` (lista de transiciones)."
+    )
+    sample_dtype: SampleDtype = Field(
+        SampleDtype.INT8,
+        title="Tipo de Muestra",
+        description="`int8` o `float32` (solo `raw` y `npy`; en `transitions` los niveles son siempre int8)."
+    )
+
+class DecodeResponse(BaseModel):
+    """Resultado de decodificar un buffer de muestras."""
+    modulation_type: str
+    samples_per_bit: float
+    num_bits: int
+    bits: Optional[str] = None
+    violation_count: int
+    violations: List[int] = Field([], description="Índices de bit con violación de código (los primeros).")
+    violations_truncated: bool = False
+
+class RoundTripRequest(BaseModel):
+    """Modelo para la verificación de ida y vuelta con mensajes aleatorios."""
+    modulation_types: List[ModulationName] = Field(
+        default_factory=lambda: [code.name for code in line_codes()],
+        min_length=1,
+        title="Tipos de Modulación",
+        description="Modulaciones a verificar (por defecto todas las registradas)."
+    )
+    num_bits: int = Field(10_000, ge=1, le=ROUNDTRIP_MAX_BITS, title="Bits por Prueba")
+    trials: int = Field(1, ge=1, le=ROUNDTRIP_MAX_TRIALS, title="Pruebas por Modulación")
+    samples_per_bit: int = Field(ROUNDTRIP_SAMPLES_PER_BIT, ge=5, le=1000, title="Muestras por Bit")
+    noise_std: float = Field(0.0, ge=0, le=2, title="Ruido",
+                             description="Desviación típica del ruido gaussiano añadido a la señal.")
+    drift_ppm: float = Field(0.0, ge=-10_000, le=10_000, title="Deriva de Reloj (ppm)")
+    tolerant: Optional[bool] = Field(None, title="Decodificación Tolerante",
+                                     description="Por defecto activa solo si hay ruido o deriva.")
+    seed: Optional[int] = Field(None, ge=0, title="Semilla", description="Semilla de los mensajes aleatorios (reproducible).")
+
+    @model_validator(mode="after")
+    def _validate_samples(self):
+        total = len(self.modulation_types) * self.trials * self.num_bits
+        if total > ROUNDTRIP_MAX_TOTAL_BITS:
+            raise ValueError(f"La verificación pide {total} bits; el máximo es {ROUNDTRIP_MAX_TOTAL_BITS}.")
+        _check_signal_samples(self.num_bits, self.samples_per_bit)
+        return self
+
+class RoundTripResult(BaseModel):
+    """Resultado acumulado de las pruebas de una modulación."""
+    modulation: str
+    trials: int
+    bits: int
+    bit_errors: int
+    violations: int
+    failed_trials: int
+    decode_ms: float
+    ok: bool
+
+class RoundTripResponse(BaseModel):
+    """Modelo para la respuesta de la verificación de ida y vuelta."""
+    ok: bool
+    seed: int
+    results: List[RoundTripResult]
+
+class ChannelFilter(str, Enum):
+    """Respuesta en frecuencia del canal."""
+    NONE = "none"
+    RC = "rc"  # Paso bajo RC de primer orden
+    IDEAL = "ideal"  # Paso bajo ideal (corte abrupto)
+
+class ChannelParams(BaseModel):
+    """Parámetros del canal simulado."""
+    snr_db: Optional[float] = Field(
+        None,
+        ge=-20,
+        le=80,
+        title="SNR (dB)",
+        description="Potencia media de la señal transmitida / varianza del ruido por muestra. Sin valor, no se añade ruido."
+    )
+    filter: ChannelFilter = Field(ChannelFilter.NONE, title="Filtro del Canal")
+    bandwidth: float = Field(
+        1.0,
+        gt=0,
+        le=100,
+        title="Ancho de Banda",
+        description="Frecuencia de corte del filtro en múltiplos de la tasa de bits."
+    )
+    jitter_ui: float = Field(
+        0.0,
+        ge=0,
+        le=0.5,
+        title="Jitter (UI)",
+        description="Desviación típica del desplazamiento de cada flanco, en fracciones de bit."
+    )
+    seed: Optional[int] = Field(None, ge=0, title="Semilla", description="Semilla del ruido y el jitter (reproducible).")
+
+class EyeDiagramRequest(BaseModel):
+    """Modelo para la solicitud de un diagrama de ojo."""
+    modulation_type: ModulationName = Field(..., title="Tipo de Modulación")
+    binary_data: Optional[str] = Field(
+        None,
+        min_length=1,
+        title="Mensaje",
+        description="Mensaje a superponer; sin valor se usan `random_bits` bits aleatorios."
+    )
+    data_encoding: DataEncoding = Field(DataEncoding.BINARY, title="Codificación del Mensaje")
+    random_bits: int = Field(EYE_DEFAULT_BITS, ge=3, le=EYE_MAX_BITS, title="Bits Aleatorios")
+    samples_per_bit: int = Field(EYE_SAMPLES_PER_BIT, ge=2, le=1000, title="Muestras por Bit")
+    channel: ChannelParams = Field(default_factory=ChannelParams, title="Canal")
+    render_timeout_s: Optional[float] = Field(
+        None,
+        gt=0,
+        le=RENDER_TIMEOUT_S,
+        title="Tiempo Máximo de Renderizado (s)",
+        description=f"Tiempo máximo de espera del render; por defecto {RENDER_TIMEOUT_S} s."
+    )
+
+    _payload: Union[str, bytes, None] = PrivateAttr(None)
+
+    @model_validator(mode="after")
+    def _validate_payload(self):
+        if self.binary_data is not None:
+            self._payload = _decode_message(self.binary_data, self.data_encoding)
+            if _payload_bits(self._payload) > EYE_MAX_BITS:
+                raise ValueError(f"El diagrama de ojo admite como mucho {EYE_MAX_BITS} bits.")
+        _check_samples_per_bit(self.samples_per_bit, [self.modulation_type])
+        num_bits = self.random_bits if self._payload is None else _payload_bits(self._payload)
+        _check_signal_samples(num_bits, self.samples_per_bit)
+        return self
+
+    def payload(self) -> Union[str, bytes, None]:
+        """Mensaje decodificado, o None si se deben usar bits aleatorios."""
+        return self._payload
+
+class BerRequest(BaseModel):
+    """Modelo para la simulación Monte Carlo de la curva BER-SNR."""
+    modulation_types: List[ModulationName] = Field(
+        default_factory=lambda: [mod.value for mod in ModulationType],
+        min_length=1,
+        title="Tipos de Modulación",
+        description="Códigos a comparar (por defecto los cuatro clásicos)."
+    )
+    snr_db: List[float] = Field(
+        default_factory=lambda: [float(snr) for snr in range(0, 16)],
+        min_length=1,
+        max_length=BER_MAX_POINTS,
+        title="Puntos de SNR (dB)"
+    )
+    num_bits: int = Field(100_000, ge=100, le=BER_MAX_TOTAL_BITS, title="Bits por Punto")
+    samples_per_bit: int = Field(BER_SAMPLES_PER_BIT, ge=8, le=1000, title="Muestras por Bit")
+    filter: ChannelFilter = Field(ChannelFilter.NONE, title="Filtro del Canal")
+    bandwidth: float = Field(1.0, gt=0, le=100, title="Ancho de Banda")
+    jitter_ui: float = Field(0.0, ge=0, le=0.5, title="Jitter (UI)")
+    seed: Optional[int] = Field(None, ge=0, title="Semilla")
+
+    @model_validator(mode="after")
+    def _validate_work(self):
+        total = len(self.modulation_types) * len(self.snr_db) * self.num_bits
+        if total > BER_MAX_TOTAL_BITS:
+            raise ValueError(f"La simulación pide {total} bits; el máximo es {BER_MAX_TOTAL_BITS}.")
+        _check_signal_samples(self.num_bits, self.samples_per_bit)  # por código y punto
+        if any(not -20 <= snr <= 80 for snr in self.snr_db):
+            raise ValueError("Los puntos de SNR deben estar entre -20 y 80 dB.")
+        return self
+
+    def channel(self) -> ChannelParams:
+        """Canal sin ruido (el ruido lo pone cada punto de la curva)."""
+        return ChannelParams(filter=self.filter, bandwidth=self.bandwidth, jitter_ui=self.jitter_ui)
+
+class BerPoint(BaseModel):
+    snr_db: float
+    bits: int
+    bit_errors: int
+    ber: float
+    violations: int
+    elapsed_ms: float
+
+class BerCurve(BaseModel):
+    modulation: str
+    points: List[BerPoint]
+
+class BerResponse(BaseModel):
+    """Modelo para la respuesta de la curva BER-SNR."""
+    seed: int
+    samples_per_bit: int
+    curves: List[BerCurve]
+
+class SpectrumOutput(str, Enum):
+    """Salida del análisis espectral."""
+    JSON = "json"
+    PNG = "png"
+    SVG = "svg"
+
+class SpectrumRequest(BaseModel):
+    """Modelo para la solicitud de la densidad espectral de potencia."""
+    modulation_types: List[ModulationName] = Field(
+        default_factory=lambda: [mod.value for mod in ModulationType],
+        min_length=1,
+        title="Tipos de Modulación",
+        description="Códigos a comparar (por defecto los cuatro clásicos)."
+    )
+    binary_data: Optional[str] = Field(
+        None,
+        min_length=1,
+        title="Mensaje",
+        description="Mensaje a analizar; sin valor se usa el espectro con datos aleatorios (memorizado)."
+    )
+    data_encoding: DataEncoding = Field(DataEncoding.BINARY, title="Codificación del Mensaje")
+    samples_per_bit: int = Field(PSD_SAMPLES_PER_BIT, ge=2, le=256, title="Muestras por Bit")
+    bit_duration: float = _bit_duration_field()
+    segment_bits: int = Field(
+        PSD_SEGMENT_BITS,
+        ge=2,
+        le=4096,
+        title="Bits por Segmento",
+        description="Longitud de los segmentos de Welch: más bits dan más resolución y menos promediado."
+    )
+    max_frequency: Optional[float] = Field(
+        4.0,
+        gt=0,
+        title="Frecuencia Máxima (f/Rb)",
+        description="Recorta el resultado a esta frecuencia (en múltiplos de la tasa de bits)."
+    )
+    output: SpectrumOutput = Field(SpectrumOutput.JSON, title="Salida")
+    render_timeout_s: Optional[float] = Field(
+        None,
+        gt=0,
+        le=RENDER_TIMEOUT_S,
+        title="Tiempo Máximo de Renderizado (s)",
+        description=f"Tiempo máximo de espera del render; por defecto {RENDER_TIMEOUT_S} s."
+    )
+
+    _payload: Union[str, bytes, None] = PrivateAttr(None)
+
+    @model_validator(mode="after")
+    def _validate_request(self):
+        if self.segment_bits * self.samples_per_bit > PSD_MAX_SEGMENT_SAMPLES:
+            raise ValueError(f"El segmento supera el máximo de {PSD_MAX_SEGMENT_SAMPLES} muestras.")
+        _check_samples_per_bit(self.samples_per_bit, self.modulation_types)
+        if self.binary_data is not None:
+            self._payload = _decode_message(self.binary_data, self.data_encoding)
+            num_bits = _payload_bits(self._payload)
+            if num_bits < self.segment_bits:
+                raise ValueError(f"El mensaje debe tener al menos segment_bits ({self.segment_bits}) bits.")
+            total = len(self.modulation_types) * num_bits * self.samples_per_bit
+            if total > PSD_MAX_MESSAGE_SAMPLES:
+                raise ValueError(f"El análisis del mensaje pide {total} muestras; el máximo es {PSD_MAX_MESSAGE_SAMPLES}.")
+        return self
+
+    def payload(self) -> Union[str, bytes, None]:
+        """Mensaje decodificado, o None para el espectro con datos aleatorios."""
+        return self._payload
+
+class SpectrumCurve(BaseModel):
+    modulation: str
+    psd: List[float] = Field(..., description="PSD unilateral (potencia por unidad de f/Rb).")
+    bandwidth_90: float = Field(..., description="Frecuencia (f/Rb) que contiene el 90 % de la potencia.")
+    bandwidth_99: float = Field(..., description="Frecuencia (f/Rb) que contiene el 99 % de la potencia.")
+    dc_fraction: float = Field(..., description="Fracción de la potencia en el primer bin (continua).")
+
+class SpectrumResponse(BaseModel):
+    """Modelo para la respuesta del análisis espectral."""
+    samples_per_bit: int
+    segment_samples: int
+    bit_rate_hz: float = Field(..., description="Tasa de bits de la solicitud (1 / `bit_duration`): frecuencia en Hz = f/Rb × `bit_rate_hz`.")
+    frequencies: List[float] = Field(..., description="Frecuencias en múltiplos de la tasa de bits.")
+    curves: List[SpectrumCurve]
 
 class GpioStatusResponse(BaseModel):
     """Modelo para la respuesta del estado GPIO."""
     status: str
     detail: str
     gpio_library_functional: bool
+    queue_depth: int = 0
+    active_jobs: List[str] = []
+    busy_pins: List[int] = []
+    min_write_interval_us: Optional[float] = Field(
+        None, description="Separación mínima entre escrituras que el GPIO puede mantener (limita la tasa de bits).")
+    timing_source: Optional[str] = Field(
+        None, description="`measured` (envíos anteriores), `calibrated` (bucle de espera, sin envíos aún) o "
+                          "`hardware` (resolución de un backend temporizado por hardware).")
+    gpio_backend: Optional[str] = Field(None, description="Backend GPIO en uso: `rpi`, `pigpio`, `simulated`...")
+
+class SimulatedEdge(BaseModel):
+    """Flanco registrado por el backend GPIO simulado."""
+    time_s: float = Field(..., description="Instante relativo al primer flanco devuelto.")
+    state: int
+
+class SimulatedEdgesResponse(BaseModel):
+    """Flancos más recientes de un pin en el backend GPIO simulado."""
+    pin: int
+    total_edges: int = Field(..., description="Flancos del pin que conserva el simulador.")
+    edges: List[SimulatedEdge]
+
+class LineCodeInfo(BaseModel):
+    """Descripción de un código de línea del registro."""
+    name: str
+    description: str
+    states: int
+    lookahead_bits: int
+    chips_per_bit: int
 
 class ModulationListResponse(BaseModel):
     """Modelo para la respuesta de la lista de modulaciones."""
     supported_modulations: list[str]
+    line_codes: List[LineCodeInfo] = []
+
+class GpioTimingReport(BaseModel):
+    """Error de temporización medido en un envío a un pin."""
+    pin: int
+    mode: GpioPlaybackMode
+    writes: int
+    duration_s: float
+    mean_abs_error_us: float
+    p99_abs_error_us: float
+    max_abs_error_us: float
 
 class GpioSendResponse(BaseModel):
     """Modelo para la respuesta del envío GPIO."""
     status: str
-    message: str
\ No newline at end of file
+    message: str
+    timing: List[GpioTimingReport] = []
+
+class GpioJobResponse(GpioSendResponse):
+    """Modelo para la respuesta de un trabajo de transmisión GPIO."""
+    job_id: str
+    status: GpioJobStatus
+    output_pins: List[int]
+    priority: int
+    queue_position: Optional[int] = None
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+
+class PlotCacheStatsResponse(BaseModel):
+    """Modelo para las estadísticas de la caché de gráficas."""
+    entries: int
+    bytes: int
+    max_bytes: int
+    disk_entries: int
+    disk_bytes: int
+    hits: int
+    disk_hits: int
+    misses: int
+    evictions: int
+    hit_rate: float
+
+class PsdCacheStatsResponse(BaseModel):
+    """Modelo para las estadísticas de la caché de espectros."""
+    entries: int
+    max_entries: int
+    hits: int
+    misses: int
+    hit_rate: float
+
+class RenderPoolStatsResponse(BaseModel):
+    """Estado del ejecutor de renderizado."""
+    mode: str
+    workers: int
+    max_pending: int
+    in_flight: int
+    completed: int
+    rejected: int
+    timeouts: int
@@ -0,0 +1,163 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional
+
+import numpy as np
+
+from app_logging import get_logger
+from config import BIT_DURATION, SAMPLES_PER_BIT, PLOT_CACHE_MAX_BYTES, PLOT_CACHE_DIR, PLOT_CACHE_DISK_MAX_BYTES
+
+DEFAULT_PLOT_STYLE = "matplotlib-png"
+
+logger = get_logger("plot_cache")
+
+
+def plot_cache_key(bits: np.ndarray, modulation: str, style: str = DEFAULT_PLOT_STYLE,
+                   bit_duration: float = BIT_DURATION, samples_per_bit: int = SAMPLES_PER_BIT) -> tuple:
+    """Clave de una gráfica: (bits, modulación, duración de bit, muestras por bit, estilo)."""
+    bit_string = (np.asarray(bits, dtype=np.uint8) + ord("0")).tobytes().decode("ascii")
+    return bit_string, modulation, bit_duration, samples_per_bit, style
+
+
+def make_etag(key: Hashable) -> str:
+    """ETag fuerte derivado de la clave: la imagen es determinista para unos parámetros dados."""
+    return '"' + hashlib.sha256(repr(key).encode("utf-8")).hexdigest()[:32] + '"'
+
+
+class PlotCache:
+    """
+    Caché LRU en memoria de imágenes ya codificadas, con desalojo por tamaño total en bytes.
+
+    Si se indica `spill_dir`, las entradas desalojadas de memoria se guardan en disco (también
+    acotado por `disk_max_bytes`) y un acierto en disco las vuelve a subir a memoria.
+    """
+
+    def __init__(self, max_bytes: int = PLOT_CACHE_MAX_BYTES, spill_dir: Optional[str] = PLOT_CACHE_DIR,
+                 disk_max_bytes: int = PLOT_CACHE_DISK_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._bytes = 0
+        self._disk: "OrderedDict[Hashable, int]" = OrderedDict()  # clave -> tamaño en disco
+        self._disk_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data
+            data = self._read_spilled(key)
+            if data is not None:
+                self.disk_hits += 1
+                self._store(key, data)
+                return data
+            self.misses += 1
+            return None
+
+    def record_hit(self, key: Hashable):
+        """Cuenta un acierto sin leer la entrada (p. ej. una revalidación 304 con el ETag vigente)."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self.hits += 1
+
+    def put(self, key: Hashable, data: bytes):
+        with self._lock:
+            self._store(key, data)
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], bytes]) -> bytes:
+        """Devuelve la entrada en caché o la genera con `factory` y la guarda."""
+        data = self.get(key)
+        if data is None:
+            data = factory()
+            self.put(key, data)
+        return data
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            for key in list(self._disk):
+                self._remove_spilled(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+    # --- Internos (se llaman con el lock tomado) ---
+
+    def _store(self, key: Hashable, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= len(previous)
+        self._entries[key] = data
+        self._bytes += len(data)
+        while self._bytes > self.max_bytes:
+            old_key, old_data = self._entries.popitem(last=False)
+            self._bytes -= len(old_data)
+            self.evictions += 1
+            self._spill(old_key, old_data)
+
+    def _path(self, key: Hashable) -> str:
+        return os.path.join(self.spill_dir, make_etag(key).strip('"') + ".bin")
+
+    def _spill(self, key: Hashable, data: bytes):
+        if not self.spill_dir or key in self._disk or len(data) > self.disk_max_bytes:
+            return
+        try:
+            with open(self._path(key), "wb") as f:
+                f.write(data)
+        except OSError as e:
+            logger.warning("No se pudo guardar la gráfica en disco: %s", e)
+            return
+        self._disk[key] = len(data)
+        self._disk_bytes += len(data)
+        while self._disk_bytes > self.disk_max_bytes:
+            self._remove_spilled(next(iter(self._disk)))
+
+    def _read_spilled(self, key: Hashable) -> Optional[bytes]:
+        if key not in self._disk:
+            return None
+        try:
+            with open(self._path(key), "rb") as f:
+                data = f.read()
+        except OSError:
+            data = None
+        self._remove_spilled(key)
+        return data
+
+    def _remove_spilled(self, key: Hashable):
+        self._disk_bytes -= self._disk.pop(key, 0)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+
+plot_cache = PlotCache()
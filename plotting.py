@@ -4,17 +4,83 @@ matplotlib.use('Agg')  # Configurar backend antes de importar pyplot
 import matplotlib.pyplot as plt
 import numpy as np
 import io
-from config import VOLTAGE_HIGH, VOLTAGE_LOW_BIPOLAR, VOLTAGE_LOW_UNIPOLAR, BIT_DURATION
+import threading
+from typing import List
+from config import VOLTAGE_HIGH, VOLTAGE_LOW_BIPOLAR, VOLTAGE_LOW_UNIPOLAR
+from metrics import stage, timed_lock
+from signal_types import ModulatedSignal
 
+# pyplot mantiene estado global: serializar el renderizado si se llama desde varios hilos
+_pyplot_lock = threading.Lock()
 
-def create_plot_image(t, original_signal, modulated_signal, title):
-    """Genera la gráfica (solo de la Señal Modulada) y la devuelve como bytes PNG."""
-    # Color primario para la señal y color complementario para cuadrícula
-    primary_color = '#2563EB'  # Azul primario para la línea de la señal
-    grid_color = '#93C5FD'  # Azul más claro para la cuadrícula y líneas verticales
+def create_plot_image(signal: ModulatedSignal, title: str = None, image_format: str = "png"):
+    """Genera la gráfica (solo de la Señal Modulada) y la devuelve como bytes PNG (o en `image_format`)."""
+    with timed_lock(_pyplot_lock, "pyplot"):
+        return _create_plot_image(signal, title, image_format)
+
+
+def create_plot_grid(grid: List[List[ModulatedSignal]], image_format: str = "png"):
+    """Genera una figura con un panel por señal (una fila de paneles por fila de `grid`)."""
+    with timed_lock(_pyplot_lock, "pyplot"):
+        rows, columns = len(grid), max(len(row) for row in grid)
+        fig, axes = plt.subplots(rows, columns, figsize=(10 * columns, 4 * rows), squeeze=False)
+        for r, row in enumerate(grid):
+            for c in range(columns):
+                if c < len(row):
+                    _draw_signal(axes[r][c], row[c])
+                    axes[r][c].set_title(f'Modulación: {row[c].modulation}', fontsize=14)
+                else:
+                    axes[r][c].axis('off')
+        fig.tight_layout()
+        return _save_figure(fig, image_format)
+
+
+def create_psd_plot(frequencies: np.ndarray, curves: List[tuple], image_format: str = "png"):
+    """Gráfica de la PSD (dB) de varios códigos superpuestos; `curves` es [(nombre, psd)]."""
+    with timed_lock(_pyplot_lock, "pyplot"):
+        fig, ax = plt.subplots(figsize=(10, 4))
+        fig.suptitle('Densidad espectral de potencia', fontsize=16)
+        floor = 1e-12
+        for name, psd in curves:
+            ax.plot(frequencies, 10 * np.log10(np.maximum(psd, floor)), linewidth=1.5, label=name)
+        ax.set_xlabel('Frecuencia (múltiplos de la tasa de bits)')
+        ax.set_ylabel('PSD (dB)')
+        ax.set_ylim(bottom=max(ax.get_ylim()[0], -60))
+        ax.grid(True, color='#93C5FD', linestyle='--', linewidth=0.6, alpha=0.7)
+        ax.legend()
+        plt.tight_layout(rect=[0, 0.03, 1, 0.95])
+        return _save_figure(fig, image_format)
 
+
+def _create_plot_image(signal: ModulatedSignal, title: str = None, image_format: str = "png"):
+    title = title or signal.modulation
     fig, ax = plt.subplots(figsize=(10, 4))
     fig.suptitle(f'Modulación: {title}', fontsize=16)
+    _draw_signal(ax, signal)
+    plt.tight_layout(rect=[0, 0.03, 1, 0.95])
+    return _save_figure(fig, image_format)
+
+
+def _save_figure(fig, image_format: str):
+    # Guardar en buffer de memoria
+    buf = io.BytesIO()
+    with stage(f"{image_format}_encode"):
+        fig.savefig(buf, format=image_format)
+    plt.close(fig)  # Importante para liberar memoria
+    buf.seek(0)
+    return buf
+
+
+def _draw_signal(ax, signal: ModulatedSignal):
+    """Dibuja la señal, la cuadrícula y las etiquetas de bit en `ax`."""
+    t = signal.time_base()
+    modulated_signal = signal.levels
+    original_signal = signal.bits
+    bit_duration = signal.bit_duration
+
+    # Color primario para la señal y color complementario para cuadrícula
+    primary_color = '#2563EB'  # Azul primario para la línea de la señal
+    grid_color = '#93C5FD'  # Azul más claro para la cuadrícula y líneas verticales
 
     # Graficar señal modulada con el color primario y grosor ajustado
     ax.step(t, modulated_signal, where='post', color=primary_color, linewidth=2)
@@ -33,16 +99,16 @@ def create_plot_image(t, original_signal, modulated_signal, title):
     ax.grid(True, color=grid_color, linestyle='--', linewidth=0.6, alpha=0.7)
 
     # Añadir líneas verticales para marcar los límites de los bits con un tono más claro
-    num_bits = int(round(t[-1] / BIT_DURATION)) if BIT_DURATION > 0 and len(t) > 0 else 0
+    num_bits = signal.num_bits
     for i in range(num_bits + 1):
-        ax.axvline(i * BIT_DURATION, color=grid_color, linestyle='--', lw=0.8)
+        ax.axvline(signal.start_time + i * bit_duration, color=grid_color, linestyle='--', lw=0.8)
 
     # Colocar los bits enviados como etiquetas centradas en el eje X
     tick_positions = []
     tick_labels = []
     for i in range(num_bits):  # Crear etiquetas para cada bit
         # Calcular posición del tick
-        tick_positions.append((i + 0.5) * BIT_DURATION)
+        tick_positions.append(signal.start_time + (i + 0.5) * bit_duration)
         # Validar longitud de original_signal antes de usarlo
         if i < len(original_signal):
             # Convertir el valor del bit a entero si es necesario, luego a string
@@ -55,12 +121,3 @@ def create_plot_image(t, original_signal, modulated_signal, title):
     # Aplicar etiquetas personalizadas en el eje X
     ax.set_xticks(tick_positions)
     ax.set_xticklabels(tick_labels)
-
-    plt.tight_layout(rect=[0, 0.03, 1, 0.95])
-
-    # Guardar en buffer de memoria
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png')
-    plt.close(fig)  # Importante para liberar memoria
-    buf.seek(0)
-    return buf
\ No newline at end of file
@@ -0,0 +1,270 @@
+import asyncio
+import io
+import multiprocessing
+import re
+import threading
+import zipfile
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from config import BATCH_WORKERS, RENDER_EXECUTOR, RENDER_WORKERS, RENDER_MAX_PENDING, RENDER_TIMEOUT_S
+from config import RENDER_START_METHOD
+from metrics import capture_observations, replay_observations, stage
+from models import PlotRenderer, PlotFormat, ModulationType, BatchOutput, ChannelParams
+from signal_generation import BinaryData, modulate
+from signal_types import ModulatedSignal
+from fast_plotting import render_png, render_svg, render_grid_png, render_grid_svg, render_eye_png, EYE_PLOT_SIZE
+from channel import simulate_channel, eye_histogram, noise_sigma
+
+PLOT_MEDIA_TYPES = {PlotFormat.PNG: "image/png", PlotFormat.SVG: "image/svg+xml"}
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_guard = threading.Lock()
+
+def _get_pool() -> ThreadPoolExecutor:
+    """Pool de hilos compartido para dibujar paneles de lotes, creado en el primer uso."""
+    global _pool
+    with _pool_guard:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="batch-render")
+        return _pool
+
+
+def render_signal(signal: ModulatedSignal, renderer: PlotRenderer = PlotRenderer.MATPLOTLIB,
+                  image_format: PlotFormat = PlotFormat.PNG) -> bytes:
+    """Gráfica de una señal con el motor y formato indicados."""
+    if renderer == PlotRenderer.FAST:
+        return render_svg(signal) if image_format == PlotFormat.SVG else render_png(signal)
+    from plotting import create_plot_image  # matplotlib se importa en el primer render que lo usa
+    return create_plot_image(signal, image_format=image_format.value).getvalue()
+
+
+def render_batch_image(grid: List[List[ModulatedSignal]], renderer: PlotRenderer = PlotRenderer.MATPLOTLIB,
+                       image_format: PlotFormat = PlotFormat.PNG, parallel: bool = False) -> bytes:
+    """
+    Imagen multipanel: una fila por mensaje y una columna por modulación.
+    Con `parallel` los paneles del motor rápido se dibujan en el pool; matplotlib compone la
+    figura entera de una vez (pyplot no admite dibujar en paralelo dentro del proceso).
+    """
+    if renderer == PlotRenderer.FAST:
+        map_func = _get_pool().map if parallel else map
+        if image_format == PlotFormat.SVG:
+            return render_grid_svg(grid, map_func)
+        return render_grid_png(grid, map_func)
+    from plotting import create_plot_grid
+    return create_plot_grid(grid, image_format=image_format.value).getvalue()
+
+
+def _panel_filename(row: int, signal: ModulatedSignal, image_format: PlotFormat) -> str:
+    slug = re.sub(r"[^0-9A-Za-z]+", "_", signal.modulation).strip("_")
+    return f"{row:03d}_{slug}.{image_format.value}"
+
+
+def render_batch_zip(grid: List[List[ModulatedSignal]], renderer: PlotRenderer = PlotRenderer.MATPLOTLIB,
+                     image_format: PlotFormat = PlotFormat.PNG, parallel: bool = False) -> bytes:
+    """Zip con una gráfica por combinación, nombrada `<fila>_<modulación>.<formato>` (fila con tres cifras, p. ej. `000_NRZ_M.png`)."""
+    signals = [(row, signal) for row, signals in enumerate(grid) for signal in signals]
+    map_func = _get_pool().map if parallel else map
+    images = map_func(lambda item: render_signal(item[1], renderer, image_format), signals)
+    # Los PNG ya van comprimidos: solo se comprimen los SVG
+    compression = zipfile.ZIP_DEFLATED if image_format == PlotFormat.SVG else zipfile.ZIP_STORED
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", compression=compression) as archive:
+        for (row, signal), image in zip(signals, images):
+            archive.writestr(_panel_filename(row, signal, image_format), image)
+    return buf.getvalue()
+
+
+# --- Tareas completas (lo que se envía a los trabajadores: argumentos y resultado serializables) ---
+# La señal se modula en el proceso principal y solo viaja la señal compacta (int8): así los
+# trabajadores no dependen de los códigos registrados en tiempo de ejecución.
+
+def render_message(bits: BinaryData, modulation_type: ModulationType, renderer: PlotRenderer = PlotRenderer.MATPLOTLIB,
+                   image_format: PlotFormat = PlotFormat.PNG) -> bytes:
+    """Genera la señal y su gráfica con el motor y formato indicados (sin caché)."""
+    return render_signal(modulate(bits, modulation_type), renderer, image_format)
+
+
+def render_batch(grid: List[List[ModulatedSignal]], renderer: PlotRenderer, image_format: PlotFormat,
+                 output: BatchOutput, parallel: bool = False) -> bytes:
+    """Dibuja un lote ya modulado (imagen multipanel o zip)."""
+    if output == BatchOutput.ZIP:
+        return render_batch_zip(grid, renderer, image_format, parallel)
+    return render_batch_image(grid, renderer, image_format, parallel)
+
+
+def _channel_label(channel: ChannelParams) -> str:
+    parts = [f"SNR {channel.snr_db:g} dB" if channel.snr_db is not None else "sin ruido"]
+    if channel.filter.value != "none":
+        parts.append(f"{channel.filter.value.upper()} {channel.bandwidth:g}×Rb")
+    if channel.jitter_ui:
+        parts.append(f"jitter {channel.jitter_ui:g} UI")
+    return ", ".join(parts)
+
+
+def render_eye(signal: ModulatedSignal, channel: ChannelParams, span_ui: int = 2) -> bytes:
+    """Pasa la señal por el canal y dibuja su diagrama de ojo (PNG)."""
+    received = simulate_channel(signal.levels, signal.samples_per_bit, channel)
+    low, high = (int(signal.levels.min()), int(signal.levels.max())) if signal.num_samples else (-1, 1)
+    margin = 0.3 + min(4 * noise_sigma(signal.levels, channel.snr_db), 2.0)
+    y_range = (min(low, 0) - margin, max(high, 0) + margin)
+    hist = eye_histogram(received, signal.samples_per_bit, *EYE_PLOT_SIZE, y_range, span_ui)
+    return render_eye_png(hist, y_range, list(range(min(low, 0), max(high, 0) + 1)), span_ui,
+                          f"{signal.modulation} ({_channel_label(channel)})")
+
+
+def render_eye_message(payload: Optional[BinaryData], mod_type, samples_per_bit: int, random_bits: int,
+                       channel: ChannelParams, span_ui: int = 2) -> bytes:
+    """
+    Modula el mensaje (o `random_bits` bits aleatorios) y dibuja su diagrama de ojo, todo en el
+    ejecutor. Los bits aleatorios salen de un flujo derivado de `channel.seed`, independiente del
+    que usa el canal para el jitter y el ruido.
+    """
+    if payload is None:
+        bits_seed = np.random.SeedSequence(channel.seed).spawn(1)[0]
+        payload = np.random.default_rng(bits_seed).integers(0, 2, random_bits, dtype=np.uint8)
+    return render_eye(modulate(payload, mod_type, samples_per_bit), channel, span_ui)
+
+
+def render_psd(frequencies, curves: List[tuple], image_format: PlotFormat = PlotFormat.PNG) -> bytes:
+    """Gráfica de las PSD ya calculadas (`curves` es [(nombre, psd)])."""
+    from plotting import create_psd_plot
+    return create_psd_plot(frequencies, curves, image_format.value).getvalue()
+
+
+# --- Ejecutor de renderizado ---
+
+class RenderPoolBusy(Exception):
+    """Todos los huecos del ejecutor de renderizado están ocupados."""
+
+
+def _warm_worker():
+    """Inicializador de cada proceso: un primer render importa matplotlib y carga fuentes y cachés
+    para que la primera solicitud real no pague ese coste."""
+    render_message("01", ModulationType.NRZ_M)
+    render_message("01", ModulationType.NRZ_M, PlotRenderer.FAST)
+
+
+def _ping() -> bool:
+    return True
+
+
+def _instrumented_call(func: Callable, *args):
+    """
+    Ejecuta `func(*args)` en el trabajador midiendo la etapa `render` y devuelve
+    `(resultado, observaciones)`: las métricas del trabajador se suman en el proceso principal.
+    """
+    with capture_observations() as observations:
+        with stage("render"):
+            result = func(*args)
+    return result, observations
+
+
+class RenderPool:
+    """
+    Ejecutor de renderizado con concurrencia acotada.
+
+    `mode` elige dónde se dibuja: `process` (pool de procesos pre-calentados, uno por núcleo: el
+    throughput escala con los núcleos y el bucle de eventos queda libre), `thread` o `inline`
+    (en el propio bucle, como antes). Como mucho `max_pending` renders pueden estar en curso o
+    en espera; con el pool lleno `run` lanza RenderPoolBusy en lugar de encolar sin límite.
+    """
+
+    def __init__(self, mode: str = RENDER_EXECUTOR, workers: int = RENDER_WORKERS,
+                 max_pending: int = RENDER_MAX_PENDING, start_method: str = RENDER_START_METHOD):
+        self.mode = mode
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self._executor: Optional[Executor] = None
+        self._start_method = start_method
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def _get_executor(self) -> Optional[Executor]:
+        with self._lock:
+            if self._executor is None and self.mode == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_worker,
+                                                     mp_context=multiprocessing.get_context(self._start_method))
+            elif self._executor is None and self.mode == "thread":
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="render")
+            return self._executor
+
+    def warm_up(self):
+        """Arranca todos los trabajadores (y su inicializador) antes de la primera solicitud."""
+        executor = self._get_executor()
+        if executor is not None:
+            for future in [executor.submit(_ping) for _ in range(self.workers)]:
+                future.result()
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, func: Callable, *args) -> Future:
+        """Envía `func(*args)` al ejecutor. Lanza RenderPoolBusy si no quedan huecos."""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise RenderPoolBusy(f"El servidor está renderizando {self.max_pending} gráficas; reintente en breve.")
+        with self._lock:
+            self.in_flight += 1
+        try:
+            executor = self._get_executor()
+            if executor is None:
+                future = Future()
+                try:
+                    future.set_result(func(*args))
+                except Exception as e:
+                    future.set_exception(e)
+            else:
+                future = executor.submit(func, *args)
+        except Exception:
+            self._release()
+            raise
+        # El hueco se libera cuando el render termina de verdad (aunque la solicitud ya haya vencido)
+        future.add_done_callback(lambda _: self._release())
+        return future
+
+    async def run(self, func: Callable, *args, timeout: Optional[float] = None):
+        """Ejecuta `func(*args)` sin bloquear el bucle de eventos y espera como mucho `timeout` segundos."""
+        future = self.submit(_instrumented_call, func, *args)
+        try:
+            result, observations = await asyncio.wait_for(asyncio.wrap_future(future), timeout or RENDER_TIMEOUT_S)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            raise
+        replay_observations(observations)
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"mode": self.mode, "workers": self.workers, "max_pending": self.max_pending,
+                    "in_flight": self.in_flight, "completed": self.completed,
+                    "rejected": self.rejected, "timeouts": self.timeouts}
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+            self.completed += 1
+        self._slots.release()
+
+
+_render_pool: Optional[RenderPool] = None
+_render_pool_guard = threading.Lock()
+
+def get_render_pool() -> RenderPool:
+    """Devuelve el ejecutor global de renderizado, creándolo en el primer uso."""
+    global _render_pool
+    with _render_pool_guard:
+        if _render_pool is None:
+            _render_pool = RenderPool()
+        return _render_pool
@@ -0,0 +1,56 @@
+"""
+Arranque del servidor con uvicorn.
+
+Uso (desde la raíz del proyecto):
+    python server.py                                 # desarrollo: un proceso con recarga automática
+    python server.py --env production --workers 4    # producción: varios procesos, sin recarga
+
+Los valores por defecto salen de APP_ENV, APP_HOST, APP_PORT y APP_WORKERS. Este módulo no importa
+la aplicación: cada proceso de uvicorn importa `main:app` por su cuenta, y el proceso supervisor no
+carga FastAPI, NumPy ni las librerías de gráficas.
+
+Con GPIO activo (GPIO_BACKEND distinto de "none") se arranca un solo proceso: la cola de trabajos
+GPIO, el registro del simulador y sus métricas viven en memoria del proceso, y con varios cada
+consulta de un trabajo caería en un proceso que no lo conoce. El renderizado sigue usando todos
+los núcleos con su propio ejecutor de procesos.
+"""
+import argparse
+import os
+
+from app_logging import get_logger
+from config import APP_ENV, APP_HOST, APP_PORT, APP_WORKERS, GPIO_BACKEND
+
+logger = get_logger("server")
+
+
+def run(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor del modulador de señales.")
+    parser.add_argument("--env", choices=["development", "production"], default=APP_ENV)
+    parser.add_argument("--host", default=APP_HOST)
+    parser.add_argument("--port", type=int, default=APP_PORT)
+    parser.add_argument("--workers", type=int, default=APP_WORKERS, help="Procesos del servidor (solo en producción)")
+    args = parser.parse_args(argv)
+
+    import uvicorn
+    production = args.env == "production"
+    workers = max(1, args.workers) if production else 1
+    if workers > 1 and GPIO_BACKEND != "none":
+        logger.warning("GPIO_BACKEND='%s': los trabajos GPIO son del proceso que los recibe; se arranca un solo "
+                       "proceso en lugar de %d (usa GPIO_BACKEND=none para servir solo gráficas con varios).",
+                       GPIO_BACKEND, workers)
+        workers = 1
+    # Los procesos hijos leen APP_WORKERS al importar `config` para repartirse los núcleos de renderizado
+    os.environ["APP_WORKERS"] = str(workers)
+    logger.info("Iniciando servidor FastAPI (%s, %d proceso(s), backend GPIO '%s').", args.env, workers, GPIO_BACKEND)
+    logger.info("Documentación interactiva: http://127.0.0.1:%d/scalar", args.port)
+    logger.info("Acceso local: http://127.0.0.1:%d/ (desde otros dispositivos, usa la IP de tu Raspberry Pi)", args.port)
+
+    # Escuchar en 0.0.0.0 para acceso externo
+    if production:
+        uvicorn.run("main:app", host=args.host, port=args.port, workers=workers, reload=False, access_log=False)
+    else:
+        uvicorn.run("main:app", host=args.host, port=args.port, reload=True)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,251 @@
+import io
+import re
+import struct
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+
+from config import BIT_DURATION, SAMPLES_PER_BIT, CHUNK_BITS, MAX_DECODE_SAMPLES
+from models import ModulationType, SampleFormat, SampleDtype
+from signal_generation import BinaryData, iter_modulated_chunks
+
+# --- Formato binario propio ---
+# Cabecera little-endian de 40 bytes (múltiplo de 8, así los datos que siguen quedan alineados
+# para Float32Array / BigInt64Array en el navegador):
+#   magic "PCMS" | versión u8 | contenido u8 | tamaño de cabecera u16 | muestras por bit u32 |
+#   reservado u32 | bits u64 | entradas u64 (muestras o transiciones) | duración de bit f64
+# Los tiempos no se envían: la muestra `i` empieza en `i * bit_duration / samples_per_bit`.
+HEADER = struct.Struct("<4sBBHIIQQd")
+MAGIC = b"PCMS"
+VERSION = 1
+
+CONTENT_CODES = {"int8": 0, "float32": 1, "transitions": 2}
+_DTYPES = {SampleDtype.INT8: np.dtype("<i1"), SampleDtype.FLOAT32: np.dtype("<f4")}
+
+_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class RangeNotSatisfiable(ValueError):
+    """El rango HTTP pedido queda fuera del recurso."""
+
+
+def _header(content: str, num_bits: int, num_entries: int, samples_per_bit: int, bit_duration: float) -> bytes:
+    return HEADER.pack(MAGIC, VERSION, CONTENT_CODES[content], HEADER.size, samples_per_bit, 0,
+                       num_bits, num_entries, bit_duration)
+
+
+def _npy_header(dtype: np.dtype, num_samples: int) -> bytes:
+    buffer = io.BytesIO()
+    np.lib.format.write_array_header_1_0(
+        buffer, {"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": False, "shape": (num_samples,)})
+    return buffer.getvalue()
+
+
+def parse_range(range_header: Optional[str], total: int) -> Optional[Tuple[int, int]]:
+    """
+    Interpreta una cabecera `Range: bytes=a-b` y devuelve el intervalo semiabierto [inicio, fin).
+    Devuelve None si no hay cabecera o si no es un rango simple (se sirve el recurso completo).
+    Lanza RangeNotSatisfiable si el rango no solapa con el recurso.
+    """
+    if not range_header:
+        return None
+    match = _RANGE_PATTERN.match(range_header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if first == "":
+        start, stop = max(0, total - int(last)), total  # sufijo: los últimos N bytes
+    else:
+        start = int(first)
+        stop = total if last == "" else min(int(last) + 1, total)
+    if start >= total or start >= stop:
+        raise RangeNotSatisfiable(f"Rango '{range_header}' fuera del recurso ({total} bytes).")
+    return start, stop
+
+
+class SampleStream:
+    """
+    Señal modulada servida como buffer binario (`raw` o `npy`), generada por bloques.
+
+    El tamaño total se conoce sin generar la señal, así que se puede responder a peticiones
+    de rango generando solo los bits que cubren los bytes pedidos.
+    """
+
+    def __init__(self, binary_data: BinaryData, mod_type: ModulationType, num_bits: int,
+                 sample_format: SampleFormat = SampleFormat.RAW, sample_dtype: SampleDtype = SampleDtype.INT8,
+                 chunk_bits: int = CHUNK_BITS, samples_per_bit: int = SAMPLES_PER_BIT,
+                 bit_duration: float = BIT_DURATION):
+        if sample_format == SampleFormat.TRANSITIONS:
+            raise ValueError("SampleStream solo sirve los formatos 'raw' y 'npy'.")
+        self.binary_data = binary_data
+        self.mod_type = mod_type
+        self.num_bits = num_bits
+        self.chunk_bits = chunk_bits
+        self.samples_per_bit = samples_per_bit
+        self.bit_duration = bit_duration
+        self.dtype = _DTYPES[sample_dtype]
+        self.num_samples = num_bits * samples_per_bit
+        if sample_format == SampleFormat.NPY:
+            self.header = _npy_header(self.dtype, self.num_samples)
+        else:
+            self.header = _header(sample_dtype.value, num_bits, self.num_samples, samples_per_bit, bit_duration)
+
+    @property
+    def size(self) -> int:
+        return len(self.header) + self.num_samples * self.dtype.itemsize
+
+    def iter_bytes(self, start: int = 0, stop: Optional[int] = None) -> Iterator[bytes]:
+        """Bytes [start, stop) del recurso completo (cabecera incluida), bloque a bloque."""
+        stop = self.size if stop is None else min(stop, self.size)
+        header_size = len(self.header)
+        if start < header_size:
+            yield self.header[start:min(stop, header_size)]
+        if stop <= header_size:
+            return
+        data_start, data_stop = max(start, header_size) - header_size, stop - header_size
+        itemsize = self.dtype.itemsize
+        first_sample, last_sample = data_start // itemsize, -(-data_stop // itemsize)
+        spb = self.samples_per_bit
+        first_bit, last_bit = first_sample // spb, -(-last_sample // spb)
+        offset = data_start - first_bit * spb * itemsize  # bytes a descartar del primer bloque
+        remaining = data_stop - data_start
+        for chunk in iter_modulated_chunks(self.binary_data, self.mod_type, self.chunk_bits, first_bit, last_bit,
+                                           samples_per_bit=spb, bit_duration=self.bit_duration):
+            data = chunk.levels.astype(self.dtype, copy=False).tobytes()
+            data = data[offset:offset + remaining]
+            offset = 0
+            remaining -= len(data)
+            yield data
+
+
+class TransitionStream:
+    """
+    Lista de transiciones de la señal servida por bloques: cabecera, índice global de la muestra
+    donde empieza cada tramo (int64 LE) y nivel del tramo (int8). Los tramos que continúan de un
+    bloque al siguiente se fusionan, así el resultado no depende del tamaño de bloque.
+
+    La cabecera lleva el número de transiciones y los niveles van detrás de todos los inicios, así
+    que al crearla se recorre la señal una vez para contar las transiciones de cada bloque (sin
+    guardarlas); después cada sección se genera de nuevo solo en los bloques que cubren los bytes
+    pedidos, como en `SampleStream`. La memoria depende del tamaño de bloque, no del mensaje.
+    """
+
+    def __init__(self, binary_data: BinaryData, mod_type: ModulationType, num_bits: int,
+                 chunk_bits: int = CHUNK_BITS, samples_per_bit: int = SAMPLES_PER_BIT,
+                 bit_duration: float = BIT_DURATION):
+        self.binary_data = binary_data
+        self.mod_type = mod_type
+        self.num_bits = num_bits
+        self.chunk_bits = chunk_bits
+        self.samples_per_bit = samples_per_bit
+        self.bit_duration = bit_duration
+        counts, carried = [], []
+        last_level = None
+        for chunk in self._chunks(0, num_bits):
+            carried.append(last_level)  # Nivel del último tramo anterior al bloque
+            _, levels = chunk.transitions()
+            counts.append(len(levels) - int(bool(len(levels)) and levels[0] == last_level))
+            if len(levels):
+                last_level = levels[-1]
+        self._carried = carried
+        self._offsets = np.concatenate(([0], np.cumsum(counts, dtype=np.int64)))  # Primera transición de cada bloque
+        self.num_entries = int(self._offsets[-1])
+        self.header = _header("transitions", num_bits, self.num_entries, samples_per_bit, bit_duration)
+
+    @property
+    def size(self) -> int:
+        return len(self.header) + self.num_entries * 9
+
+    def _chunks(self, first_bit: int, last_bit: int) -> Iterator:
+        return iter_modulated_chunks(self.binary_data, self.mod_type, self.chunk_bits, first_bit, last_bit,
+                                     samples_per_bit=self.samples_per_bit, bit_duration=self.bit_duration)
+
+    def _iter_entries(self, first: int, last: int, levels_section: bool) -> Iterator[np.ndarray]:
+        """Inicios (o niveles) de las transiciones [first, last), bloque a bloque."""
+        first_chunk = int(np.searchsorted(self._offsets, first, side="right")) - 1
+        last_chunk = int(np.searchsorted(self._offsets, last, side="left"))
+        chunks = self._chunks(first_chunk * self.chunk_bits, min(last_chunk * self.chunk_bits, self.num_bits))
+        for index, chunk in enumerate(chunks, start=first_chunk):
+            starts, levels = chunk.transitions()
+            if len(levels) and levels[0] == self._carried[index]:
+                starts, levels = starts[1:], levels[1:]
+            begin = int(self._offsets[index])
+            keep = slice(max(first - begin, 0), max(last - begin, 0))
+            if levels_section:
+                yield levels[keep].astype("<i1", copy=False)
+            else:
+                yield (starts[keep] + chunk.start_sample).astype("<i8", copy=False)
+
+    def iter_bytes(self, start: int = 0, stop: Optional[int] = None) -> Iterator[bytes]:
+        """Bytes [start, stop) del recurso completo (cabecera incluida), bloque a bloque."""
+        stop = self.size if stop is None else min(stop, self.size)
+        header_size = len(self.header)
+        if start < header_size:
+            yield self.header[start:min(stop, header_size)]
+        # (inicio de la sección en el recurso, bytes por entrada, ¿niveles?)
+        for section_start, itemsize, levels_section in ((header_size, 8, False),
+                                                        (header_size + self.num_entries * 8, 1, True)):
+            section_stop = section_start + self.num_entries * itemsize
+            data_start, data_stop = max(start, section_start) - section_start, min(stop, section_stop) - section_start
+            if data_start >= data_stop:
+                continue
+            first, last = data_start // itemsize, -(-data_stop // itemsize)
+            offset = data_start - first * itemsize  # bytes a descartar de la primera entrada
+            remaining = data_stop - data_start
+            for entries in self._iter_entries(first, last, levels_section):
+                data = entries.tobytes()[offset:offset + remaining]
+                offset = 0
+                remaining -= len(data)
+                if data:
+                    yield data
+
+
+# --- Lectura de buffers (para decodificar capturas) ---
+
+class SampleBuffer:
+    """Muestras leídas de un buffer binario, con las muestras por bit si el formato las incluye."""
+
+    def __init__(self, samples: np.ndarray, samples_per_bit: Optional[int] = None):
+        self.samples = samples
+        self.samples_per_bit = samples_per_bit
+
+
+def read_sample_buffer(data: bytes, sample_dtype: SampleDtype = SampleDtype.INT8,
+                       max_samples: int = MAX_DECODE_SAMPLES) -> SampleBuffer:
+    """
+    Interpreta un buffer de muestras en cualquiera de los formatos de descarga: `raw` con
+    cabecera PCMS (muestras o transiciones), `.npy` 1-D o, sin cabecera reconocible, muestras
+    sueltas del tipo `sample_dtype`. Lanza ValueError si el buffer está mal formado o si una lista
+    de transiciones se expande a más de `max_samples` muestras (la cabecera la fija el cliente).
+    """
+    if data[:4] == MAGIC:
+        if len(data) < HEADER.size:
+            raise ValueError("Cabecera PCMS incompleta.")
+        _, version, content, header_size, spb, _, num_bits, num_entries, _ = HEADER.unpack_from(data)
+        if version != VERSION or content not in CONTENT_CODES.values():
+            raise ValueError(f"Cabecera PCMS no soportada (versión {version}, contenido {content}).")
+        body = memoryview(data)[header_size:]
+        if content == CONTENT_CODES["transitions"]:
+            if len(body) != num_entries * 9:
+                raise ValueError("El número de transiciones no coincide con la cabecera.")
+            if num_bits * spb > max_samples:
+                raise ValueError(f"Las transiciones describen {num_bits * spb} muestras; el máximo es {max_samples}.")
+            starts = np.frombuffer(body[:num_entries * 8], dtype="<i8")
+            levels = np.frombuffer(body[num_entries * 8:], dtype="<i1")
+            lengths = np.diff(np.append(starts, num_bits * spb))
+            if np.any(lengths < 0):
+                raise ValueError("Las transiciones no están ordenadas.")
+            return SampleBuffer(np.repeat(levels, lengths), spb)
+        dtype = np.dtype("<i1") if content == CONTENT_CODES["int8"] else np.dtype("<f4")
+        if len(body) != num_entries * dtype.itemsize:
+            raise ValueError("El número de muestras no coincide con la cabecera.")
+        return SampleBuffer(np.frombuffer(body, dtype=dtype), spb)
+    if data[:6] == b"\x93NUMPY":
+        samples = np.load(io.BytesIO(data), allow_pickle=False)
+        if samples.ndim != 1 or samples.dtype.kind not in "iuf":
+            raise ValueError("El fichero .npy debe contener un array numérico 1-D.")
+        return SampleBuffer(samples)
+    dtype = _DTYPES[sample_dtype]
+    if len(data) % dtype.itemsize:
+        raise ValueError(f"El tamaño del buffer no es múltiplo de {dtype.itemsize} bytes ({sample_dtype.value}).")
+    return SampleBuffer(np.frombuffer(data, dtype=dtype))
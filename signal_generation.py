@@ -1,80 +1,175 @@
-﻿import numpy as np
-from config import SAMPLES_PER_BIT, VOLTAGE_HIGH, VOLTAGE_LOW_BIPOLAR, VOLTAGE_LOW_UNIPOLAR, BIT_DURATION
+﻿from functools import partial
+from typing import Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+from config import SAMPLES_PER_BIT, BIT_DURATION, CHUNK_BITS
 from models import ModulationType # Importar Enum para el mapeo
+from line_codes import get_line_code, is_line_code
+from metrics import stage
+from signal_types import ModulatedSignal
+
+# --- Motor de códigos de línea ---
+# Los códigos se declaran como máquinas de estados en `line_codes.py` y se compilan a tablas;
+# aquí solo se preparan los bits y se empaquetan las muestras en ModulatedSignal.
+
+# El mensaje puede llegar como texto '0'/'1', como bytes empaquetados (MSB primero)
+# o ya convertido en un array de bits.
+BinaryData = Union[str, bytes, np.ndarray]
+
+def message_to_bits(binary_data: BinaryData) -> np.ndarray:
+    """Convierte el mensaje en un array uint8 de bits sin recorrerlo en Python."""
+    if isinstance(binary_data, np.ndarray):
+        return binary_data.astype(np.uint8, copy=False)
+    if isinstance(binary_data, (bytes, bytearray)):
+        return np.unpackbits(np.frombuffer(binary_data, dtype=np.uint8))
+    return np.frombuffer(binary_data.encode("ascii"), dtype=np.uint8) - ord("0")
+
+def _time_base(num_bits: int, samples_per_bit_eff: int) -> np.ndarray:
+    """
+    Vector temporal de las funciones generate_* (idéntico al linspace original, con la temporización
+    de config.py). Las señales `ModulatedSignal` lo construyen con la plantilla memorizada de un bit.
+    """
+    total_samples = num_bits * samples_per_bit_eff
+    return np.linspace(0, num_bits * BIT_DURATION, total_samples, endpoint=False)
+
+def _line_code_samples(bits: np.ndarray, mod_type: ModulationType, samples_per_bit_eff: int,
+                       state: int = 0, dtype=np.float64) -> np.ndarray:
+    """
+    Motor común: devuelve las muestras de la señal modulada para el código indicado.
+    `state` es el estado (índice) de la máquina del código al empezar.
+    Con `bits` 2-D (un mensaje por fila) codifica todas las filas a la vez.
+    """
+    return get_line_code(mod_type).encode(bits, samples_per_bit_eff, state, dtype=dtype)[0]
 
-def generate_original_signal(binary_data: str):
+def _generate(binary_data: BinaryData, mod_type: ModulationType):
+    samples_per_bit_eff = max(1, SAMPLES_PER_BIT)
+    bits = message_to_bits(binary_data)
+    t = _time_base(len(bits), samples_per_bit_eff)
+    return t, _line_code_samples(bits, mod_type, samples_per_bit_eff)
+
+def modulate(binary_data: BinaryData, mod_type: ModulationType, samples_per_bit: Optional[int] = None,
+             bit_duration: Optional[float] = None) -> ModulatedSignal:
+    """
+    Genera la señal modulada en representación compacta (niveles int8, tiempo implícito).
+    `samples_per_bit` y `bit_duration` son los de la solicitud; sin ellos se usan los de config.py.
+    """
+    samples_per_bit_eff = max(1, samples_per_bit or SAMPLES_PER_BIT)
+    with stage("generation"):
+        bits = message_to_bits(binary_data)
+        levels = _line_code_samples(bits, mod_type, samples_per_bit_eff, dtype=np.int8)
+    return ModulatedSignal(levels=levels, bits=bits, modulation=get_line_code(mod_type).name,
+                           samples_per_bit=samples_per_bit_eff, bit_duration=bit_duration or BIT_DURATION)
+
+def modulate_batch(messages: List[BinaryData], mod_types: List[ModulationType], samples_per_bit: Optional[int] = None,
+                   bit_duration: Optional[float] = None) -> List[List[ModulatedSignal]]:
+    """
+    Genera todas las combinaciones mensaje × modulación con una pasada vectorizada por código
+    sobre una matriz 2-D de bits (un mensaje por fila). Las filas cortas se rellenan con el
+    `tail_bit` de cada código, el mismo valor que ve su ventana tras el final de un mensaje,
+    así que el relleno no altera las muestras de cada mensaje.
+    Devuelve una fila por mensaje con una señal por modulación, en el orden recibido.
+    """
+    samples_per_bit_eff = max(1, samples_per_bit or SAMPLES_PER_BIT)
+    bit_duration = bit_duration or BIT_DURATION
+    with stage("generation"):
+        return _modulate_grid(messages, mod_types, samples_per_bit_eff, bit_duration)
+
+def _modulate_grid(messages: List[BinaryData], mod_types: List[ModulationType], samples_per_bit_eff: int,
+                   bit_duration: float) -> List[List[ModulatedSignal]]:
+    rows = [message_to_bits(message) for message in messages]
+    lengths = [len(bits) for bits in rows]
+    grid = [[] for _ in rows]
+    for mod_type in mod_types:
+        code = get_line_code(mod_type)
+        matrix = np.full((len(rows), max(lengths, default=0)), code.tail_bit, dtype=np.uint8)
+        for i, bits in enumerate(rows):
+            matrix[i, :len(bits)] = bits
+        levels = code.encode(matrix, samples_per_bit_eff)[0]
+        modulation = code.name
+        for i, (bits, length) in enumerate(zip(rows, lengths)):
+            grid[i].append(ModulatedSignal(levels=levels[i, :length * samples_per_bit_eff], bits=bits,
+                                           modulation=modulation, samples_per_bit=samples_per_bit_eff,
+                                           bit_duration=bit_duration))
+    return grid
+
+def generate_original_signal(binary_data: BinaryData):
     """Genera la representación de la señal binaria original (niveles 0 y 1)."""
     samples_per_bit_eff = max(1, SAMPLES_PER_BIT)
-    total_samples = len(binary_data) * samples_per_bit_eff
-    t = np.linspace(0, len(binary_data) * BIT_DURATION, total_samples, endpoint=False)
-    signal = np.array([int(bit) for bit in binary_data])
-    original_signal = np.repeat(signal, samples_per_bit_eff)
-    original_signal = np.resize(original_signal, t.shape)
+    bits = message_to_bits(binary_data)
+    t = _time_base(len(bits), samples_per_bit_eff)
+    original_signal = np.repeat(bits.astype(np.int64), samples_per_bit_eff)
     return t, original_signal
 
-def generate_nrzm(binary_data: str):
+def generate_nrzm(binary_data: BinaryData):
     """Genera la señal modulada NRZ-M."""
-    t, _ = generate_original_signal(binary_data)
-    modulated_signal = np.zeros_like(t)
-    current_level = VOLTAGE_LOW_BIPOLAR
-    samples_per_bit_eff = max(1, SAMPLES_PER_BIT)
-    for i, bit in enumerate(binary_data):
-        start_index = i * samples_per_bit_eff
-        end_index = min((i + 1) * samples_per_bit_eff, len(modulated_signal))
-        if bit == '1':
-            current_level *= -1
-        modulated_signal[start_index:end_index] = current_level
-    return t, modulated_signal
-
-def generate_manchester(binary_data: str):
+    return _generate(binary_data, ModulationType.NRZ_M)
+
+def generate_manchester(binary_data: BinaryData):
     """Genera la señal modulada Manchester (Bi-phase L)."""
-    t, _ = generate_original_signal(binary_data)
-    modulated_signal = np.zeros_like(t)
-    samples_per_bit_eff = max(1, SAMPLES_PER_BIT)
-    for i, bit in enumerate(binary_data):
-        start_index = i * samples_per_bit_eff
-        mid_index = min(start_index + samples_per_bit_eff // 2, len(modulated_signal))
-        end_index = min((i + 1) * samples_per_bit_eff, len(modulated_signal))
-        if bit == '0':
-            modulated_signal[start_index:mid_index] = VOLTAGE_HIGH
-            modulated_signal[mid_index:end_index] = VOLTAGE_LOW_BIPOLAR
-        else:
-            modulated_signal[start_index:mid_index] = VOLTAGE_LOW_BIPOLAR
-            modulated_signal[mid_index:end_index] = VOLTAGE_HIGH
-    return t, modulated_signal
-
-def generate_unipolar_rz(binary_data: str):
+    return _generate(binary_data, ModulationType.MANCHESTER)
+
+def generate_unipolar_rz(binary_data: BinaryData):
     """Genera la señal modulada Unipolar RZ."""
-    t, _ = generate_original_signal(binary_data)
-    modulated_signal = np.zeros_like(t)
-    samples_per_bit_eff = max(1, SAMPLES_PER_BIT)
-    for i, bit in enumerate(binary_data):
-        start_index = i * samples_per_bit_eff
-        mid_index = min(start_index + samples_per_bit_eff // 2, len(modulated_signal))
-        end_index = min((i + 1) * samples_per_bit_eff, len(modulated_signal))
-        if bit == '1':
-            modulated_signal[start_index:mid_index] = VOLTAGE_HIGH
-            modulated_signal[mid_index:end_index] = VOLTAGE_LOW_UNIPOLAR
-        else:
-            modulated_signal[start_index:end_index] = VOLTAGE_LOW_UNIPOLAR
-    return t, modulated_signal
-
-def generate_bipolar_ami(binary_data: str):
+    return _generate(binary_data, ModulationType.UNIPOLAR_RZ)
+
+def generate_bipolar_ami(binary_data: BinaryData):
     """Genera la señal modulada Bipolar AMI."""
-    t, _ = generate_original_signal(binary_data)
-    modulated_signal = np.zeros_like(t)
-    last_pulse_polarity = VOLTAGE_LOW_BIPOLAR
-    samples_per_bit_eff = max(1, SAMPLES_PER_BIT)
-    for i, bit in enumerate(binary_data):
-        start_index = i * samples_per_bit_eff
-        end_index = min((i + 1) * samples_per_bit_eff, len(modulated_signal))
-        if bit == '1':
-            current_pulse_polarity = -last_pulse_polarity
-            modulated_signal[start_index:end_index] = current_pulse_polarity
-            last_pulse_polarity = current_pulse_polarity
-        else:
-            modulated_signal[start_index:end_index] = VOLTAGE_LOW_UNIPOLAR
-    return t, modulated_signal
+    return _generate(binary_data, ModulationType.BIPOLAR_AMI)
+
+# --- Generación por bloques para mensajes largos ---
+
+def _message_bits(binary_data: BinaryData, start: int, stop: int) -> np.ndarray:
+    """Bits [start, stop) del mensaje, desempaquetando solo los bytes que los contienen."""
+    if isinstance(binary_data, (bytes, bytearray)):
+        offset = start % 8
+        return np.unpackbits(np.frombuffer(binary_data[start // 8:(stop + 7) // 8], dtype=np.uint8))[offset:offset + stop - start]
+    return message_to_bits(binary_data[start:stop])
+
+def _total_bits(binary_data: BinaryData) -> int:
+    return len(binary_data) * 8 if isinstance(binary_data, (bytes, bytearray)) else len(binary_data)
+
+def _iter_bit_chunks(binary_data: BinaryData, chunk_bits: int, start_bit: int = 0, stop_bit: Optional[int] = None,
+                     lookahead: int = 0) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Recorre los bits [start_bit, stop_bit) del mensaje en bloques, desempaquetando solo el bloque
+    actual. Cada bloque va con los `lookahead` bits que lo siguen en el mensaje (menos al final).
+    """
+    total_bits = _total_bits(binary_data)
+    stop_bit = total_bits if stop_bit is None else min(stop_bit, total_bits)
+    for start in range(start_bit, stop_bit, chunk_bits):
+        stop = min(start + chunk_bits, stop_bit)
+        yield _message_bits(binary_data, start, stop), _message_bits(binary_data, stop, min(stop + lookahead, total_bits))
+
+def _state_at(binary_data: BinaryData, code, bit: int, chunk_bits: int) -> int:
+    """Estado de la máquina del código antes del bit `bit`, recorriendo el prefijo sin generar muestras."""
+    state = 0
+    for bits, lookahead_bits in _iter_bit_chunks(binary_data, max(chunk_bits, 1 << 16), 0, bit, code.lookahead):
+        state = code.advance(bits, state, lookahead_bits)
+    return state
+
+def iter_modulated_chunks(binary_data: BinaryData, mod_type: ModulationType, chunk_bits: int = CHUNK_BITS,
+                          start_bit: int = 0, stop_bit: Optional[int] = None,
+                          samples_per_bit: Optional[int] = None,
+                          bit_duration: Optional[float] = None) -> Iterator[ModulatedSignal]:
+    """
+    Genera la señal modulada en bloques `ModulatedSignal` de `chunk_bits` bits (el último puede
+    ser menor), cada uno con su `start_bit`. El estado de la máquina del código (y los bits de
+    anticipación que necesite, p. ej. HDB3) se arrastra entre bloques, de modo que concatenar los
+    bloques da la misma señal que `modulate`. La memoria máxima depende del tamaño de bloque.
+    Con `start_bit`/`stop_bit` se genera solo ese tramo del mensaje (el estado inicial se
+    obtiene recorriendo la máquina sobre los bits anteriores, sin generar su señal).
+    """
+    samples_per_bit_eff = max(1, samples_per_bit or SAMPLES_PER_BIT)
+    bit_duration = bit_duration or BIT_DURATION
+    code = get_line_code(mod_type)
+    state = _state_at(binary_data, code, start_bit, chunk_bits) if start_bit else 0
+    for bits, lookahead_bits in _iter_bit_chunks(binary_data, chunk_bits, start_bit, stop_bit, code.lookahead):
+        with stage("generation_chunk"):
+            levels, state = code.encode(bits, samples_per_bit_eff, state, lookahead_bits)
+        yield ModulatedSignal(levels=levels, bits=bits, modulation=code.name,
+                              samples_per_bit=samples_per_bit_eff, bit_duration=bit_duration,
+                              start_bit=start_bit)
+        start_bit += len(bits)
 
 # --- Mapeo de nombres a funciones ---
 # Usar el Enum importado de models.py
@@ -83,9 +178,16 @@ modulation_functions = {
     ModulationType.MANCHESTER: generate_manchester,
     ModulationType.UNIPOLAR_RZ: generate_unipolar_rz,
     ModulationType.BIPOLAR_AMI: generate_bipolar_ami,
-    # Añade aquí otras funciones de generación si las creas
+    # Los códigos nuevos se registran en line_codes.py (no hace falta añadirlos aquí)
 }
 
 def get_modulation_function(mod_type: ModulationType):
-    """Devuelve la función de generación correspondiente al tipo."""
-    return modulation_functions.get(mod_type)
\ No newline at end of file
+    """
+    Devuelve la función de generación correspondiente al tipo: la clásica si existe, o una
+    genérica para cualquier código del registro. None si el código no está registrado.
+    """
+    if mod_type in modulation_functions:
+        return modulation_functions[mod_type]
+    if not is_line_code(mod_type):
+        return None
+    return partial(_generate, mod_type=mod_type)
@@ -0,0 +1,140 @@
+"""
+Densidad espectral de potencia (PSD) de los códigos de línea por el método de Welch.
+
+La señal se trocea en segmentos solapados al 50 %, con ventana de Hann, y se promedian los
+periodogramas. Los segmentos se procesan por lotes (una FFT real por lote) a medida que llega
+la señal, así que la memoria depende del tamaño de lote y no de la longitud del mensaje.
+Las frecuencias se expresan en múltiplos de la tasa de bits (f / Rb).
+
+El espectro de un código con datos aleatorios es fijo: se calcula una vez por
+(modulación, muestras por bit, longitud de segmento) y se guarda en una caché LRU acotada.
+"""
+import threading
+from collections import OrderedDict
+from typing import Hashable, Iterable, Optional, Tuple
+
+import numpy as np
+
+from channel import fast_fft_len
+from config import PSD_BLOCK_SEGMENTS, PSD_CACHE_ENTRIES, PSD_RANDOM_BITS, CHUNK_BITS
+from line_codes import get_line_code
+from signal_generation import BinaryData, iter_modulated_chunks
+
+_RANDOM_SEED = 0  # Mensaje aleatorio fijo: el espectro "teórico" es reproducible entre llamadas
+
+
+def segment_length(segment_bits: int, samples_per_bit: int) -> int:
+    """Muestras por segmento: el tamaño rápido de FFT (factores 2, 3 y 5) más cercano por arriba."""
+    return fast_fft_len(segment_bits * samples_per_bit)
+
+
+class WelchAccumulator:
+    """Acumula periodogramas de Welch sobre una señal que llega por bloques."""
+
+    def __init__(self, nperseg: int, samples_per_bit: int, block_segments: int = PSD_BLOCK_SEGMENTS):
+        self.nperseg = nperseg
+        self.step = nperseg // 2
+        self.samples_per_bit = samples_per_bit
+        self.block_samples = self.step * (block_segments + 1)
+        self.window = np.hanning(nperseg + 1)[:-1]  # Hann periódica
+        self.power = np.zeros(nperseg // 2 + 1)
+        self.segments = 0
+        self._pending = np.empty(0)
+
+    def feed(self, samples: np.ndarray):
+        """Añade muestras; procesa todos los segmentos completos y guarda el resto."""
+        buffer = np.concatenate((self._pending, samples)) if len(self._pending) else np.asarray(samples, np.float64)
+        start = 0
+        while len(buffer) - start >= self.nperseg:
+            block = buffer[start:start + self.block_samples]
+            count = (len(block) - self.nperseg) // self.step + 1
+            segments = np.lib.stride_tricks.sliding_window_view(block, self.nperseg)[::self.step][:count]
+            spectra = np.fft.rfft(segments * self.window, axis=1)
+            self.power += np.sum(spectra.real ** 2 + spectra.imag ** 2, axis=0)
+            self.segments += count
+            start += count * self.step
+        self._pending = buffer[start:].astype(np.float64, copy=True)
+
+    def result(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(frecuencias en f/Rb, PSD unilateral en potencia por unidad de Rb)."""
+        if self.segments == 0:
+            raise ValueError(f"El mensaje es demasiado corto para un segmento de {self.nperseg} muestras.")
+        freqs = np.fft.rfftfreq(self.nperseg, d=1.0 / self.samples_per_bit)
+        scale = self.samples_per_bit * np.sum(self.window ** 2) * self.segments
+        psd = self.power / scale
+        psd[1:-1 if self.nperseg % 2 == 0 else None] *= 2  # unilateral: se suma la mitad negativa
+        return freqs, psd
+
+
+def welch_psd(chunks: Iterable[np.ndarray], nperseg: int, samples_per_bit: int) -> Tuple[np.ndarray, np.ndarray]:
+    """PSD de Welch de una señal entregada como secuencia de bloques de muestras."""
+    accumulator = WelchAccumulator(nperseg, samples_per_bit)
+    for chunk in chunks:
+        accumulator.feed(chunk)
+    return accumulator.result()
+
+
+def message_psd(binary_data: BinaryData, mod_type, samples_per_bit: int, nperseg: int) -> Tuple[np.ndarray, np.ndarray]:
+    """PSD de un mensaje concreto, generando su señal por bloques."""
+    chunks = iter_modulated_chunks(binary_data, mod_type, CHUNK_BITS * 16, samples_per_bit=samples_per_bit)
+    return welch_psd((chunk.levels for chunk in chunks), nperseg, samples_per_bit)
+
+
+class PsdCache:
+    """Caché LRU (por número de entradas) de espectros de códigos con datos aleatorios."""
+
+    def __init__(self, max_entries: int = PSD_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, code) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            # Un código reemplazado en el registro invalida su espectro
+            if entry is None or entry[0] is not code:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, code, value: Tuple[np.ndarray, np.ndarray]):
+        with self._lock:
+            self._entries[key] = (code, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {"entries": len(self._entries), "max_entries": self.max_entries, "hits": self.hits,
+                    "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
+
+
+psd_cache = PsdCache()
+
+
+def random_psd(mod_type, samples_per_bit: int, segment_bits: int) -> Tuple[np.ndarray, np.ndarray]:
+    """PSD del código con PSD_RANDOM_BITS bits aleatorios (memoizada)."""
+    code = get_line_code(mod_type)
+    nperseg = segment_length(segment_bits, samples_per_bit)
+    key = (code.name, samples_per_bit, nperseg)
+    cached = psd_cache.get(key, code)
+    if cached is not None:
+        return cached
+    bits = np.random.default_rng(_RANDOM_SEED).integers(0, 2, PSD_RANDOM_BITS, dtype=np.uint8)
+    result = message_psd(bits, code, samples_per_bit, nperseg)
+    psd_cache.put(key, code, result)
+    return result
+
+
+def occupied_bandwidth(freqs: np.ndarray, psd: np.ndarray, fraction: float) -> float:
+    """Menor frecuencia (en f/Rb) por debajo de la cual queda `fraction` de la potencia."""
+    cumulative = np.cumsum(psd)
+    if cumulative[-1] <= 0:
+        return 0.0
+    return float(freqs[np.searchsorted(cumulative, fraction * cumulative[-1])])